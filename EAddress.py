@@ -3,6 +3,13 @@
 #   Ce fichier contient l'objet EAddress,
 #   qui représente l'objet address de jobup
 #   Utilisation: from EAddress import EAddress
+import hashlib
+import threading
+from ERecord import ERecord
+
+#Nom du champ contenant la clef de l'adresse (hash de son contenu)
+KEY_FIELD = 'address_key'
+
 class private:
     """Contient les variables et fonctions privées
     """
@@ -14,26 +21,36 @@ class private:
         },
         'coordinates': lambda val: None if val is None else {'longitude': val['lon'], 'latitude': val['lat']},
     }
+    #Les adresses mappées qui n'ont pas encore été écrites en DB, au format {clef -> EAddress}
+    pending:dict = {}
+    #Les clefs des adresses déjà mappées lors de ce lancement
+    knownKeys:set = set()
+    lock = threading.Lock()
 
-class EAddress:
+class EAddress(ERecord):
     """Représente l'objet addresse de jobup
     """
-    street1:str = ''
-    street2:str = ''
-    city:str = ''
-    city_de:str = ''
-    city_en:str = ''
-    city_fr:str = ''
-    zip_code:str = ''
-    country_code:str = ''
-    tel_1:str = ''
-    tel_2:str = ''
-    fax:str = ''
-    firstname:str = ''
-    lastname:str = ''
-    email:str = ''
-    latitude:str = ''
-    longitude:str = ''
+    #Les champs, au format (nom, type), dans l'ordre des colonnes en DB
+    FIELDS:tuple = (
+        ('street1', str),
+        ('street2', str),
+        ('city', str),
+        ('city_de', str),
+        ('city_en', str),
+        ('city_fr', str),
+        ('zip_code', str),
+        ('country_code', str),
+        ('tel_1', str),
+        ('tel_2', str),
+        ('fax', str),
+        ('firstname', str),
+        ('lastname', str),
+        ('email', str),
+        ('latitude', float),
+        ('longitude', float),
+        (KEY_FIELD, str)
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
 
     @staticmethod
     def getMap()->dict:
@@ -42,4 +59,58 @@ class EAddress:
         Returns:
             dict: Le dictionnaire de mapping
         """
-        return private.rowToAddressMap
\ No newline at end of file
+        return private.rowToAddressMap
+
+    @staticmethod
+    def computeKey(values:tuple) -> str:
+        """Retourne la clef d'une adresse : un hash de la valeur de ses champs
+            Deux adresses identiques ont la même clef, qu'elles viennent du mapping ou de la DB
+
+        Args:
+            values (tuple): La valeur de chaque champ, dans l'ordre de FIELDS, sans KEY_FIELD
+
+        Returns:
+            str: La clef
+        """
+        #Les valeurs sont comparées sous forme de texte, quel que soit le type de leur colonne en DB
+        content = '\x1f'.join(map(lambda val: '' if val is None else str(val), values))
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    def getKey(self) -> str:
+        """Calcule et assigne la clef de l'adresse, si celle-ci n'en a pas encore
+
+        Returns:
+            str: La clef
+        """
+        if self.address_key is None:
+            self.address_key = EAddress.computeKey(self.toTuple()[:-1])
+        return self.address_key
+
+    @staticmethod
+    def register(address:'EAddress') -> str:
+        """Ajoute une adresse mappée aux adresses à écrire en DB (voir EAddress.popPending), sauf si celle-ci a déjà été vue
+
+        Args:
+            address (EAddress): L'adresse
+
+        Returns:
+            str: La clef de l'adresse
+        """
+        key = address.getKey()
+        with private.lock:
+            if key not in private.knownKeys:
+                private.knownKeys.add(key)
+                private.pending[key] = address
+        return key
+
+    @staticmethod
+    def popPending() -> list:
+        """Retourne les adresses mappées qui n'ont pas encore été écrites en DB, et vide la liste
+
+        Returns:
+            list: Les adresses (EAddress)
+        """
+        with private.lock:
+            addresses = list(private.pending.values())
+            private.pending = {}
+        return addresses
@@ -0,0 +1,293 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet EAsyncScraper,
+#   l'équivalent asynchrone (asyncio) d'EScraper, basé sur aiohttp
+#   Utilisation: from EAsyncScraper import EAsyncScraper
+
+import asyncio
+import json
+from time import perf_counter
+from typing import AsyncIterator, Union
+from ECompany import ECompany
+from EHelper import EHelper
+from EJob import EJob
+from ELogger import ELogger
+from EMetrics import EMetrics, REQUEST_SECONDS, RESPONSES_TOTAL, SLEEP_SECONDS_TOTAL
+from ERateLimiter import ERateLimiter
+from EResponseCache import EResponseCache
+from EScraper import EScraper, private as scraper, API, HTTP_CODES, RETRY_POLICY, THROTTLE_CODES
+from ESession import DEFAULT_HEADERS
+try:
+    import aiohttp
+except ImportError:
+    #aiohttp n'est nécessaire que pour EAsyncScraper, le reste du scraper fonctionne sans
+    aiohttp = None
+
+#Durée maximum d'une requête (connexion et lecture de la réponse comprises), en secondes
+#Une requête trop longue est traitée comme une erreur réseau, et réessayée selon RETRY_POLICY
+DEFAULT_TIMEOUT_SECONDS = 30
+#Nombre maximum de requêtes simultanées (connexions ouvertes). Le débit reste limité par le limiter partagé
+DEFAULT_MAX_CONNECTIONS = 100
+
+class Response:
+    """Réponse lue entièrement, avec les attributs de requests.Response utilisés par le scraper
+        Le contenu d'une réponse aiohttp n'est plus lisible une fois la connexion rendue au pool
+    """
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code:int, headers, content:bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self) -> object:
+        return json.loads(self.content)
+
+class EAsyncScraper:
+    """Équivalent asynchrone d'EScraper : retourne les mêmes EJob, ECompany et HTTP_CODES, sans bloquer la boucle asyncio
+        Les requêtes passent par le limiter partagé (voir ERateLimiter.getShared) et le cache des réponses (voir EResponseCache),
+        comme celles d'EScraper : le budget de débit est commun aux deux scrapers
+        Les méthodes peuvent être annulées (Ex. asyncio.wait_for, task.cancel()) : les requêtes en cours sont alors interrompues
+
+        Utilisation :
+            async with EAsyncScraper() as jobup:
+                job = await jobup.getJobFromID(id)
+    """
+
+    def __init__(self, timeout:float = DEFAULT_TIMEOUT_SECONDS, maxConnections:int = DEFAULT_MAX_CONNECTIONS):
+        """
+        Args:
+            timeout (float, optional): La durée maximum d'une requête, en secondes. Defaults to DEFAULT_TIMEOUT_SECONDS.
+            maxConnections (int, optional): Le nombre maximum de requêtes simultanées. Defaults to DEFAULT_MAX_CONNECTIONS.
+
+        Raises:
+            ImportError: Si aiohttp n'est pas installé
+        """
+        if aiohttp is None:
+            raise ImportError("EAsyncScraper nécessite aiohttp (pip install aiohttp)")
+        self.timeout = timeout
+        self.maxConnections = maxConnections
+        self._session = None
+        #Limite les requêtes en attente d'un jeton du limiter ou en cours : un jeton n'est réservé que par une requête sur le point de partir
+        self._slots:asyncio.Semaphore = None
+
+    async def __aenter__(self) -> 'EAsyncScraper':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def open(self):
+        """Ouvre la session HTTP. Doit être appelée depuis la boucle asyncio qui exécutera les requêtes
+        """
+        if self._session is None:
+            #Le sémaphore est créé dans la boucle qui l'utilisera (python < 3.10)
+            self._slots = asyncio.Semaphore(self.maxConnections)
+            #trust_env : les proxies sont lus depuis l'environnement (HTTP_PROXY, NO_PROXY, etc...), comme avec requests
+            self._session = aiohttp.ClientSession(headers=DEFAULT_HEADERS, trust_env=True,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                  connector=aiohttp.TCPConnector(limit=self.maxConnections))
+
+    async def close(self):
+        """Ferme la session HTTP et toutes ses connexions
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._slots = None
+
+    async def getJobFromID(self, id:str) -> Union[EJob, HTTP_CODES]:
+        """Retourne un poste via son ID
+
+        Args:
+            id (str): L'ID du poste
+
+        Returns:
+            Union[EJob, HTTP_CODES]: Le poste, ou le code d'erreur
+        """
+        job = await self._queryJSONOrError(f"{API.JOB.value}{id}")
+        if type(job) is HTTP_CODES:
+            #L'erreur est affichée par l'appelant, qui sait si elle est attendue (Ex. poste supprimé)
+            ELogger.debug(f"Erreur lors de la récupération du job : {id}", str(job))
+            return job
+        return EHelper.MapObjectToNewType(job, EJob)
+
+    async def getCompanyFromID(self, id:str) -> Union[ECompany, HTTP_CODES]:
+        """Retourne une entreprise via son ID
+
+        Args:
+            id (str): L'ID de l'entreprise
+
+        Returns:
+            Union[ECompany, HTTP_CODES]: L'entreprise, ou le code d'erreur
+        """
+        company = await self._queryJSONOrError(f"{API.COMPANY.value}{id}")
+        if type(company) is HTTP_CODES:
+            ELogger.debug(f"Erreur lors de la récupération de l'entreprise {id}", str(company))
+            return company
+        return EScraper.mapCompany(company)
+
+    async def getSearchPage(self, page:int, query:str = '', rows:int = 20,
+                            searchURL:str = API.SEARCH_IT.value) -> Union[object, HTTP_CODES]:
+        """Retourne une page de la recherche
+
+        Args:
+            page (int): Le numéro de page (commence à 1)
+            query (str, optional): Le texte à rechercher. Defaults to ''.
+            rows (int, optional): Le nombre de résultats par page. Defaults to 20.
+            searchURL (str, optional): L'URL de la recherche, filtres compris (voir EScraper.private.getSearchURL). Defaults to API.SEARCH_IT.
+
+        Returns:
+            Union[object, HTTP_CODES]: Le résultat de la recherche, ou le code d'erreur
+        """
+        queryString = f"{searchURL}&page={page}&rows={rows}"
+        if len(query) > 0:
+            queryString += '&' + query
+
+        result = await self._queryResultOrError(queryString)
+        if type(result) is HTTP_CODES:
+            ELogger.debug(f"Erreur lors de la récupération de la page {page}", str(result))
+            return result
+        return result.json()
+
+    async def getAllNewJobs(self, highWater:str, seenIDs:set = None, fetchDetails:bool = True) -> list:
+        """Retourne tous les postes publiés depuis le high-water mark (voir EScraper.getAllNewJobs)
+            Le détail des postes d'une page est récupéré en parallèle (maxConnections requêtes au maximum),
+            pendant que la page suivante est demandée
+
+        Args:
+            highWater (str): La date de publication la plus récente en DB (voir EDatabase.getSyncState)
+            seenIDs (set, optional): Les IDs des postes les plus récents déjà en DB. Defaults to None.
+            fetchDetails (bool, optional): Si False, les postes sont mappés directement depuis la recherche,
+                sans requête par poste (voir EScraper.mapSearchDocument). Defaults to True.
+
+        Returns:
+            list: Les postes (EJob), du plus récent au plus ancien. Les postes en erreur sont ignorés
+        """
+        if not fetchDetails:
+            result:list = []
+            async for page in self._iterNewPages(highWater, seenIDs):
+                result += map(EScraper.mapSearchDocument, page)
+            return result
+
+        tasks:list = []
+        try:
+            async for page in self._iterNewPages(highWater, seenIDs):
+                tasks += [asyncio.ensure_future(self.getJobFromID(document['job_id'])) for document in page]
+            jobs = await asyncio.gather(*tasks)
+        except BaseException:
+            #Annulation ou erreur : les requêtes de détail encore en cours sont annulées
+            for task in tasks:
+                task.cancel()
+            raise
+        return [job for job in jobs if type(job) is not HTTP_CODES]
+
+    async def _iterNewPages(self, highWater:str, seenIDs:set = None,
+                            searchURL:str = API.SEARCH_IT.value) -> AsyncIterator[list]:
+        """Parcourt la recherche, et retourne (yield) les postes de chaque page publiés depuis le high-water mark
+            Une recherche abandonnée sur une erreur est affichée, les postes déjà retournés restent valides
+
+        Args:
+            highWater (str): La date de publication la plus récente en DB
+            seenIDs (set, optional): Les IDs des postes les plus récents déjà en DB. Defaults to None.
+            searchURL (str, optional): L'URL de la recherche, filtres compris. Defaults to API.SEARCH_IT.
+
+        Yields:
+            list: Les nouveaux postes de la page, tels que retournés dans documents par la recherche
+        """
+        pageNumber = 1
+        highWaterDate = EHelper.parseDate(highWater)
+        if seenIDs is None:
+            seenIDs = set()
+
+        while True:
+            currPage = await self.getSearchPage(pageNumber, searchURL=searchURL)
+            if type(currPage) is HTTP_CODES:
+                ELogger.error("Erreur lors du scraping de la page " + str(pageNumber), currPage.name)
+                return
+            if len(currPage['documents']) == 0:
+                return
+
+            newDocuments, pageIsOld = scraper.filterNewDocuments(currPage['documents'], highWaterDate, seenIDs)
+            if len(newDocuments) > 0:
+                yield newDocuments
+            if pageIsOld:
+                return
+            pageNumber += 1
+
+    async def _queryResultOrError(self, url:str, headers:dict = None) -> Union[Response, HTTP_CODES]:
+        """Équivalent asynchrone d'EScraper.private.queryResultOrError : même limiter, même RETRY_POLICY, mêmes métriques
+            Les attentes (limiter, pause entre deux tentatives) ne bloquent pas la boucle asyncio
+        """
+        if self._session is None:
+            raise RuntimeError("La session n'est pas ouverte, voir EAsyncScraper.open")
+        limiter = ERateLimiter.getShared()
+        endpoint = scraper.getEndpoint(url)
+        attempt = 0
+
+        while True:
+            #Le sémaphore est pris avant la réservation du jeton, et rendu pendant la pause entre deux tentatives
+            async with self._slots:
+                waitTime = limiter.reserve()
+                if waitTime > 0:
+                    try:
+                        await asyncio.sleep(waitTime)
+                    except asyncio.CancelledError:
+                        #La requête n'est pas partie : son jeton est rendu, afin de ne pas retarder les autres appelants (Ex. EScraper)
+                        limiter.release()
+                        raise
+                EMetrics.increment(SLEEP_SECONDS_TOTAL, {'reason': 'rate_limit'}, waitTime)
+                start = perf_counter()
+                try:
+                    async with self._session.get(url, headers=headers) as response:
+                        result = Response(response.status, response.headers, await response.read())
+                    code = scraper.getQueryStatusFromString(str(result.status_code))
+                #asyncio.CancelledError n'est pas intercepté : une annulation interrompt la requête et remonte à l'appelant
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    result = None
+                    code = HTTP_CODES.UNDEFINED
+            EMetrics.observe(REQUEST_SECONDS, perf_counter() - start, {'endpoint': endpoint})
+            EMetrics.increment(RESPONSES_TOTAL, {'endpoint': endpoint, 'code': code.name})
+
+            if code is HTTP_CODES.OK or code is HTTP_CODES.NOT_MODIFIED:
+                limiter.onSuccess()
+                return result
+
+            if code in THROTTLE_CODES:
+                limiter.onThrottle()
+
+            if attempt >= RETRY_POLICY.get(code, 0):
+                return code
+
+            attempt += 1
+            delay = scraper.getRetryDelay(result, attempt)
+            EMetrics.increment(SLEEP_SECONDS_TOTAL, {'reason': 'retry'}, delay)
+            await asyncio.sleep(delay)
+
+    async def _queryJSONOrError(self, url:str) -> Union[object, HTTP_CODES]:
+        """Équivalent asynchrone d'EScraper.private.queryJSONOrError (requête conditionnelle, voir EResponseCache)
+            Le cache est une DB SQLite locale, ses lectures et écritures sont assez courtes pour être faites dans la boucle
+        """
+        if not EResponseCache.isEnabled():
+            result = await self._queryResultOrError(url)
+            return result if type(result) is HTTP_CODES else result.json()
+
+        endpoint = scraper.getEndpoint(url)
+        result = await self._queryResultOrError(url, EResponseCache.getValidators(url))
+        if type(result) is HTTP_CODES:
+            if result is HTTP_CODES.ERR_PAGE_NOT_FOUND:
+                EResponseCache.remove(url)
+            return result
+
+        if result.status_code == 304:
+            body = scraper.getCachedBody(url, endpoint)
+            if body is not None:
+                return json.loads(body)
+            #La réponse a été évincée entre la lecture des validateurs et la réponse, on la redemande sans condition
+            result = await self._queryResultOrError(url)
+            if type(result) is HTTP_CODES:
+                return result
+
+        scraper.cacheResponse(url, endpoint, result)
+        return result.json()
@@ -3,6 +3,7 @@
 #   Ce fichier contient l'objet ECompany,
 #   qui représente une entreprise sur jobup
 #   Utilisation: from ECompany import ECompany
+from ERecord import ERecord, ISODate
 
 class private:
     """Contient les méthodes et variables privées
@@ -37,24 +38,25 @@ class private:
     def MapAddress(val:dict) -> str:
         from EAddress import EAddress
         from EHelper import EHelper
-        from EDatabase import EDatabase
-        """Mappe une addresse, l'ajoute à la DB puis retourne son id 
+        """Mappe une addresse, puis retourne sa clef
+            L'adresse est écrite en DB avec l'entreprise (voir EDatabase.insertCompanies)
 
         Args:
             val (dict): L'addresse à mapper
 
         Returns:
-            str: L'ID de la nouvelle addresse
+            str: La clef de l'addresse (voir EAddress.computeKey)
         """
         #Jobup contient parfois plusieurs addresses
         #On ne récupère que la première pour simplifier la DB
         if(type(val) is list):
+            if len(val) == 0:
+                return None
             val = val[0]
-        address:EAddress = EAddress
-        for innerKey, innerVal in val.items():
-            EHelper.MapKeyValueToObject(innerKey, innerVal, address)
-
-        return EDatabase.insertAddress(address)
+        if val is None:
+            return None
+        address:EAddress = EHelper.MapObjectToNewType(val, EAddress)
+        return EAddress.register(address)
 
     @staticmethod
     def MapSocialURLs(vals:list) -> dict:
@@ -76,35 +78,40 @@ class private:
             result['social_' + platform] = url
         return result
 
-class ECompany:
+class ECompany(ERecord):
     """Représente une entreprise sur jobup
     """
-    id:int = -1
-    description_de:str = ''
-    description_fr:str = ''
-    description_en:str = ''
-    slug:str = ''
-    is_visible:str = ''
-    datapool_id:str = ''
-    name:str = ''
-    last_modified:str = ''
-    industry:str = ''
-    founding_year:str = ''
-    url:str = ''
-    address_id:str = ''
-    contact_address_id:str = ''
-    portrait_urls:str = ''
-    portrait_descriptions:str = ''
-    phone:str = ''
-    ratings_total:str = ''
-    ratings_average:str = ''
-    social_facebook:str = ''
-    social_twitter:str = ''
-    social_linkedin:str = ''
-    social_youtube:str = ''
-    social_instagram:str = ''
-    social_xing:str = ''
-    social_viadeo:str = ''
+    #Les champs, au format (nom, type), dans l'ordre des colonnes en DB
+    FIELDS:tuple = (
+        ('id', int),
+        ('description_de', str),
+        ('description_fr', str),
+        ('description_en', str),
+        ('slug', str),
+        ('is_visible', bool),
+        ('datapool_id', int),
+        ('name', str),
+        ('last_modified', ISODate),
+        ('industry', str),
+        ('founding_year', int),
+        ('url', str),
+        ('address_id', str),
+        ('contact_address_id', str),
+        ('portrait_urls', str),
+        ('portrait_descriptions', str),
+        ('phone', str),
+        ('ratings_total', int),
+        ('ratings_average', float),
+        ('social_facebook', str),
+        ('social_twitter', str),
+        ('social_linkedin', str),
+        ('social_youtube', str),
+        ('social_instagram', str),
+        ('social_xing', str),
+        ('social_viadeo', str)
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
+
     @staticmethod
     def getMap()->dict:
         """Retourne le dictionnaire de mapping
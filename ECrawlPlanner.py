@@ -0,0 +1,109 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet ECrawlPlanner,
+#   qui découpe la recherche en sous-recherches de moins de 2000 résultats
+#   Utilisation: from ECrawlPlanner import ECrawlPlanner
+
+from EHelper import EHelper
+from ELogger import ELogger
+from EScraper import private as scraper, HTTP_CODES, IT_CATEGORY_IDS, SEARCH_LIMIT
+
+#Le champ de la réponse de recherche contenant le nombre total de résultats
+TOTAL_HITS_KEY = 'total_hits'
+#Les filtres utilisés pour découper une recherche trop grande, dans l'ordre
+#Chaque filtre est au format (nom du paramètre, liste d'IDs). Un filtre sans IDs est ignoré
+#Les IDs des régions ne sont pas connues à l'avance, celles-ci doivent être ajoutées ici pour être utilisées
+SPLIT_FILTERS:list = [
+    ('category-ids', IT_CATEGORY_IDS),
+    ('region-ids', ())
+]
+#Les filtres de la recherche complète : toutes les catégories IT
+DEFAULT_FILTERS:dict = {SPLIT_FILTERS[0][0]: list(IT_CATEGORY_IDS)}
+
+class private:
+    """Contient les méthodes privées
+    """
+
+    @staticmethod
+    def countResults(filters:dict) -> int:
+        """Retourne le nombre de résultats d'une recherche, via une page d'un seul résultat
+
+        Args:
+            filters (dict): Les filtres de la recherche
+
+        Returns:
+            int: Le nombre de résultats, ou -1 s'il est inconnu
+        """
+        page = scraper.getSearchPage(1, rows=1, searchURL=scraper.getSearchURL(filters))
+        if type(page) is HTTP_CODES:
+            return -1
+        return int(page.get(TOTAL_HITS_KEY, -1))
+
+    @staticmethod
+    def split(filters:dict, level:int) -> list:
+        """Découpe une recherche selon SPLIT_FILTERS[level], jusqu'à ce que chaque partie fasse moins de SEARCH_LIMIT résultats
+
+        Args:
+            filters (dict): Les filtres de la recherche à découper
+            level (int): L'index du filtre de SPLIT_FILTERS à utiliser
+
+        Returns:
+            list: Les filtres de chaque partie
+        """
+        if level >= len(SPLIT_FILTERS):
+            ELogger.warning(f"Impossible de découper la recherche {filters}, celle-ci sera tronquée à {SEARCH_LIMIT} résultats")
+            return [filters]
+
+        name, ids = SPLIT_FILTERS[level]
+        if len(ids) == 0:
+            return private.split(filters, level + 1)
+
+        result = []
+        #Si la recherche filtre déjà sur ce paramètre (Ex. les catégories IT), on ne découpe que parmi ces valeurs
+        for id in filters.get(name, ids):
+            partition = dict(filters)
+            partition[name] = [id]
+            nbResults = private.countResults(partition)
+            if nbResults == 0:
+                continue
+            if nbResults >= SEARCH_LIMIT:
+                result += private.split(partition, level + 1)
+            else:
+                result.append(partition)
+        return result
+
+    @staticmethod
+    def sortKey(document:dict) -> float:
+        """Retourne la clef de tri d'un poste : sa date de publication (0 si inconnue)
+            Utilisée par ECrawlScheduler pour garder les postes les plus récents de chaque profil
+
+        Args:
+            document (dict): Le poste, tel que retourné par la recherche
+
+        Returns:
+            float: Le timestamp de la date de publication
+        """
+        date = EHelper.parseDate(document.get('publication_date'))
+        return date.timestamp() if date is not None else 0
+
+class ECrawlPlanner:
+    """Découpe la recherche en partitions de moins de SEARCH_LIMIT résultats
+        Les partitions sont parcourues par ECrawlScheduler
+    """
+
+    @staticmethod
+    def plan(filters:dict = None) -> list:
+        """Retourne les partitions à parcourir pour couvrir toute la recherche
+
+        Args:
+            filters (dict, optional): Les filtres de la recherche complète. Defaults to les catégories IT.
+
+        Returns:
+            list: Les filtres de chaque partition
+        """
+        if filters is None:
+            filters = dict(DEFAULT_FILTERS)
+        nbResults = private.countResults(filters)
+        if 0 <= nbResults < SEARCH_LIMIT:
+            return [filters]
+        return private.split(filters, 0)
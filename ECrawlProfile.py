@@ -0,0 +1,99 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet ECrawlProfile,
+#   une recherche nommée (catégories et paramètres) avec son propre état de synchronisation,
+#   et le registre des profils disponibles
+#   Utilisation: from ECrawlProfile import ECrawlProfile
+
+from EDatabase import DEFAULT_SYNC_NAME
+from EScraper import private as scraper, IT_CATEGORY_IDS
+
+#Le nom du profil des catégories IT, le seul parcouru avant l'ajout des profils
+IT_PROFILE = 'it'
+#Le paramètre de recherche contenant les catégories (voir ECrawlPlanner.SPLIT_FILTERS)
+CATEGORY_PARAM = 'category-ids'
+
+class private:
+    """Contient les variables privées
+    """
+    #{nom -> ECrawlProfile}, dans l'ordre d'enregistrement
+    profiles:dict = {}
+
+class ECrawlProfile:
+    """Une recherche jobup nommée (Ex. un secteur : IT, finance, ingénierie), parcourue par ECrawlScheduler
+        Chaque profil a son propre état de synchronisation (high-water mark) et son propre checkpoint de premier lancement,
+        les postes sont partagés : un poste présent dans plusieurs profils n'est récupéré et inséré qu'une fois
+    """
+    __slots__ = ('name', 'filters', 'syncName')
+
+    def __init__(self, name:str, categoryIDs:tuple, params:dict = None, syncName:str = None):
+        """
+        Args:
+            name (str): Le nom du profil
+            categoryIDs (tuple): Les IDs des catégories jobup du profil (Ex. IT_CATEGORY_IDS)
+                Ceux-ci sont visibles dans l'URL d'une recherche sur jobup.ch (category-ids[0]=...)
+            params (dict, optional): Des paramètres de recherche supplémentaires (voir EScraper.private.getSearchURL). Defaults to None.
+            syncName (str, optional): Le nom de l'état de synchronisation (voir EDatabase.getSyncState). Defaults to None (le nom du profil).
+
+        Raises:
+            ValueError: Si aucune catégorie n'est précisée
+        """
+        if len(categoryIDs) == 0:
+            #Sans catégories, la recherche serait découpée selon les catégories IT (voir ECrawlPlanner.split)
+            raise ValueError(f"Le profil {name} doit avoir au moins une catégorie")
+        self.name = name
+        self.filters:dict = {CATEGORY_PARAM: list(categoryIDs)}
+        if params is not None:
+            self.filters.update(params)
+        self.syncName = syncName if syncName is not None else name
+
+    def __repr__(self) -> str:
+        return f"ECrawlProfile({self.name})"
+
+    def getSearchURL(self) -> str:
+        """Retourne l'URL de la recherche complète du profil
+
+        Returns:
+            str: L'URL, triée par date de publication comme toutes les recherches jobup
+        """
+        return scraper.getSearchURL(self.filters)
+
+    @staticmethod
+    def register(profile:'ECrawlProfile') -> 'ECrawlProfile':
+        """Ajoute un profil au registre, ou remplace le profil du même nom
+
+        Args:
+            profile (ECrawlProfile): Le profil
+
+        Returns:
+            ECrawlProfile: Le profil
+        """
+        private.profiles[profile.name] = profile
+        return profile
+
+    @staticmethod
+    def get(name:str) -> 'ECrawlProfile':
+        """Retourne un profil du registre
+
+        Args:
+            name (str): Le nom du profil
+
+        Raises:
+            KeyError: Si le profil n'est pas enregistré
+
+        Returns:
+            ECrawlProfile: Le profil
+        """
+        profile = private.profiles.get(name)
+        if profile is None:
+            raise KeyError(f"Profil inconnu : {name} ({', '.join(private.profiles)})")
+        return profile
+
+    @staticmethod
+    def getAll() -> list:
+        """Retourne tous les profils du registre, dans l'ordre d'enregistrement
+        """
+        return list(private.profiles.values())
+
+#Le profil IT garde l'état de synchronisation par défaut, afin que les DB existantes ne refassent pas de premier lancement
+ECrawlProfile.register(ECrawlProfile(IT_PROFILE, IT_CATEGORY_IDS, syncName=DEFAULT_SYNC_NAME))
@@ -0,0 +1,226 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet ECrawlScheduler,
+#   qui parcourt les recherches de plusieurs profils (voir ECrawlProfile) en parallèle
+#   Utilisation: from ECrawlScheduler import ECrawlScheduler
+
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+from ECrawlPlanner import ECrawlPlanner, private as planner
+from ECrawlProfile import ECrawlProfile
+from EDatabase import EDatabase, SYNC_SEEN_KEPT, PLAN_PENDING
+from ELogger import ELogger
+from EPipeline import EPipeline
+from EScraper import EScraper, private as scraper
+
+#Nombre de recherches (partitions ou recherches incrémentales, tous profils confondus) parcourues simultanément
+DEFAULT_NB_WORKERS = 4
+
+class CrawlTask:
+    """Une recherche d'un profil : une partition de son premier lancement, ou sa recherche des nouveaux postes
+    """
+    __slots__ = ('profile', 'filters', 'highWater', 'seenIDs')
+
+    def __init__(self, profile:ECrawlProfile, filters:dict = None, highWater:str = None, seenIDs:set = None):
+        """
+        Args:
+            profile (ECrawlProfile): Le profil
+            filters (dict, optional): Les filtres de la partition, pour un premier lancement. Defaults to None.
+            highWater (str, optional): Le high-water mark du profil, pour la recherche des nouveaux postes. Defaults to None.
+            seenIDs (set, optional): Les IDs des postes les plus récents du profil. Defaults to None.
+        """
+        self.profile = profile
+        self.filters = filters
+        self.highWater = highWater
+        self.seenIDs = seenIDs
+
+    def isFirstRun(self) -> bool:
+        return self.filters is not None
+
+    def __repr__(self) -> str:
+        return f"{self.profile.name} {self.filters if self.isFirstRun() else 'nouveaux postes'}"
+
+class private:
+    """Contient les méthodes privées
+    """
+
+    @staticmethod
+    def planProfile(profile:ECrawlProfile, partitioned:bool) -> list:
+        """Retourne les partitions du premier lancement d'un profil (voir ECrawlPlanner.plan)
+            Exécutée dans un thread par profil
+        """
+        if not partitioned:
+            return [dict(profile.filters)]
+        return ECrawlPlanner.plan(dict(profile.filters))
+
+    @staticmethod
+    def iterTaskPages(task:CrawlTask) -> Iterator[list]:
+        """Retourne l'itérateur des pages d'une tâche
+            Exécutée dans le thread de la tâche (voir EPipeline.taskPages)
+        """
+        if task.isFirstRun():
+            return scraper.iterSearchPages(scraper.getSearchURL(task.filters), str(task))
+        return EScraper.iterNewPages(task.highWater, task.seenIDs, task.profile.getSearchURL())
+
+    @staticmethod
+    def interleave(tasksByProfile:list) -> list:
+        """Alterne les tâches des profils (une tâche de chaque profil, puis la suivante, etc...)
+            Ainsi, un profil dont le premier lancement a beaucoup de partitions ne retarde pas les autres profils
+
+        Args:
+            tasksByProfile (list): Les tâches de chaque profil, une liste par profil
+
+        Returns:
+            list: Les tâches, dans l'ordre de démarrage
+        """
+        result:list = []
+        for i in range(max(map(len, tasksByProfile), default=0)):
+            result += [tasks[i] for tasks in tasksByProfile if i < len(tasks)]
+        return result
+
+class ECrawlScheduler:
+    """Parcourt les recherches de plusieurs profils en parallèle, nbWorkers recherches au maximum tous profils confondus
+        Le débit global reste limité par le limiter partagé d'EScraper (voir ERateLimiter.getShared)
+        Les pages sont traitées dans le thread de l'appelant, qui déduplique les postes pour tous les profils :
+        un poste présent dans plusieurs profils n'est retourné qu'une fois, et uniquement s'il n'est pas déjà en DB
+
+        Utilisation : prepare(), puis documents() (postes à insérer), puis finish() une fois les postes écrits en DB
+    """
+
+    def __init__(self, profiles:Iterable, nbWorkers:int = DEFAULT_NB_WORKERS, partitioned:bool = True):
+        """
+        Args:
+            profiles (Iterable): Les profils à parcourir (ECrawlProfile)
+            nbWorkers (int, optional): Le nombre de recherches parcourues simultanément. Defaults to DEFAULT_NB_WORKERS.
+            partitioned (bool, optional): Si True, le premier lancement d'un profil est découpé en partitions
+                (voir ECrawlPlanner). Defaults to True.
+        """
+        self.profiles:list = list(profiles)
+        self.nbWorkers = nbWorkers
+        self.partitioned = partitioned
+        self.tasks:list = []
+        #Les profils dont le premier lancement est en cours, et ceux dont une recherche a été abandonnée
+        self._firstRun:set = set()
+        self._incomplete:set = set()
+        #{nom du profil -> heap des SYNC_SEEN_KEPT postes les plus récents vus par le profil}, pour son état de synchronisation
+        self._recent:dict = {profile.name: [] for profile in self.profiles}
+        self._nbTracked = 0
+        #{nom du profil -> nombre de nouveaux postes trouvés par le profil}
+        self._nbNew:dict = {profile.name: 0 for profile in self.profiles}
+        #Les IDs des postes déjà traités lors de ce lancement, tous profils confondus
+        self._seenIDs:set = set()
+
+    def prepare(self):
+        """Planifie le premier lancement des profils qui n'ont pas encore d'état de synchronisation,
+            puis crée les tâches de chaque profil
+        """
+        toPlan = [profile for profile in self.profiles
+                  if not EDatabase.hasSyncState(profile.syncName) and not EDatabase.hasCheckpoint(profile.syncName)]
+        if len(toPlan) > 0:
+            #Le découpage de chaque profil est fait en parallèle, les requêtes restent limitées par le limiter partagé
+            with ThreadPoolExecutor(max_workers=max(1, min(self.nbWorkers, len(toPlan)))) as executor:
+                plans = list(executor.map(lambda profile: private.planProfile(profile, self.partitioned), toPlan))
+            #Le plan est sauvegardé en DB (checkpoint), afin qu'un lancement interrompu soit repris là où il s'est arrêté
+            with EDatabase.batch():
+                for profile, partitions in zip(toPlan, plans):
+                    ELogger.info(f"Premier lancement du profil {profile.name}, recherche découpée en {len(partitions)} partitions")
+                    EDatabase.startCheckpoint(partitions, profile.syncName)
+
+        tasksByProfile:list = []
+        for profile in self.profiles:
+            if EDatabase.hasCheckpoint(profile.syncName):
+                self._firstRun.add(profile.name)
+                partitions = EDatabase.getPendingPartitions(profile.syncName)
+                ELogger.info(f"Profil {profile.name} : {len(partitions)} partitions à parcourir")
+                tasksByProfile.append([CrawlTask(profile, filters) for filters in partitions])
+            else:
+                #Le high-water mark est la date de publication la plus récente vue par le profil
+                #La recherche étant triée par date, on s'arrête à la première page qui ne contient que des postes plus anciens
+                highWater, seenIDs = EDatabase.getSyncState(profile.syncName)
+                ELogger.info(f"Profil {profile.name} : recherche des nouveaux postes depuis {highWater}")
+                tasksByProfile.append([CrawlTask(profile, highWater=highWater, seenIDs=seenIDs)])
+        self.tasks = private.interleave(tasksByProfile)
+
+    def documents(self, planOnly:bool = False) -> Iterator[dict]:
+        """Parcourt toutes les tâches en parallèle, et retourne (yield) les postes qui ne sont pas encore en DB
+            Les nouveaux postes des premiers lancements sont ajoutés au checkpoint avant d'être retournés
+
+        Args:
+            planOnly (bool, optional): Si True, les postes des premiers lancements sont seulement ajoutés au checkpoint,
+                leur détail est récupéré par l'appelant via EDatabase.getPlannedJobs. Defaults to False.
+
+        Yields:
+            dict: Les nouveaux postes, tels que retournés dans documents par la recherche
+        """
+        for task, page in EPipeline.taskPages(self.tasks, private.iterTaskPages, self.nbWorkers, self._onTaskDone):
+            self._track(task.profile, page)
+            newDocuments:list = []
+            for document in page:
+                jobID = document['job_id']
+                #Un poste déjà traité par une autre tâche (Ex. un autre profil) est ignoré, sans nouvelle requête à la DB
+                if jobID in self._seenIDs:
+                    continue
+                self._seenIDs.add(jobID)
+                if not EDatabase.jobExists(jobID):
+                    newDocuments.append(document)
+
+            self._nbNew[task.profile.name] += len(newDocuments)
+            if task.isFirstRun():
+                with EDatabase.batch():
+                    EDatabase.planJobs(map(lambda document: document['job_id'], newDocuments))
+                if planOnly:
+                    continue
+            yield from newDocuments
+
+    def finish(self):
+        """Sauvegarde l'état de synchronisation de chaque profil, et termine les premiers lancements complets
+            À appeler une fois tous les postes retournés par documents écrits en DB, afin qu'un lancement interrompu
+            ne fasse pas avancer le high-water mark au-delà de postes qui n'ont pas été écrits
+        """
+        with EDatabase.batch():
+            for profile in self.profiles:
+                #Une recherche des nouveaux postes abandonnée sera refaite depuis l'ancien high-water mark
+                #Un premier lancement incomplet sera repris via son checkpoint, son état peut donc être sauvegardé
+                if profile.name in self._incomplete and profile.name not in self._firstRun:
+                    continue
+                recent = self._recent[profile.name]
+                EDatabase.updateSyncState(map(lambda item: EScraper.mapSearchDocument(item[2]), recent), profile.syncName)
+
+            for profile in self.profiles:
+                if profile.name not in self._firstRun:
+                    continue
+                stats = EDatabase.getCheckpointStats(profile.syncName)
+                if stats['partitions'] == 0 and stats[PLAN_PENDING] == 0:
+                    ELogger.info(f"Premier lancement du profil {profile.name} terminé")
+                    EDatabase.clearCheckpoint(profile.syncName)
+                else:
+                    ELogger.warning(f"Premier lancement du profil {profile.name} incomplet, celui-ci sera repris au prochain lancement",
+                                    f"{stats['partitions']} partitions, {stats[PLAN_PENDING]} postes restants")
+
+        for profile in self.profiles:
+            ELogger.info(f"Profil {profile.name} : {self._nbNew[profile.name]} nouveaux postes")
+
+    def _track(self, profile:ECrawlProfile, page:list):
+        """Garde les SYNC_SEEN_KEPT postes les plus récents vus par un profil, y compris ceux déjà insérés par un autre profil
+        """
+        recent = self._recent[profile.name]
+        for document in page:
+            #_nbTracked départage les postes publiés au même moment, les documents n'étant pas comparables
+            heapItem = (planner.sortKey(document), self._nbTracked, document)
+            self._nbTracked += 1
+            if len(recent) < SYNC_SEEN_KEPT:
+                heapq.heappush(recent, heapItem)
+            else:
+                heapq.heappushpop(recent, heapItem)
+
+    def _onTaskDone(self, task:CrawlTask, complete:bool):
+        """Appelée à la fin de chaque tâche (voir EPipeline.taskPages)
+            Une partition parcourue jusqu'au bout est marquée dans le checkpoint, sinon elle sera reprise au prochain lancement
+        """
+        if not complete:
+            self._incomplete.add(task.profile.name)
+            ELogger.warning(f"La recherche {task} n'a pas été parcourue jusqu'au bout, elle sera reprise au prochain lancement")
+        elif task.isFirstRun():
+            with EDatabase.batch():
+                EDatabase.markPartitionDone(task.filters, task.profile.syncName)
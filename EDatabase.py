@@ -5,70 +5,494 @@
 #   Utilisation: from EDatabase import EDatabase
 
 
+import json
 import sqlite3
-from EJob import EJob
+from contextlib import contextmanager
+from typing import Iterable, Tuple
+from EJob import EJob, DETAIL_ONLY_FIELDS
 from os.path import isfile
-from EAddress import EAddress
+from EAddress import EAddress, KEY_FIELD as ADDRESS_KEY
 from ECompany import ECompany
+from EHelper import EHelper
+from ERecord import ERecord, ISODate, SQL_TYPES
+from EMetrics import EMetrics, DB_INSERT_SECONDS, DB_ROWS_INSERTED_TOTAL, DB_COMMIT_SECONDS
 
 #Le nom des différentes tables
 JOBS = 'jobs'
 COMPANY = 'company'
 ADDRESS = "address"
+SYNC_STATE = 'sync_state'
+SYNC_SEEN = 'sync_seen'
+DETAILS_PENDING = 'job_details_pending'
+CRAWL_PARTITIONS = 'crawl_partitions'
+CRAWL_PLAN = 'crawl_plan'
+HIDDEN_COMPANIES = 'company_hidden'
+JOBS_FTS = 'jobs_fts'
+COMPANY_FTS = 'company_fts'
 DB_NAME:str = 'jobup.db'
 DEFAULT_ID_COL = '_id_'
+#Nom de l'état de synchronisation par défaut (recherche IT)
+DEFAULT_SYNC_NAME = 'default'
+#Nombre d'IDs récents gardés par état de synchronisation
+SYNC_SEEN_KEPT = 200
+#Statut d'un poste dans le checkpoint du premier lancement (table crawl_plan)
+PLAN_PENDING = 0
+PLAN_FETCHED = 1
+PLAN_FAILED = 2
+#Nombre de jours pendant lesquels une entreprise cachée (voir EScraper.HIDDEN_CODES) n'est pas redemandée
+HIDDEN_COMPANY_TTL_DAYS = 30
+#Colonnes du mode refresh : le hash du contenu du poste (voir EJob.getContentHash), et la date de sa dernière vérification
+CONTENT_HASH_COL = 'content_hash'
+LAST_CHECKED_COL = 'last_checked'
+#Nombre d'heures minimum entre deux vérifications d'un même poste
+REFRESH_MIN_AGE_HOURS = 24
+#Les colonnes indexées en texte intégral (FTS5), par table, avec leur poids dans le classement (bm25)
+FTS_COLUMNS:dict = {
+    JOBS: (('title', 10.0), ('template_text', 1.0), ('template_lead_text', 2.0), ('template_profession', 5.0)),
+    COMPANY: (('name', 10.0), ('description_fr', 1.0), ('description_de', 1.0), ('description_en', 1.0))
+}
+#Les références entre tables, au format {table -> {colonne -> (table référencée, colonne référencée)}}
+#Les références ne sont pas vérifiées par SQLite (PRAGMA foreign_keys désactivé) : les postes sont insérés avant leur entreprise,
+#et les entreprises cachées n'existent jamais en DB. Elles peuvent être contrôlées via PRAGMA foreign_key_check
+FOREIGN_KEYS:dict = {
+    JOBS: {'company_id': (COMPANY, 'id')},
+    COMPANY: {'address_id': (ADDRESS, ADDRESS_KEY), 'contact_address_id': (ADDRESS, ADDRESS_KEY)}
+}
+#Les tables des objets jobup, dans l'ordre de création (les tables référencées en premier)
+RECORD_TABLES:tuple = ((EAddress, ADDRESS), (ECompany, COMPANY), (EJob, JOBS))
+#unicode61 avec remove_diacritics : une recherche "developpeur" trouve "développeur"
+FTS_TOKENIZER = 'unicode61 remove_diacritics 2'
+#Nombre de mots autour des termes trouvés dans les extraits (voir searchJobs)
+SNIPPET_TOKENS = 16
+#Profil appliqué à chaque connexion (PRAGMA nom = valeur)
+#WAL permet aux lecteurs (Ex. scripts d'analyse) de lire la DB pendant que le scraper écrit
+#synchronous=NORMAL est sans risque de corruption en WAL, seule la dernière transaction peut être perdue en cas de coupure
+DEFAULT_PROFILE:dict = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    #256 Mo
+    'mmap_size': 268435456,
+    #Une valeur négative est en KiB (ici 64 Mo)
+    'cache_size': -65536
+}
+#Profil utilisé par getConn, modifiable via EDatabase.configure
+_profile:dict = DEFAULT_PROFILE
 
 class private:
     """Python n'ayant pas de classes privées, cette classe est utilisée à la place
     """
+    #Requêtes INSERT, par table et type d'objet
+    insertQueryCache:dict = {}
     
+    @staticmethod
+    def getTableDefinition(obj:type, tableName:str, extraCols:tuple = ()) -> str:
+        """Retourne la requête CREATE TABLE d'un type d'objet
+            Le type de chaque colonne est déduit du type déclaré du champ (voir ERecord.SQL_TYPES),
+            et les références vers les autres tables sont déclarées selon FOREIGN_KEYS
+
+        Args:
+            obj (type): La définition de l'objet (EJob, ECompany, etc...)
+            tableName (str): Le nom de la table
+            extraCols (tuple, optional): Des colonnes qui ne sont pas des champs de obj, au format ((nom, type SQL), ...). Defaults to ().
+
+        Returns:
+            str: La requête
+        """
+        foreignKeys:dict = FOREIGN_KEYS.get(tableName, {})
+        colsAndTypes:dict = {}
+
+        #Les colonnes sont les champs déclarés dans obj.FIELDS (voir ERecord), dans l'ordre de déclaration
+        for key, fieldType in obj.FIELDS:
+            #Les champs sont représentés comme des strings par défaut
+            colsAndTypes[key] = SQL_TYPES.get(fieldType, 'TEXT')
+            if key in foreignKeys:
+                refTable, refCol = foreignKeys[key]
+                colsAndTypes[key] += f' REFERENCES "{refTable}" ("{refCol}")'
+        for key, colType in extraCols:
+            colsAndTypes[key] = colType
+
+        #On set la PK après tous les autres, car le champ peut ne pas être
+        #dans obj. De plus, cela évite tous risques que celle-ci soit affectée
+        #par les autres champs
+        colsAndTypes[DEFAULT_ID_COL] = 'INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE'
+        #On formatte les colonnes au format SQLite
+        formattedCols = ', '.join(map(lambda item: f'"{item[0]}" {item[1]}', colsAndTypes.items()))
+        return f'CREATE TABLE "{tableName}" ({formattedCols});'
+
     @staticmethod
     def CreateTableFromObject(c:sqlite3.Connection, obj:type, tableName:str) -> None:
-        """Crée une table à partir d'un objet ou de son type
+        """Crée une table à partir d'un objet ou de son type (voir getTableDefinition)
 
         Args:
             c (sqlite3.Connection): La connexion à la table
             obj (type): La définition de l'objet (EJob, EScraper, etc...)
             tableName (str): Le nom de la table
-            pkColName (str): Le nom de la colonne qui sera la primary key
-            idColType (str): Le type de la colonne primary key (par défaut : INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE)
-
         """
         #Cette fonction travaille directement avec le type, donc si l'objet passé n'est pas
         #de type "type", on le réassigne à son type via la fonction type()
         if type(obj) is not type:
             obj = type(obj)
+        c.execute(private.getTableDefinition(obj, tableName))
+        c.commit()
 
-        colsAndTypes:dict = {}
+    @staticmethod
+    def migrateIndexes(c:sqlite3.Connection) -> None:
+        """Migration N°1 : crée les index sur les identifiants jobup
+            Les anciennes DB pouvant contenir des doublons (jobExists vérifiait _id_ au lieu de job_id),
+            on ne garde que la première occurrence de chaque identifiant avant de créer les index uniques
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        c.execute(f'DELETE FROM "{JOBS}" WHERE "{DEFAULT_ID_COL}" NOT IN (SELECT MIN("{DEFAULT_ID_COL}") FROM "{JOBS}" GROUP BY "job_id");')
+        c.execute(f'DELETE FROM "{COMPANY}" WHERE "{DEFAULT_ID_COL}" NOT IN (SELECT MIN("{DEFAULT_ID_COL}") FROM "{COMPANY}" GROUP BY "id");')
+        #Index uniques sur les identifiants, sur lesquels INSERT OR IGNORE se base pour ignorer les doublons
+        c.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{JOBS}_job_id" ON "{JOBS}" ("job_id");')
+        c.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{COMPANY}_id" ON "{COMPANY}" ("id");')
+        #Index utilisé par getAllMissingCompaniesID et updateJobCompanyID
+        c.execute(f'CREATE INDEX IF NOT EXISTS "idx_{JOBS}_company_id" ON "{JOBS}" ("company_id");')
+
+    @staticmethod
+    def migrateSyncState(c:sqlite3.Connection) -> None:
+        """Migration N°2 : crée les tables de l'état de synchronisation
+            sync_state contient la date de publication la plus récente en DB (high-water mark)
+            sync_seen contient les IDs des postes les plus récents, afin de reconnaître
+            les postes publiés à la même date que le high-water mark
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        c.execute(f'CREATE TABLE IF NOT EXISTS "{SYNC_STATE}" ("name" TEXT PRIMARY KEY, "high_water" TEXT, "updated_at" TEXT);')
+        c.execute(f'''CREATE TABLE IF NOT EXISTS "{SYNC_SEEN}" ("name" TEXT, "job_id" TEXT, "publication_date" TEXT,
+                        PRIMARY KEY ("name", "job_id"));''')
+
+    @staticmethod
+    def migrateDetailsPending(c:sqlite3.Connection) -> None:
+        """Migration N°3 : crée la table des postes dont le détail n'a pas encore été récupéré
+            (postes insérés directement depuis la recherche)
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        c.execute(f'CREATE TABLE IF NOT EXISTS "{DETAILS_PENDING}" ("job_id" TEXT PRIMARY KEY);')
+
+    @staticmethod
+    def migrateCrawlCheckpoint(c:sqlite3.Connection) -> None:
+        """Migration N°4 : crée les tables du checkpoint du premier lancement
+            crawl_partitions contient les recherches à parcourir, et si elles ont été entièrement parcourues
+            crawl_plan contient les IDs des postes trouvés par ces recherches, et leur statut (PLAN_*)
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        c.execute(f'CREATE TABLE IF NOT EXISTS "{CRAWL_PARTITIONS}" ("filters" TEXT PRIMARY KEY, "done" INTEGER NOT NULL DEFAULT 0);')
+        #L'ordre d'insertion (rowid) est l'ordre de la recherche
+        c.execute(f'CREATE TABLE IF NOT EXISTS "{CRAWL_PLAN}" ("job_id" TEXT PRIMARY KEY, "status" INTEGER NOT NULL DEFAULT {PLAN_PENDING}, "error" TEXT);')
+
+    @staticmethod
+    def migrateHiddenCompanies(c:sqlite3.Connection) -> None:
+        """Migration N°5 : crée la table des entreprises cachées (cache négatif)
+            Une entreprise cachée n'est pas redemandée avant HIDDEN_COMPANY_TTL_DAYS jours
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        c.execute(f'CREATE TABLE IF NOT EXISTS "{HIDDEN_COMPANIES}" ("id" TEXT PRIMARY KEY, "error" TEXT, "checked_at" TEXT);')
+
+    @staticmethod
+    def migrateAddressKeys(c:sqlite3.Connection) -> None:
+        """Migration N°6 : identifie les adresses par le hash de leur contenu (voir EAddress.computeKey)
+            Les adresses existantes reçoivent leur clef, les doublons sont supprimés,
+            et les entreprises référencent désormais leurs adresses par clef plutôt que par _id_
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        cols = list(map(lambda row: row[1], c.execute(f'PRAGMA table_info("{ADDRESS}")')))
+        if ADDRESS_KEY not in cols:
+            c.execute(f'ALTER TABLE "{ADDRESS}" ADD COLUMN "{ADDRESS_KEY}" TEXT;')
+
+        valueCols = ', '.join(map(lambda col: f'"{col}"', EAddress.getFieldNames()[:-1]))
+        rows = c.execute(f'SELECT "{DEFAULT_ID_COL}", {valueCols} FROM "{ADDRESS}" WHERE "{ADDRESS_KEY}" IS NULL').fetchall()
+        c.executemany(f'UPDATE "{ADDRESS}" SET "{ADDRESS_KEY}" = ? WHERE "{DEFAULT_ID_COL}" = ?',
+                      map(lambda row: (EAddress.computeKey(row[1:]), row[0]), rows))
+
+        for col in ('address_id', 'contact_address_id'):
+            c.execute(f'''UPDATE "{COMPANY}" SET "{col}" = (SELECT "{ADDRESS_KEY}" FROM "{ADDRESS}" a WHERE a."{DEFAULT_ID_COL}" = "{COMPANY}"."{col}")
+                        WHERE "{col}" IN (SELECT "{DEFAULT_ID_COL}" FROM "{ADDRESS}")''')
+        c.execute(f'DELETE FROM "{ADDRESS}" WHERE "{DEFAULT_ID_COL}" NOT IN (SELECT MIN("{DEFAULT_ID_COL}") FROM "{ADDRESS}" GROUP BY "{ADDRESS_KEY}");')
+        #Index unique sur lequel INSERT OR IGNORE se base pour ignorer les adresses déjà en DB
+        c.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{ADDRESS}_key" ON "{ADDRESS}" ("{ADDRESS_KEY}");')
+
+    @staticmethod
+    def migrateJobRefresh(c:sqlite3.Connection) -> None:
+        """Migration N°7 : ajoute aux postes le hash de leur contenu et la date de leur dernière vérification (mode refresh)
+            Les postes existants n'ont pas de hash, ils seront donc réécrits une fois lors de leur première vérification
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        cols = list(map(lambda row: row[1], c.execute(f'PRAGMA table_info("{JOBS}")')))
+        for col in (CONTENT_HASH_COL, LAST_CHECKED_COL):
+            if col not in cols:
+                c.execute(f'ALTER TABLE "{JOBS}" ADD COLUMN "{col}" TEXT;')
+        #Index utilisé par getJobsToRefresh (les postes jamais vérifiés, puis les moins récemment vérifiés)
+        c.execute(f'CREATE INDEX IF NOT EXISTS "idx_{JOBS}_{LAST_CHECKED_COL}" ON "{JOBS}" ("{LAST_CHECKED_COL}", "publication_date");')
+
+    @staticmethod
+    def createFullTextIndex(c:sqlite3.Connection, table:str, ftsTable:str) -> None:
+        """Crée l'index texte intégral (FTS5) d'une table, les triggers qui le tiennent à jour, et l'indexe
+            L'index ne stocke pas le texte (external content), il est lu depuis la table lors de la création des extraits
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+            table (str): La table indexée (JOBS ou COMPANY)
+            ftsTable (str): Le nom de l'index
+        """
+        cols = tuple(map(lambda col: col[0], FTS_COLUMNS[table]))
+        formattedCols = ', '.join(map(lambda col: f'"{col}"', cols))
+        newVals = ', '.join(map(lambda col: f'new."{col}"', cols))
+        oldVals = ', '.join(map(lambda col: f'old."{col}"', cols))
+        c.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS "{ftsTable}" USING fts5({formattedCols},
+                        content="{table}", content_rowid="{DEFAULT_ID_COL}", tokenize="{FTS_TOKENIZER}");''')
+        #Avec external content, l'ancienne version d'une ligne est retirée de l'index via la commande 'delete'
+        insertRow = f'INSERT INTO "{ftsTable}" (rowid, {formattedCols}) VALUES (new."{DEFAULT_ID_COL}", {newVals});'
+        deleteRow = f'''INSERT INTO "{ftsTable}" ("{ftsTable}", rowid, {formattedCols}) VALUES ('delete', old."{DEFAULT_ID_COL}", {oldVals});'''
+        c.execute(f'CREATE TRIGGER IF NOT EXISTS "{ftsTable}_ai" AFTER INSERT ON "{table}" BEGIN {insertRow} END;')
+        c.execute(f'CREATE TRIGGER IF NOT EXISTS "{ftsTable}_ad" AFTER DELETE ON "{table}" BEGIN {deleteRow} END;')
+        #Seules les modifications des colonnes indexées mettent l'index à jour (Ex. markJobsChecked ne le modifie pas)
+        c.execute(f'CREATE TRIGGER IF NOT EXISTS "{ftsTable}_au" AFTER UPDATE OF {formattedCols} ON "{table}" BEGIN {deleteRow} {insertRow} END;')
+        c.execute(f'''INSERT INTO "{ftsTable}" ("{ftsTable}") VALUES ('rebuild');''')
+
+    @staticmethod
+    def migrateFullTextIndex(c:sqlite3.Connection) -> None:
+        """Migration N°8 : crée les index texte intégral des postes et des entreprises (voir FTS_COLUMNS)
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        private.createFullTextIndex(c, JOBS, JOBS_FTS)
+        private.createFullTextIndex(c, COMPANY, COMPANY_FTS)
+
+    @staticmethod
+    def toMatchQuery(text:str) -> str:
+        """Convertit une recherche par mots-clefs en requête FTS5 : tous les mots doivent être présents
+            Chaque mot est mis entre guillemets, afin que la ponctuation (Ex. C++, .NET) ne soit pas interprétée
+            Un mot terminé par * est recherché comme préfixe (Ex. dévelop*)
 
-        #Procédure :
-        #1. On extrait tous les attributs du type
-        #2. Pour chaque attribut, on définit le type (au format SQLite) de celui-ci
-        #3. On utilise la liste d'attributs et de types pour générer la structure de la table
-        for key in vars(obj):
-            #On vérifie que la clef ne soit ni un attribut par défaut, ni une fonction
-            if key.startswith('__') or callable(getattr(obj,key, False)) is True:
+        Args:
+            text (str): Les mots-clefs
+
+        Returns:
+            str: La requête FTS5
+        """
+        terms = []
+        for word in text.split():
+            prefix = word.endswith('*') and len(word) > 1
+            word = word.rstrip('*').replace('"', '""')
+            if len(word) > 0:
+                terms.append(f'"{word}"' + ('*' if prefix else ''))
+        return ' '.join(terms)
+
+    @staticmethod
+    def fullTextSearch(table:str, ftsTable:str, idCol:str, cols:tuple, text:str, limit:int, offset:int, rawQuery:bool) -> list:
+        """Recherche dans l'index texte intégral d'une table, et retourne les résultats classés par pertinence (bm25)
+
+        Returns:
+            list: Un dictionnaire par résultat, avec idCol, cols, snippet (l'extrait le plus pertinent) et rank (plus petit = plus pertinent)
+        """
+        query = text if rawQuery else private.toMatchQuery(text)
+        if len(query) == 0:
+            return []
+        weights = ', '.join(map(lambda col: str(col[1]), FTS_COLUMNS[table]))
+        selectCols = ', '.join(map(lambda col: f't."{col}"', (idCol,) + cols))
+        rows = EDatabase.getConn().execute(f'''SELECT {selectCols}, snippet("{ftsTable}", -1, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet,
+                                                bm25("{ftsTable}", {weights}) AS rank
+                                            FROM "{ftsTable}" JOIN "{table}" t ON t."{DEFAULT_ID_COL}" = "{ftsTable}".rowid
+                                            WHERE "{ftsTable}" MATCH ? ORDER BY rank LIMIT ? OFFSET ?''', (query, limit, offset)).fetchall()
+        names = (idCol,) + cols + ('snippet', 'rank')
+        return list(map(lambda row: dict(zip(names, row)), rows))
+
+    @staticmethod
+    def rebuildTable(c:sqlite3.Connection, obj:type, table:str) -> None:
+        """Recrée une table avec le schéma typé de son objet (voir getTableDefinition), et y copie ses lignes converties
+            SQLite ne permettant pas de modifier le type d'une colonne, la table est copiée puis remplacée
+            Les colonnes qui ne sont pas des champs (Ex. content_hash), les _id_, les index et les triggers sont conservés
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+            obj (type): La définition de l'objet (EJob, ECompany, etc...)
+            table (str): Le nom de la table
+        """
+        oldCols = list(map(lambda row: (row[1], row[2] or 'TEXT'), c.execute(f'PRAGMA table_info("{table}")')))
+        oldNames = set(map(lambda col: col[0], oldCols))
+        fields = obj.getFieldNames()
+        fieldTypes = obj.getFieldTypes()
+        extraCols = tuple(col for col in oldCols if col[0] not in fieldTypes and col[0] != DEFAULT_ID_COL)
+        #Les index et triggers sont supprimés avec la table, ils sont recréés à l'identique
+        schema = c.execute('''SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL''',
+                           (table,)).fetchall()
+
+        newTable = f'{table}_typed'
+        c.execute(private.getTableDefinition(obj, newTable, extraCols))
+        cols = (DEFAULT_ID_COL,) + fields + tuple(map(lambda col: col[0], extraCols))
+        #Un champ ajouté après la création de la table n'a pas de colonne, il vaut alors NULL
+        selectCols = ', '.join(map(lambda col: f'"{col}"' if col in oldNames else 'NULL', cols))
+        insertCols = ', '.join(map(lambda col: f'"{col}"', cols))
+        nbFields = len(fields)
+
+        def convertRow(row:tuple) -> tuple:
+            values = tuple(map(lambda field, val: ERecord.toSQLValue(val, fieldTypes[field]), fields, row[1:nbFields + 1]))
+            return (row[0],) + values + row[nbFields + 1:]
+
+        c.executemany(f'INSERT INTO "{newTable}" ({insertCols}) VALUES ({", ".join("?" * len(cols))})',
+                      map(convertRow, c.execute(f'SELECT {selectCols} FROM "{table}"')))
+        c.execute(f'DROP TABLE "{table}"')
+        c.execute(f'ALTER TABLE "{newTable}" RENAME TO "{table}"')
+        for row in schema:
+            c.execute(row[0])
+
+    @staticmethod
+    def rekeyAddresses(c:sqlite3.Connection) -> None:
+        """Recalcule la clef des adresses (voir EAddress.computeKey) à partir de la valeur de leurs colonnes,
+            et met à jour les références des entreprises (address_id, contact_address_id)
+            Deux adresses ayant désormais la même clef sont fusionnées : seule la première est gardée
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        valueCols = ', '.join(map(lambda col: f'"{col}"', EAddress.getFieldNames()[:-1]))
+        rows = c.execute(f'SELECT "{ADDRESS_KEY}", {valueCols} FROM "{ADDRESS}" ORDER BY "{DEFAULT_ID_COL}"').fetchall()
+        keys = set(map(lambda row: row[0], rows))
+        for row in rows:
+            oldKey, newKey = row[0], EAddress.computeKey(row[1:])
+            if oldKey == newKey:
                 continue
-            elif type(getattr(EJob, key, False)) is int:
-                colsAndTypes[key] = "INTEGER"
-            #Les champs sont représentés comme des strings par défaut
+            if newKey in keys:
+                c.execute(f'DELETE FROM "{ADDRESS}" WHERE "{ADDRESS_KEY}" = ?', (oldKey,))
             else:
-                colsAndTypes[key] = "TEXT"
+                c.execute(f'UPDATE "{ADDRESS}" SET "{ADDRESS_KEY}" = ? WHERE "{ADDRESS_KEY}" = ?', (newKey, oldKey))
+                keys.add(newKey)
+            keys.discard(oldKey)
+            for col in ('address_id', 'contact_address_id'):
+                c.execute(f'UPDATE "{COMPANY}" SET "{col}" = ? WHERE "{col}" = ?', (newKey, oldKey))
 
-        #On set la PK après tous les autres, car le champ peut ne pas être
-        #dans obj. De plus, cela évite tous risques que celle-ci soit affectée
-        #par les autres champs
-        colsAndTypes[DEFAULT_ID_COL] = 'INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE'
-        formattedCols:str = ''
-        #On formatte les colonnes au format SQLite
-        for key, val in colsAndTypes.items():
-            formattedCols += f'"{key}"  {val},'
-        #On retire la dernière virgule
-        formattedCols = formattedCols[:-1]
-        c.execute(f'''CREATE TABLE "{tableName}" ({formattedCols});''')
-        c.commit()
-        
-        
+    @staticmethod
+    def migrateTypedSchema(c:sqlite3.Connection) -> None:
+        """Migration N°9 : passe les tables du schéma tout en TEXT au schéma typé (INTEGER, REAL, dates ISO en UTC, références)
+            Les hash des postes (voir EJob.computeContentHash) et les clefs des adresses (Ex. une latitude 46 devient 46.0)
+            sont recalculés à partir des valeurs converties, et les IDs des entreprises cachées deviennent des INTEGER, comme company.id et jobs.company_id
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        #company_id valait '' pour les postes des entreprises cachées (anciennes versions), la conversion en fait des NULL
+        for obj, table in RECORD_TABLES:
+            private.rebuildTable(c, obj, table)
+
+        fieldCols = ', '.join(map(lambda col: f'"{col}"', EJob.getFieldNames()))
+        rows = c.execute(f'SELECT "{DEFAULT_ID_COL}", {fieldCols} FROM "{JOBS}" WHERE "{CONTENT_HASH_COL}" IS NOT NULL').fetchall()
+        c.executemany(f'UPDATE "{JOBS}" SET "{CONTENT_HASH_COL}" = ? WHERE "{DEFAULT_ID_COL}" = ?',
+                      map(lambda row: (EJob.computeContentHash(row[1:]), row[0]), rows))
+        private.rekeyAddresses(c)
+
+        c.execute(f'CREATE TABLE "{HIDDEN_COMPANIES}_typed" ("id" INTEGER PRIMARY KEY, "error" TEXT, "checked_at" TEXT);')
+        #Les IDs qui ne sont pas des nombres ne peuvent correspondre à aucune entreprise, ils sont ignorés
+        c.execute(f'''INSERT OR IGNORE INTO "{HIDDEN_COMPANIES}_typed" (id, error, checked_at)
+                        SELECT CAST(id AS INTEGER), error, checked_at FROM "{HIDDEN_COMPANIES}" WHERE CAST(CAST(id AS INTEGER) AS TEXT) = id''')
+        c.execute(f'DROP TABLE "{HIDDEN_COMPANIES}"')
+        c.execute(f'ALTER TABLE "{HIDDEN_COMPANIES}_typed" RENAME TO "{HIDDEN_COMPANIES}"')
+
+    @staticmethod
+    def migrateCrawlProfiles(c:sqlite3.Connection) -> None:
+        """Migration N°10 : rattache les partitions du checkpoint à l'état de synchronisation de leur profil (voir ECrawlProfile)
+            Deux profils peuvent avoir une même partition (Ex. une catégorie commune), la clef devient donc (sync_name, filters)
+            Les partitions existantes appartiennent au profil IT (DEFAULT_SYNC_NAME)
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        c.execute(f'''CREATE TABLE "{CRAWL_PARTITIONS}_profiles" ("sync_name" TEXT NOT NULL, "filters" TEXT NOT NULL,
+                        "done" INTEGER NOT NULL DEFAULT 0, PRIMARY KEY ("sync_name", "filters"));''')
+        #L'ordre d'insertion (rowid) est gardé, afin que les partitions soient reprises dans le même ordre
+        c.execute(f'''INSERT INTO "{CRAWL_PARTITIONS}_profiles" (sync_name, filters, done)
+                        SELECT ?, filters, done FROM "{CRAWL_PARTITIONS}" ORDER BY rowid''', (DEFAULT_SYNC_NAME,))
+        c.execute(f'DROP TABLE "{CRAWL_PARTITIONS}"')
+        c.execute(f'ALTER TABLE "{CRAWL_PARTITIONS}_profiles" RENAME TO "{CRAWL_PARTITIONS}"')
+
+    @staticmethod
+    def migrateSyncDates(c:sqlite3.Connection) -> None:
+        """Migration N°11 : convertit les dates de l'état de synchronisation en UTC (voir ISODate), comme celles de la table jobs
+            Les dates étaient stockées telles que retournées par l'API, avec leur fuseau horaire
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        rows = c.execute(f'SELECT name, high_water FROM "{SYNC_STATE}"').fetchall()
+        c.executemany(f'UPDATE "{SYNC_STATE}" SET high_water = ? WHERE name = ?',
+                      map(lambda row: (ERecord.toSQLValue(row[1], ISODate), row[0]), rows))
+        rows = c.execute(f'SELECT name, job_id, publication_date FROM "{SYNC_SEEN}"').fetchall()
+        c.executemany(f'UPDATE "{SYNC_SEEN}" SET publication_date = ? WHERE name = ? AND job_id = ?',
+                      map(lambda row: (ERecord.toSQLValue(row[2], ISODate), row[0], row[1]), rows))
+
+    @staticmethod
+    def getUpsertQuery(table:str, recordType:type, conflictCol:str) -> str:
+        """Retourne la requête UPSERT paramétrée d'une table : les objets existants (même conflictCol) sont mis à jour
+            La requête a un paramètre par champ de recordType, suivi du hash du contenu (CONTENT_HASH_COL)
+
+        Args:
+            table (str): Le nom de la table
+            recordType (type): Le type des objets (EJob)
+            conflictCol (str): La colonne de l'index unique (Ex. job_id)
+
+        Returns:
+            str: La requête
+        """
+        key = (table, recordType, conflictCol)
+        if key not in private.insertQueryCache:
+            cols = recordType.getFieldNames() + (CONTENT_HASH_COL,)
+            formattedCols = ', '.join(map(lambda col: f'"{col}"', cols))
+            params = ', '.join('?' * len(cols))
+            setStr = ', '.join(map(lambda col: f'"{col}" = excluded."{col}"', cols))
+            private.insertQueryCache[key] = f'''INSERT INTO "{table}" ({formattedCols}, "{LAST_CHECKED_COL}") VALUES ({params}, datetime('now'))
+                                                ON CONFLICT ("{conflictCol}") DO UPDATE SET {setStr}, "{LAST_CHECKED_COL}" = excluded."{LAST_CHECKED_COL}";'''
+        return private.insertQueryCache[key]
+
+    @staticmethod
+    def isLegacySyncState(c:sqlite3.Connection, name:str) -> bool:
+        """Retourne True si l'état DEFAULT_SYNC_NAME doit être déduit de la table jobs : la DB a été créée avant
+            les états de synchronisation, aucun état n'a donc été sauvegardé
+            Si d'autres profils ont sauvegardé leur état, les postes en DB ne sont pas ceux du profil par défaut
+        """
+        return name == DEFAULT_SYNC_NAME and c.execute(f'SELECT 1 FROM "{SYNC_STATE}" LIMIT 1').fetchone() is None
+
+    @staticmethod
+    def serializeFilters(filters:dict) -> str:
+        """Retourne la clef d'une partition dans crawl_partitions
+
+        Args:
+            filters (dict): Les filtres de la partition
+
+        Returns:
+            str: Les filtres au format JSON, clefs triées
+        """
+        return json.dumps(filters, sort_keys=True)
+
+    @staticmethod
+    def migrate(c:sqlite3.Connection) -> None:
+        """Applique les migrations qui n'ont pas encore été appliquées à la DB
+            La version du schéma est stockée dans PRAGMA user_version (0 pour une DB sans migrations)
+
+        Args:
+            c (sqlite3.Connection): La connexion à la DB
+        """
+        version = c.execute('PRAGMA user_version').fetchone()[0]
+        for i in range(version, len(MIGRATIONS)):
+            MIGRATIONS[i](c)
+            #PRAGMA n'accepte pas de paramètres, la version est donc formatée directement
+            c.execute(f'PRAGMA user_version = {i + 1}')
+            c.commit()
 
     @staticmethod
     def createTables() -> sqlite3.Connection:
@@ -77,13 +501,26 @@ class private:
             sqlite3.Connection: La connexion à la nouvelle DB
         """
         if not isfile(DB_NAME):
-            c = sqlite3.connect(DB_NAME)
+            c = private.connect()
 
         private.CreateTableFromObject(c, EAddress, ADDRESS)
         private.CreateTableFromObject(c, ECompany, COMPANY)
         private.CreateTableFromObject(c, EJob, JOBS)
         return c
 
+    @staticmethod
+    def connect() -> sqlite3.Connection:
+        """Ouvre une connexion à DB_NAME, et y applique le profil configuré
+
+        Returns:
+            sqlite3.Connection: La connexion
+        """
+        c = sqlite3.connect(DB_NAME)
+        for pragma, val in _profile.items():
+            #PRAGMA n'accepte pas de paramètres, les valeurs viennent du profil et non de l'extérieur
+            c.execute(f'PRAGMA {pragma} = {val}')
+        return c
+
     @staticmethod
     def valAlreadyInDB(conn, val:str, table:str, col:str) -> bool:
         """Retourne True si une colonne contenant val existe déjà dans la table spécifiée
@@ -96,39 +533,84 @@ class private:
         Returns:
             bool: Est-ce que la valeur est déjà présente dans la colonne spécifiée
         """
-        queryResult = conn.execute(f"SELECT {col} FROM {table} WHERE {col} = '{val}'").fetchone()
+        queryResult = conn.execute(f"SELECT {col} FROM {table} WHERE {col} = ?", (val,)).fetchone()
         return (queryResult is not None)
 
     @staticmethod
-    def insertObj(conn:sqlite3.Connection, obj:object, table:str) -> str:
+    def getInsertQuery(table:str, recordType:type) -> str:
+        """Retourne la requête INSERT OR IGNORE paramétrée d'une table
+            Le texte de la requête étant toujours le même, sqlite3 réutilise le statement compilé
+
+        Args:
+            table (str): Le nom de la table
+            recordType (type): Le type des objets insérés (EJob, ECompany, etc...)
+
+        Returns:
+            str: La requête, avec un paramètre (?) par champ de recordType
+        """
+        key = (table, recordType)
+        if key not in private.insertQueryCache:
+            cols = recordType.getFieldNames()
+            formattedCols = ', '.join(map(lambda col: f'"{col}"', cols))
+            params = ', '.join('?' * len(cols))
+            private.insertQueryCache[key] = f'INSERT OR IGNORE INTO "{table}" ({formattedCols}) VALUES ({params});'
+        return private.insertQueryCache[key]
+
+    @staticmethod
+    def objToRow(obj:object, cols:tuple) -> tuple:
+        """Retourne les valeurs de certains champs d'un objet, dans l'ordre de cols
+
+        Args:
+            obj (object): L'objet
+            cols (tuple): Les champs
+
+        Returns:
+            tuple: Les valeurs, prêtes à être passées en paramètres à sqlite3
+        """
+        fieldTypes = type(obj).getFieldTypes()
+        return tuple(ERecord.toSQLValue(getattr(obj, col, None), fieldTypes.get(col, str)) for col in cols)
+
+    @staticmethod
+    def insertObj(conn:sqlite3.Connection, obj:ERecord, table:str) -> str:
         """Insère un objet en base de données, et retourne son id
 
         Args:
             conn (sqlite3.Connection): La connexion à utiliser
-            obj (object): L'objet à mettre en DB
+            obj (ERecord): L'objet à mettre en DB
             table (str): Le nom de la table
 
         Returns:
-            str: L'ID du nouvel objet
+            str: L'ID du nouvel objet, ou None si l'objet existait déjà
         """
-        #On récupère la liste de noms de colonne, et on ajoute des quotes ("") autour de chaque nom de colonne
-        #pour la query
-        objData:dict = {}
-        for key, val in obj.__dict__.items():
-            if key.startswith('__') is False and callable(getattr(obj, key, False)) is False:
-                objData[key] = val
-
-        cols = map(lambda val: f'"{val}"', objData.keys())
-        #La documentation sqlite spécifie que les strings doivent être échappés avec des apostrophes
-        #Ainsi, on entoure chaque valeur d'apostrophes.
-        #On double aussi tous les apostrophes, afin de les échapper
-        #https://www.sqlite.org/lang_expr.html
-        data = map(lambda val: "'" + str(val).replace("'", "''") + "'" ,objData.values())
-        #On génère la liste de colonnes et de valeurs séparées par des virgules via string.join
-        query = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(data)});"
         c = conn.cursor()
-        c.execute(query)
+        with EMetrics.timer(DB_INSERT_SECONDS, {'table': table}):
+            c.execute(private.getInsertQuery(table, type(obj)), obj.toTuple())
+        EMetrics.increment(DB_ROWS_INSERTED_TOTAL, {'table': table}, max(c.rowcount, 0))
+        if c.rowcount == 0:
+            return None
         return c.lastrowid
+
+    @staticmethod
+    def insertMany(conn:sqlite3.Connection, objs:Iterable, table:str) -> int:
+        """Insère plusieurs objets du même type en base de données, via une seule requête préparée (executemany)
+            Les objets dont l'identifiant existe déjà sont ignorés (INSERT OR IGNORE)
+
+        Args:
+            conn (sqlite3.Connection): La connexion à utiliser
+            objs (Iterable): Les objets (ERecord) à mettre en DB
+            table (str): Le nom de la table
+
+        Returns:
+            int: Le nombre d'objets insérés
+        """
+        objs = [obj for obj in objs if obj is not None]
+        if len(objs) == 0:
+            return 0
+        c = conn.cursor()
+        with EMetrics.timer(DB_INSERT_SECONDS, {'table': table}):
+            c.executemany(private.getInsertQuery(table, type(objs[0])), map(ERecord.toTuple, objs))
+        EMetrics.increment(DB_ROWS_INSERTED_TOTAL, {'table': table}, max(c.rowcount, 0))
+        return max(c.rowcount, 0)
     
     @staticmethod
     def selectOne(conn:sqlite3.Connection, cols:list, table:str, conditions:str = '', sortCol:str = ''):
@@ -234,6 +716,22 @@ class private:
         return conn.execute(f"SELECT {columnsStr} FROM {table} {conditionsStr} {sortStr}")
 
 
+#Les migrations du schéma, dans l'ordre. L'index + 1 correspond à la version du schéma après la migration
+#/!\ Les migrations déjà publiées ne doivent jamais être modifiées ou réordonnées /!\
+MIGRATIONS:list = [
+    private.migrateIndexes,
+    private.migrateSyncState,
+    private.migrateDetailsPending,
+    private.migrateCrawlCheckpoint,
+    private.migrateHiddenCompanies,
+    private.migrateAddressKeys,
+    private.migrateJobRefresh,
+    private.migrateFullTextIndex,
+    private.migrateTypedSchema,
+    private.migrateCrawlProfiles,
+    private.migrateSyncDates
+]
+
 _private = private()
 _conn:sqlite3.Connection = None
 
@@ -252,13 +750,15 @@ class EDatabase:
             if not isfile(DB_NAME):
                 _conn = private.createTables()
             else:
-                _conn = sqlite3.connect(DB_NAME)
+                _conn = private.connect()
+            private.migrate(_conn)
         
         return _conn
 
     @staticmethod
     def insertJob(job:EJob) -> str:
         """Insère un job dans la base de données
+            Le job est ignoré s'il existe déjà (index unique sur job_id)
 
         Args:
             job (EJob): Le job à insérer
@@ -266,15 +766,25 @@ class EDatabase:
         Returns:
             str: l'id du nouveau job
         """
-        #On vérifie que le job n'existe pas déjà
-        if(EDatabase.jobExists(job.job_id)):
-            return
-
         return private.insertObj(EDatabase.getConn(), job, JOBS)
+
+    @staticmethod
+    def insertJobs(jobs:Iterable) -> int:
+        """Insère plusieurs jobs dans la base de données, en une seule requête
+            Les jobs existant déjà sont ignorés (index unique sur job_id)
+
+        Args:
+            jobs (Iterable): Les jobs (EJob) à insérer
+
+        Returns:
+            int: Le nombre de jobs insérés
+        """
+        return private.insertMany(EDatabase.getConn(), jobs, JOBS)
         
     @staticmethod
     def insertCompany(company:ECompany) -> str:
         """Insère une entreprise dans la base de données
+            L'entreprise est ignorée si elle existe déjà (index unique sur id)
 
         Args:
             company (ECompany): L'entreprise à insérer
@@ -282,26 +792,102 @@ class EDatabase:
         Returns:
             str: l'id de la nouvelle entreprise
         """
-        #On vérifie que l'entreprise n'existe pas déjà
-        if(EDatabase.companyExists(company.id)):
-            return
-        
+        EDatabase.insertAddresses(EAddress.popPending())
         return private.insertObj(EDatabase.getConn(), company, COMPANY)
 
+    @staticmethod
+    def insertCompanies(companies:Iterable) -> int:
+        """Insère plusieurs entreprises dans la base de données, en une seule requête
+            Les entreprises existant déjà sont ignorées (index unique sur id)
+            Les adresses mappées avec les entreprises (voir EAddress.register) sont insérées en même temps
+
+        Args:
+            companies (Iterable): Les entreprises (ECompany) à insérer
+
+        Returns:
+            int: Le nombre d'entreprises insérées
+        """
+        EDatabase.insertAddresses(EAddress.popPending())
+        return private.insertMany(EDatabase.getConn(), companies, COMPANY)
+
     @staticmethod
     def insertAddress(address:EAddress) -> str:
-        #insertObj récupère tous les attributs afin de les insérer en base de données
-        #on veut cependant que l'ID ne soit pas spécifiée dans la requête
-        #car celui-ci est de type autoincrement
-        if getattr(address, DEFAULT_ID_COL, False) is not False:
-            delattr(address, DEFAULT_ID_COL)
-        return private.insertObj(EDatabase.getConn(), address, ADDRESS)
+        """Insère une adresse dans la base de données
+            L'adresse est ignorée si elle existe déjà (index unique sur address_key)
+
+        Args:
+            address (EAddress): L'adresse à insérer
+
+        Returns:
+            str: La clef de l'adresse
+        """
+        key = address.getKey()
+        private.insertObj(EDatabase.getConn(), address, ADDRESS)
+        return key
+
+    @staticmethod
+    def insertAddresses(addresses:Iterable) -> int:
+        """Insère plusieurs adresses dans la base de données, en une seule requête
+            Les adresses existant déjà sont ignorées (index unique sur address_key)
+
+        Args:
+            addresses (Iterable): Les adresses (EAddress) à insérer
+
+        Returns:
+            int: Le nombre d'adresses insérées
+        """
+        addresses = [address for address in addresses if address is not None]
+        #La clef fait partie des colonnes insérées, elle doit être calculée avant l'insertion
+        for address in addresses:
+            address.getKey()
+        return private.insertMany(EDatabase.getConn(), addresses, ADDRESS)
 
     @staticmethod
     def saveChanges():
         """Sauvegarde l'état de la base de données
         """
-        EDatabase.getConn().commit()
+        with EMetrics.timer(DB_COMMIT_SECONDS):
+            EDatabase.getConn().commit()
+
+    @staticmethod
+    @contextmanager
+    def batch():
+        """Délimite un batch d'écritures : toutes les écritures du bloc sont faites dans une seule transaction,
+            validée à la sortie du bloc (ou annulée si une exception est levée)
+            Utilisation : with EDatabase.batch(): EDatabase.insertJobs(jobs)
+        """
+        conn = EDatabase.getConn()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        with EMetrics.timer(DB_COMMIT_SECONDS):
+            conn.commit()
+
+    @staticmethod
+    def configure(dbName:str = DB_NAME, profile:dict = DEFAULT_PROFILE):
+        """Change le fichier de base de données et/ou le profil de connexion
+            La connexion existante est fermée, la prochaine opération en ouvrira une nouvelle
+
+        Args:
+            dbName (str, optional): Le fichier de base de données. Defaults to DB_NAME.
+            profile (dict, optional): Les PRAGMA à appliquer ({} pour garder ceux de SQLite). Defaults to DEFAULT_PROFILE.
+        """
+        global _profile, DB_NAME
+        EDatabase.close()
+        DB_NAME = dbName
+        _profile = dict(profile or {})
+
+    @staticmethod
+    def close():
+        """Valide les changements en cours et ferme la connexion
+        """
+        global _conn
+        if type(_conn) is sqlite3.Connection:
+            _conn.commit()
+            _conn.close()
+        _conn = None
 
     @staticmethod
     def jobExists(id:str) -> bool:
@@ -313,7 +899,8 @@ class EDatabase:
         Returns:
             bool: Est-ce que le job existe déjà
         """
-        return private.valAlreadyInDB(EDatabase.getConn(), id, JOBS, DEFAULT_ID_COL)
+        #Recherche via l'index unique sur job_id
+        return private.valAlreadyInDB(EDatabase.getConn(), id, JOBS, 'job_id')
     
     @staticmethod
     def companyExists(id:int) -> bool:
@@ -325,7 +912,8 @@ class EDatabase:
         Returns:
             bool: Est-ce que l'entreprise existe déjà
         """
-        return private.valAlreadyInDB(EDatabase.getConn(), id, COMPANY, DEFAULT_ID_COL)
+        #Recherche via l'index unique sur id
+        return private.valAlreadyInDB(EDatabase.getConn(), id, COMPANY, 'id')
     
     @staticmethod
     def countJobs() -> int:
@@ -340,13 +928,30 @@ class EDatabase:
     @staticmethod
     def getAllMissingCompaniesID() -> list:
         """Retourne l'ID (jobup) de toutes les entreprises qui sont dans jobs mais pas dans companies
+            Les entreprises cachées depuis moins de HIDDEN_COMPANY_TTL_DAYS jours sont ignorées, les suivantes sont redemandées
+            La company_id des postes d'une entreprise cachée est gardée : le cache des entreprises cachées suffit à les ignorer
 
         Returns:
             list: Toutes les entreprises dont l'ID est trouvable dans job mais pas dans company
         """
-        queryResult = private.selectAll(EDatabase.getConn(), 'DISTINCT company_id', JOBS, f"company_id NOT IN (SELECT id FROM {COMPANY}) AND length(company_id) > 0")
+        #company.id, jobs.company_id et company_hidden.id sont des INTEGER : les index sont utilisés sans conversion
+        queryResult = private.selectAll(EDatabase.getConn(), 'DISTINCT company_id', JOBS,
+            f'''company_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM "{COMPANY}" WHERE "{COMPANY}".id = {JOBS}.company_id)
+                AND NOT EXISTS (SELECT 1 FROM "{HIDDEN_COMPANIES}" h WHERE h.id = {JOBS}.company_id
+                                AND h.checked_at > datetime('now', '-{int(HIDDEN_COMPANY_TTL_DAYS)} days'))''')
         return queryResult
 
+    @staticmethod
+    def hideCompanies(companies:Iterable):
+        """Ajoute des entreprises au cache des entreprises cachées, ou repousse leur expiration
+
+        Args:
+            companies (Iterable): Les entreprises cachées, au format (ID, code d'erreur)
+        """
+        EDatabase.getConn().executemany(f'''INSERT OR REPLACE INTO "{HIDDEN_COMPANIES}" (id, error, checked_at)
+                                            VALUES (?, ?, datetime('now'))''',
+                                        map(lambda company: (ERecord.toSQLValue(company[0], int), company[1]), companies))
+
     @staticmethod
     def updateJobCompanyID(jobID:str, newID:str):
         """Update la company_id d'un job
@@ -355,4 +960,364 @@ class EDatabase:
             jobID (str): L'ID du job à modifier
             newID (str): La nouvelle ID
         """        
-        private.update(EDatabase.getConn(), JOBS, {"company_id": newID}, 'company_id  = ' + str(jobID))
\ No newline at end of file
+        private.update(EDatabase.getConn(), JOBS, {"company_id": newID}, 'company_id  = ' + str(jobID))
+
+    @staticmethod
+    def getSyncState(name:str = DEFAULT_SYNC_NAME) -> Tuple[str, set]:
+        """Retourne l'état de synchronisation : la date de publication la plus récente en DB,
+            et les IDs des postes les plus récents
+            Si aucun état n'a été sauvegardé (DB créée avant les états de synchronisation), l'état DEFAULT_SYNC_NAME
+            est déduit de la table jobs. Les autres états (voir ECrawlProfile) ne concernent qu'une partie des postes,
+            ils sont donc vides tant qu'ils n'ont pas été sauvegardés
+
+        Args:
+            name (str, optional): Le nom de l'état. Defaults to DEFAULT_SYNC_NAME.
+
+        Returns:
+            Tuple[str, set]: Le high-water mark ('' si inconnu), et les IDs récents
+        """
+        conn = EDatabase.getConn()
+        row = conn.execute(f'SELECT high_water FROM "{SYNC_STATE}" WHERE name = ?', (name,)).fetchone()
+        if row is not None:
+            seen = conn.execute(f'SELECT job_id FROM "{SYNC_SEEN}" WHERE name = ?', (name,)).fetchall()
+            return row[0], set(map(lambda r: r[0], seen))
+        if not private.isLegacySyncState(conn, name):
+            return '', set()
+
+        row = conn.execute(f'SELECT MAX(publication_date) FROM "{JOBS}"').fetchone()
+        if row is None or row[0] is None:
+            return '', set()
+        seen = conn.execute(f'SELECT job_id FROM "{JOBS}" WHERE publication_date = ?', (row[0],)).fetchall()
+        return row[0], set(map(lambda r: r[0], seen))
+
+    @staticmethod
+    def hasSyncState(name:str = DEFAULT_SYNC_NAME) -> bool:
+        """Retourne si la recherche d'un état de synchronisation a déjà été parcourue (voir getSyncState)
+            Dans le cas contraire, le premier lancement de cette recherche doit être fait
+
+        Args:
+            name (str, optional): Le nom de l'état. Defaults to DEFAULT_SYNC_NAME.
+
+        Returns:
+            bool: True si l'état existe
+        """
+        conn = EDatabase.getConn()
+        if conn.execute(f'SELECT 1 FROM "{SYNC_STATE}" WHERE name = ?', (name,)).fetchone() is not None:
+            return True
+        #DB créée avant les états de synchronisation : l'état par défaut est déduit de la table jobs
+        return private.isLegacySyncState(conn, name) and EDatabase.countJobs() > 0
+
+    @staticmethod
+    def updateSyncState(jobs:Iterable, name:str = DEFAULT_SYNC_NAME):
+        """Met à jour l'état de synchronisation avec les postes insérés
+            Les changements sont validés avec la transaction en cours (voir EDatabase.batch)
+
+        Args:
+            jobs (Iterable): Les postes insérés (EJob)
+            name (str, optional): Le nom de l'état. Defaults to DEFAULT_SYNC_NAME.
+        """
+        conn = EDatabase.getConn()
+        highWater, _ = EDatabase.getSyncState(name)
+        highWaterDate = EHelper.parseDate(highWater)
+        seenRows = []
+        for job in jobs:
+            if job is None:
+                continue
+            #Les dates sont stockées en UTC, comme dans jobs : les dates de l'API ont un fuseau horaire variable
+            #(+01:00 / +02:00 selon l'heure d'été), leur tri en texte serait donc faux
+            publicationDate = ERecord.toSQLValue(job.publication_date, ISODate)
+            seenRows.append((name, job.job_id, publicationDate))
+            jobDate = EHelper.parseDate(publicationDate)
+            if jobDate is not None and (highWaterDate is None or jobDate > highWaterDate):
+                highWater, highWaterDate = publicationDate, jobDate
+
+        conn.execute(f'''INSERT INTO "{SYNC_STATE}" (name, high_water, updated_at) VALUES (?, ?, datetime('now'))
+                        ON CONFLICT(name) DO UPDATE SET high_water = excluded.high_water, updated_at = excluded.updated_at''',
+                        (name, highWater))
+        conn.executemany(f'INSERT OR REPLACE INTO "{SYNC_SEEN}" (name, job_id, publication_date) VALUES (?, ?, ?)', seenRows)
+        #On ne garde que les IDs les plus récents
+        conn.execute(f'''DELETE FROM "{SYNC_SEEN}" WHERE name = ? AND job_id NOT IN
+                        (SELECT job_id FROM "{SYNC_SEEN}" WHERE name = ? ORDER BY publication_date DESC LIMIT ?)''',
+                        (name, name, SYNC_SEEN_KEPT))
+
+    @staticmethod
+    def queueJobDetails(jobIDs:Iterable):
+        """Ajoute des postes à la liste des postes dont le détail doit être récupéré
+
+        Args:
+            jobIDs (Iterable): Les IDs des postes
+        """
+        EDatabase.getConn().executemany(f'INSERT OR IGNORE INTO "{DETAILS_PENDING}" (job_id) VALUES (?)',
+                                        map(lambda id: (id,), jobIDs))
+
+    @staticmethod
+    def getPendingJobDetails(limit:int = -1) -> list:
+        """Retourne les IDs des postes dont le détail n'a pas encore été récupéré, les plus récents en premier
+
+        Args:
+            limit (int, optional): Le nombre maximum d'IDs (-1 pour tous). Defaults to -1.
+
+        Returns:
+            list: Les IDs des postes
+        """
+        queryResult = EDatabase.getConn().execute(f'''SELECT p.job_id FROM "{DETAILS_PENDING}" p
+                                                    JOIN "{JOBS}" j ON j.job_id = p.job_id
+                                                    ORDER BY j.publication_date DESC, j."{DEFAULT_ID_COL}" DESC LIMIT ?''', (limit,)).fetchall()
+        return list(map(lambda row: row[0], queryResult))
+
+    @staticmethod
+    def dropPendingJobDetails(jobIDs:Iterable):
+        """Retire des postes de la liste des postes dont le détail doit être récupéré
+            (Ex. le poste n'existe plus sur jobup)
+
+        Args:
+            jobIDs (Iterable): Les IDs des postes
+        """
+        EDatabase.getConn().executemany(f'DELETE FROM "{DETAILS_PENDING}" WHERE job_id = ?', map(lambda id: (id,), jobIDs))
+
+    @staticmethod
+    def updateJobsDetails(jobs:Iterable) -> int:
+        """Met à jour les champs disponibles uniquement via le détail (DETAIL_ONLY_FIELDS) de postes déjà en DB,
+            puis retire ceux-ci de la liste des postes en attente
+
+        Args:
+            jobs (Iterable): Les postes (EJob), récupérés via EScraper.getJobFromID
+
+        Returns:
+            int: Le nombre de postes mis à jour
+        """
+        conn = EDatabase.getConn()
+        jobs = [job for job in jobs if job is not None]
+        setStr = ', '.join(map(lambda col: f'"{col}" = ?', DETAIL_ONLY_FIELDS))
+        rows = map(lambda job: private.objToRow(job, DETAIL_ONLY_FIELDS) + (job.job_id,), jobs)
+        c = conn.cursor()
+        c.executemany(f'UPDATE "{JOBS}" SET {setStr} WHERE job_id = ?', rows)
+        EDatabase.dropPendingJobDetails(map(lambda job: job.job_id, jobs))
+        return max(c.rowcount, 0)
+
+    @staticmethod
+    def getJobsToRefresh(limit:int, minAgeHours:int = REFRESH_MIN_AGE_HOURS) -> list:
+        """Retourne les postes actifs à vérifier (mode refresh) : ceux qui n'ont jamais été vérifiés,
+            puis les moins récemment vérifiés, les plus récents en premier
+
+        Args:
+            limit (int): Le nombre maximum de postes (budget de requêtes du lancement)
+            minAgeHours (int, optional): Le nombre d'heures minimum depuis la dernière vérification. Defaults to REFRESH_MIN_AGE_HOURS.
+
+        Returns:
+            list: Les postes, au format (ID, hash du contenu ou None)
+        """
+        return EDatabase.getConn().execute(f'''SELECT job_id, "{CONTENT_HASH_COL}" FROM "{JOBS}"
+                                            WHERE COALESCE(is_active, 1) != 0
+                                            AND ("{LAST_CHECKED_COL}" IS NULL OR "{LAST_CHECKED_COL}" <= datetime('now', ?))
+                                            ORDER BY "{LAST_CHECKED_COL}" IS NOT NULL, "{LAST_CHECKED_COL}", publication_date DESC
+                                            LIMIT ?''', (f'-{int(minAgeHours)} hours', limit)).fetchall()
+
+    @staticmethod
+    def upsertJobs(jobs:Iterable) -> int:
+        """Insère ou met à jour plusieurs postes en une seule requête (UPSERT sur job_id),
+            avec le hash de leur contenu, et les marque comme vérifiés
+            Les postes mis à jour sont retirés de la liste des postes dont le détail doit être récupéré
+
+        Args:
+            jobs (Iterable): Les postes (EJob), récupérés via EScraper.getJobFromID
+
+        Returns:
+            int: Le nombre de postes écrits
+        """
+        jobs = [job for job in jobs if job is not None]
+        if len(jobs) == 0:
+            return 0
+        c = EDatabase.getConn().cursor()
+        with EMetrics.timer(DB_INSERT_SECONDS, {'table': JOBS}):
+            c.executemany(private.getUpsertQuery(JOBS, EJob, 'job_id'), map(lambda job: job.toTuple() + (job.getContentHash(),), jobs))
+        EMetrics.increment(DB_ROWS_INSERTED_TOTAL, {'table': JOBS}, max(c.rowcount, 0))
+        EDatabase.dropPendingJobDetails(map(lambda job: job.job_id, jobs))
+        return max(c.rowcount, 0)
+
+    @staticmethod
+    def markJobsChecked(jobIDs:Iterable):
+        """Marque des postes comme vérifiés, sans modifier leur contenu (contenu inchangé)
+
+        Args:
+            jobIDs (Iterable): Les IDs des postes
+        """
+        EDatabase.getConn().executemany(f'''UPDATE "{JOBS}" SET "{LAST_CHECKED_COL}" = datetime('now') WHERE job_id = ?''',
+                                        map(lambda id: (id,), jobIDs))
+
+    @staticmethod
+    def deactivateJobs(jobIDs:Iterable) -> int:
+        """Marque des postes comme inactifs (is_active = 0), Ex. le poste n'existe plus sur jobup (404)
+            Les postes sont gardés en DB, et ne sont plus vérifiés par le mode refresh
+
+        Args:
+            jobIDs (Iterable): Les IDs des postes
+
+        Returns:
+            int: Le nombre de postes modifiés
+        """
+        jobIDs = list(jobIDs)
+        c = EDatabase.getConn().cursor()
+        c.executemany(f'''UPDATE "{JOBS}" SET is_active = 0, "{LAST_CHECKED_COL}" = datetime('now') WHERE job_id = ?''',
+                      map(lambda id: (id,), jobIDs))
+        EDatabase.dropPendingJobDetails(jobIDs)
+        return max(c.rowcount, 0)
+
+    @staticmethod
+    def searchJobs(text:str, limit:int = 20, offset:int = 0, rawQuery:bool = False) -> list:
+        """Recherche des postes par mots-clefs dans le titre, la profession et le texte de l'annonce (index FTS5)
+
+        Args:
+            text (str): Les mots-clefs (Ex. 'python dévelop*'), tous doivent être présents
+            limit (int, optional): Le nombre maximum de résultats. Defaults to 20.
+            offset (int, optional): Le nombre de résultats à sauter (pagination). Defaults to 0.
+            rawQuery (bool, optional): Si True, text est passé tel quel à FTS5 (Ex. 'title:python OR java'). Defaults to False.
+
+        Returns:
+            list: Les postes, du plus pertinent au moins pertinent, au format
+                {job_id, title, company_name, publication_date, is_active, snippet, rank}
+        """
+        return private.fullTextSearch(JOBS, JOBS_FTS, 'job_id', ('title', 'company_name', 'publication_date', 'is_active'),
+                                      text, limit, offset, rawQuery)
+
+    @staticmethod
+    def searchCompanies(text:str, limit:int = 20, offset:int = 0, rawQuery:bool = False) -> list:
+        """Recherche des entreprises par mots-clefs dans leur nom et leurs descriptions (index FTS5)
+
+        Args:
+            text (str): Les mots-clefs, tous doivent être présents
+            limit (int, optional): Le nombre maximum de résultats. Defaults to 20.
+            offset (int, optional): Le nombre de résultats à sauter (pagination). Defaults to 0.
+            rawQuery (bool, optional): Si True, text est passé tel quel à FTS5. Defaults to False.
+
+        Returns:
+            list: Les entreprises, de la plus pertinente à la moins pertinente, au format {id, name, snippet, rank}
+        """
+        return private.fullTextSearch(COMPANY, COMPANY_FTS, 'id', ('name',), text, limit, offset, rawQuery)
+
+    @staticmethod
+    def startCheckpoint(partitions:Iterable, syncName:str = DEFAULT_SYNC_NAME):
+        """Crée le checkpoint du premier lancement d'une recherche, à partir des partitions à parcourir (voir ECrawlPlanner.plan)
+
+        Args:
+            partitions (Iterable): Les filtres de chaque partition
+            syncName (str, optional): L'état de synchronisation de la recherche (voir ECrawlProfile). Defaults to DEFAULT_SYNC_NAME.
+        """
+        EDatabase.getConn().executemany(f'INSERT OR IGNORE INTO "{CRAWL_PARTITIONS}" (sync_name, filters) VALUES (?, ?)',
+                                        map(lambda filters: (syncName, private.serializeFilters(filters)), partitions))
+
+    @staticmethod
+    def hasCheckpoint(syncName:str = None) -> bool:
+        """Retourne si un premier lancement est en cours (ou a été interrompu)
+
+        Args:
+            syncName (str, optional): L'état de synchronisation de la recherche. Defaults to None (toutes les recherches).
+
+        Returns:
+            bool: True si un checkpoint existe
+        """
+        if syncName is None:
+            return EDatabase.getConn().execute(f'SELECT 1 FROM "{CRAWL_PARTITIONS}" LIMIT 1').fetchone() is not None
+        return EDatabase.getConn().execute(f'SELECT 1 FROM "{CRAWL_PARTITIONS}" WHERE sync_name = ? LIMIT 1',
+                                           (syncName,)).fetchone() is not None
+
+    @staticmethod
+    def getPendingPartitions(syncName:str = DEFAULT_SYNC_NAME) -> list:
+        """Retourne les partitions du checkpoint qui n'ont pas encore été entièrement parcourues
+
+        Args:
+            syncName (str, optional): L'état de synchronisation de la recherche. Defaults to DEFAULT_SYNC_NAME.
+
+        Returns:
+            list: Les filtres de chaque partition
+        """
+        queryResult = EDatabase.getConn().execute(f'SELECT filters FROM "{CRAWL_PARTITIONS}" WHERE sync_name = ? AND done = 0 ORDER BY rowid',
+                                                  (syncName,)).fetchall()
+        return list(map(lambda row: json.loads(row[0]), queryResult))
+
+    @staticmethod
+    def markPartitionDone(filters:dict, syncName:str = DEFAULT_SYNC_NAME):
+        """Indique qu'une partition a été entièrement parcourue, et que tous ses postes sont dans crawl_plan
+
+        Args:
+            filters (dict): Les filtres de la partition
+            syncName (str, optional): L'état de synchronisation de la recherche. Defaults to DEFAULT_SYNC_NAME.
+        """
+        EDatabase.getConn().execute(f'UPDATE "{CRAWL_PARTITIONS}" SET done = 1 WHERE sync_name = ? AND filters = ?',
+                                    (syncName, private.serializeFilters(filters)))
+
+    @staticmethod
+    def planJobs(jobIDs:Iterable):
+        """Ajoute des postes au checkpoint (statut PLAN_PENDING). Le statut des postes déjà présents n'est pas modifié
+
+        Args:
+            jobIDs (Iterable): Les IDs des postes
+        """
+        EDatabase.getConn().executemany(f'INSERT OR IGNORE INTO "{CRAWL_PLAN}" (job_id) VALUES (?)',
+                                        map(lambda id: (id,), jobIDs))
+
+    @staticmethod
+    def markPlannedJobs(jobIDs:Iterable, status:int, error:str = None):
+        """Met à jour le statut de postes du checkpoint
+            Les changements sont validés avec la transaction en cours (voir EDatabase.batch)
+
+        Args:
+            jobIDs (Iterable): Les IDs des postes
+            status (int): Le nouveau statut (PLAN_*)
+            error (str, optional): Le code d'erreur, pour PLAN_FAILED. Defaults to None.
+        """
+        EDatabase.getConn().executemany(f'UPDATE "{CRAWL_PLAN}" SET status = ?, error = ? WHERE job_id = ?',
+                                        map(lambda id: (status, error, id), jobIDs))
+
+    @staticmethod
+    def getPlannedJobs(status:int = PLAN_PENDING) -> list:
+        """Retourne les IDs des postes du checkpoint ayant le statut spécifié, dans l'ordre de la recherche
+
+        Args:
+            status (int, optional): Le statut (PLAN_*). Defaults to PLAN_PENDING.
+
+        Returns:
+            list: Les IDs des postes
+        """
+        queryResult = EDatabase.getConn().execute(f'SELECT job_id FROM "{CRAWL_PLAN}" WHERE status = ? ORDER BY rowid', (status,)).fetchall()
+        return list(map(lambda row: row[0], queryResult))
+
+    @staticmethod
+    def getCheckpointStats(syncName:str = None) -> dict:
+        """Retourne l'avancement du checkpoint
+            Les postes planifiés sont partagés par toutes les recherches : un poste trouvé par plusieurs recherches n'est récupéré qu'une fois
+
+        Args:
+            syncName (str, optional): L'état de synchronisation de la recherche. Defaults to None (toutes les recherches).
+
+        Returns:
+            dict: Le nombre de partitions restantes, et le nombre de postes par statut (PLAN_*)
+        """
+        conn = EDatabase.getConn()
+        if syncName is None:
+            nbPartitions = conn.execute(f'SELECT COUNT(*) FROM "{CRAWL_PARTITIONS}" WHERE done = 0').fetchone()[0]
+        else:
+            nbPartitions = conn.execute(f'SELECT COUNT(*) FROM "{CRAWL_PARTITIONS}" WHERE sync_name = ? AND done = 0',
+                                        (syncName,)).fetchone()[0]
+        stats = {'partitions': nbPartitions}
+        for status in (PLAN_PENDING, PLAN_FETCHED, PLAN_FAILED):
+            stats[status] = 0
+        for status, count in conn.execute(f'SELECT status, COUNT(*) FROM "{CRAWL_PLAN}" GROUP BY status'):
+            stats[status] = count
+        return stats
+
+    @staticmethod
+    def clearCheckpoint(syncName:str = None):
+        """Supprime le checkpoint, une fois le premier lancement terminé
+            Les postes planifiés ne sont supprimés qu'une fois le premier lancement de toutes les recherches terminé
+
+        Args:
+            syncName (str, optional): L'état de synchronisation de la recherche. Defaults to None (toutes les recherches).
+        """
+        conn = EDatabase.getConn()
+        if syncName is None:
+            conn.execute(f'DELETE FROM "{CRAWL_PARTITIONS}"')
+        else:
+            conn.execute(f'DELETE FROM "{CRAWL_PARTITIONS}" WHERE sync_name = ?', (syncName,))
+        if not EDatabase.hasCheckpoint():
+            conn.execute(f'DELETE FROM "{CRAWL_PLAN}"')
@@ -0,0 +1,85 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet EFetcher,
+#   qui récupère les détails des postes en parallèle
+#   Utilisation: from EFetcher import EFetcher
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple, Union
+from ECompany import ECompany
+from EJob import EJob
+from EScraper import EScraper, HTTP_CODES, private as scraper
+
+#Nombre de requêtes simultanées par défaut
+DEFAULT_NB_WORKERS = 8
+
+class EFetcher:
+    """Récupère des objets jobup en parallèle, avec un nombre de requêtes simultanées borné.
+        Le débit est limité par le limiter partagé d'EScraper (voir ERateLimiter.getShared)
+    """
+
+    @staticmethod
+    def fetchAll(ids:Iterable, fetchFunc:Callable, nbWorkers:int = DEFAULT_NB_WORKERS) -> Iterator[Tuple[str, object]]:
+        """Récupère tous les objets via fetchFunc, et les retourne dans l'ordre de ids
+
+        Les résultats sont retournés (yield) dans le même ordre que ids, même si les requêtes
+        se terminent dans le désordre. Ainsi, l'appelant peut insérer en DB depuis son propre thread
+        (sqlite3 n'autorise pas le partage d'une connexion entre threads)
+
+        Args:
+            ids (Iterable): Les IDs à récupérer
+            fetchFunc (Callable): La fonction à appeler pour chaque ID
+            nbWorkers (int, optional): Le nombre de requêtes simultanées. Defaults to DEFAULT_NB_WORKERS.
+
+        Yields:
+            Tuple[str, object]: L'ID et le résultat de fetchFunc pour cet ID
+        """
+        #On garde au maximum 2 * nbWorkers requêtes en vol, afin de ne pas créer
+        #un future par ID lorsque la liste est longue
+        maxPending = nbWorkers * 2
+        pending:deque = deque()
+
+        with ThreadPoolExecutor(max_workers=nbWorkers) as executor:
+            for id in ids:
+                pending.append((id, executor.submit(fetchFunc, id)))
+                if len(pending) >= maxPending:
+                    doneID, future = pending.popleft()
+                    yield doneID, future.result()
+
+            while len(pending) > 0:
+                doneID, future = pending.popleft()
+                yield doneID, future.result()
+
+    @staticmethod
+    def fetchJobs(ids:Iterable, nbWorkers:int = DEFAULT_NB_WORKERS) -> Iterator[Tuple[str, Union[EJob, HTTP_CODES]]]:
+        """Récupère les détails de tous les postes, dans l'ordre de ids
+
+        Args:
+            ids (Iterable): Les IDs des postes
+            nbWorkers (int, optional): Le nombre de requêtes simultanées. Defaults to DEFAULT_NB_WORKERS.
+
+        Yields:
+            Tuple[str, Union[EJob, HTTP_CODES]]: L'ID du poste et le poste, ou le code d'erreur
+        """
+        return EFetcher.fetchAll(ids, EScraper.getJobFromID, nbWorkers)
+
+    @staticmethod
+    def fetchCompanies(ids:Iterable, nbWorkers:int = DEFAULT_NB_WORKERS) -> Iterator[Tuple[str, Union[ECompany, HTTP_CODES]]]:
+        """Récupère toutes les entreprises, dans l'ordre de ids
+
+        Seule la requête est faite en parallèle : le mapping ajoute les adresses aux adresses en attente (voir EAddress.register),
+        partagées et vidées par EDatabase.insertCompanies (voir EAddress.popPending), il est donc fait dans le thread de l'appelant
+
+        Args:
+            ids (Iterable): Les IDs des entreprises
+            nbWorkers (int, optional): Le nombre de requêtes simultanées. Defaults to DEFAULT_NB_WORKERS.
+
+        Yields:
+            Tuple[str, Union[ECompany, HTTP_CODES]]: L'ID de l'entreprise et l'entreprise, ou le code d'erreur
+        """
+        for id, company in EFetcher.fetchAll(ids, scraper.getCompany, nbWorkers):
+            if type(company) is HTTP_CODES:
+                yield id, company
+            else:
+                yield id, EScraper.mapCompany(company)
@@ -3,50 +3,104 @@
 #   Ce fichier contient l'objet EHelper,
 #   qui contient différentes fonctions utiles au programme
 import json
-import inspect
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Callable
+from EMetrics import EMetrics, MAPPING_SECONDS, FAST_BUCKETS
+from ELogger import ELogger
+
+class private:
+    """Contient les variables et méthodes privées
+    """
+    #Les fonctions de mapping compilées, par type (voir EHelper.getMapper)
+    compiledMappers:dict = {}
+
+    @staticmethod
+    def compileMapper(objectType:type) -> Callable:
+        """Crée la fonction de mapping d'un type
+            Le dictionnaire de mapping (getMap) et la liste des attributs ne sont lus qu'une seule fois,
+            puis chaque clef est associée à son setter dans un dictionnaire
+
+        Args:
+            objectType (type): Le type (EJob, ECompany, etc...)
+
+        Returns:
+            Callable: Une fonction (JSONObj, obj) qui mappe JSONObj sur obj, avec le même résultat que MapKeyValueToObject
+        """
+        rowMap:dict = objectType.getMap() if EHelper.ObjHasMethod(objectType, 'getMap') else {}
+        #Les champs déclarés du type (voir ERecord.FIELDS)
+        fields = frozenset(objectType.getFieldNames())
+
+        def mapItems(items, obj):
+            for key, val in items:
+                handlers.get(key, mapUnknown)(key, val, obj)
+
+        def mapList(val:list, obj):
+            for item in val:
+                if type(item) is dict:
+                    mapItems(item.items(), obj)
+                elif type(item) is list:
+                    mapList(item, obj)
+
+        def mapUnknown(key, val, obj):
+            #Clef inconnue : on ne traverse que les collections, les autres valeurs sont ignorées
+            if type(val) is dict:
+                mapItems(val.items(), obj)
+            elif type(val) is list:
+                mapList(val, obj)
+
+        def makeFieldSetter(key:str) -> Callable:
+            def setField(key, val, obj):
+                #Comme dans MapKeyValueToObject, les collections sont traversées même si la clef est un attribut
+                if type(val) is dict or type(val) is list:
+                    mapUnknown(key, val, obj)
+                else:
+                    setattr(obj, key, val)
+            return setField
+
+        def makeMapSetter(mapFunc:Callable) -> Callable:
+            def setMapped(key, val, obj):
+                tmp = mapFunc(val)
+                if type(tmp) is dict:
+                    for innerKey, innerVal in tmp.items():
+                        #Les clefs qui ne sont pas des champs (Ex. un réseau social inconnu) sont ignorées
+                        if innerKey in fields:
+                            setattr(obj, innerKey, innerVal)
+                elif tmp is not None:
+                    setattr(obj, key, tmp)
+            return setMapped
+
+        handlers:dict = {key: makeFieldSetter(key) for key in fields}
+        #Les clefs du dictionnaire de mapping ont la priorité sur les attributs
+        handlers.update({key: makeMapSetter(mapFunc) for key, mapFunc in rowMap.items()})
+
+        def mapObject(JSONObj:dict, obj):
+            mapItems(JSONObj.items(), obj)
+        return mapObject
 
 class EHelper:
 
     @staticmethod
     def printInfo(msg:str, progress:str = '', endChars:str='\r'):
-        """Print un message d'information dans la console
+        """Print un message d'information dans la console (voir ELogger.progress)
 
         Args:
             msg (str): Le message à printer
             progress (str, Optional): Un string indiquant l'état d'avancement (Ex. '90%', '5/15', etc...)
             endChars (str, Optional): Le(s) caractère(s) à utiliser en fin de ligne. \r par défaut
         """
-        result = msg
-        if len(progress) > 0:
-            #1 tabulation = 4 espaces
-            #Pour garder une taille consistante, on regarde la longuer de progress
-            #en tabulations, et on enlève une tabulation pour chaque 4 caractères
-            #formule : maxTabs - (txtSize / tabSize)
-            nbTabs = (1 - int(len(progress) / 4))
-            if(nbTabs < 0):
-                nbTabs = 0
-
-            spacing = '\t' * nbTabs
-            result = f"[{progress}] {spacing}{result}"
-        if endChars == '\r':
-            #Si la ligne finit par \r, il faut padder la fin du string avec des espaces
-            #afin d'enlever les caractères qui pourraient rester si le string précédent est plus long
-            result = result + (' ' * 120)
-        print(result, end=endChars)
+        ELogger.progress(msg, progress, endChars)
 
     @staticmethod
     def printError(msg:str, code:str = ''):
-        """Print un message d'erreur dans la console, ainsi qu'un code d'erreur si précisé
+        """Print un message d'erreur dans la console, ainsi qu'un code d'erreur si précisé (voir ELogger.error)
 
         Args:
             msg (str): Le message à afficher
             code (str, optional): (Optionnel)Le code d'erreur à afficher. Vide par défaut.
         """
-        #Retourne des informations sur la fonction qui print l'erreur
-        callerInfo = inspect.stack()[1]
-        print(f"{callerInfo.function}:{callerInfo.lineno}\t{msg}")
-        if(len(code) > 0):
-            print("Code d'erreur :\t" + str(code))
+        #depth=2 : on affiche la fonction qui appelle printError
+        ELogger.error(msg, code, depth=2)
 
     @staticmethod
     def ObjHasMethod(obj:object, name:str)->bool:
@@ -77,7 +131,8 @@ class EHelper:
                 tmp = map[key](val)
                 if(type(tmp) is dict):
                     for innerKey, innerVal in tmp.items():
-                        setattr(obj, innerKey, innerVal)
+                        if hasattr(obj, innerKey):
+                            setattr(obj, innerKey, innerVal)
                 elif tmp is not None:
                     setattr(obj, key, tmp)
         # https://docs.python.org/3/library/json.html#json-to-py-table
@@ -112,12 +167,52 @@ class EHelper:
         """
         if type(objectType) is not type:
             objectType = type(objectType)
-        result: objectType = objectType()
 
         if 'errors' in JSONObj.keys():
             return None
 
-        for key, val in JSONObj.items():
-            EHelper.MapKeyValueToObject(key, val, result)
+        result: objectType = objectType()
+        #perf_counter plutôt qu'EMetrics.timer : le mapping est appelé pour chaque poste, le context manager coûte trop cher
+        start = perf_counter()
+        EHelper.getMapper(objectType)(JSONObj, result)
+        EMetrics.observe(MAPPING_SECONDS, perf_counter() - start, {'type': objectType.__name__}, FAST_BUCKETS)
+        return result
+
+    @staticmethod
+    def getMapper(objectType:type) -> Callable:
+        """Retourne la fonction de mapping compilée d'un type, en la créant lors du premier appel
+
+        Args:
+            objectType (type): Le type (EJob, ECompany, etc...)
+
+        Returns:
+            Callable: Une fonction (JSONObj, obj) qui mappe JSONObj sur obj
+        """
+        mapper = private.compiledMappers.get(objectType)
+        if mapper is None:
+            mapper = private.compileMapper(objectType)
+            private.compiledMappers[objectType] = mapper
+        return mapper
+
+    @staticmethod
+    def parseDate(date:str) -> datetime:
+        """Convertit une date au format ISO 8601 retournée par jobup (Ex. 2020-05-01T08:00:00+02:00) en datetime
+
+        Args:
+            date (str): La date
 
+        Returns:
+            datetime: La date avec son fuseau horaire (UTC si non précisé), ou None si la date est invalide
+        """
+        if type(date) is not str or len(date) == 0:
+            return None
+        #fromisoformat ne supporte le suffixe Z qu'à partir de python 3.11
+        if date.endswith('Z'):
+            date = date[:-1] + '+00:00'
+        try:
+            result = datetime.fromisoformat(date)
+        except ValueError:
+            return None
+        if result.tzinfo is None:
+            result = result.replace(tzinfo=timezone.utc)
         return result
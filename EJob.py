@@ -3,8 +3,28 @@
 #
 #   Ce fichier contient l'objet EJob, représentant un job sur jobup
 #   Utilisation: from EJob import EJob
+import hashlib
+from ERecord import ERecord, ISODate
 
 
+#Les champs absents des résultats de la recherche, qui ne sont disponibles que via le détail d'un poste
+#Utilisé par EDatabase.updateJobsDetails afin de ne mettre à jour que ces champs
+DETAIL_ONLY_FIELDS:tuple = (
+    'raw_template',
+    'template_profession',
+    'template_text',
+    'template_lead_text',
+    'template_contact_adress',
+    'contact_city',
+    'contact_street',
+    'contact_countryCode',
+    'contact_postalCode',
+    'contact_lat',
+    'contact_lon',
+    'contact_firstName',
+    'contact_lastName',
+    'contact_gender'
+)
 
 class private:
     """ Contient les méthodes privées.
@@ -39,7 +59,7 @@ class private:
             'contact_gender': val.get("gender", '')
         }
         adresses:dict = {}
-        if len(val["address"]) > 0:
+        if len(val.get("address") or {}) > 0:
             adresses = {
                 'contact_city': val["address"].get('city', ''),
                 'contact_street': val["address"].get('street', ''),
@@ -50,59 +70,65 @@ class private:
             }
 
         #On retourne le dictionnaire crée par la fusion de result et addresses
-        return result.update(adresses)
+        #(dict.update modifie result et retourne None)
+        result.update(adresses)
+        return result
 
-class EJob:
+class EJob(ERecord):
     """Représente un Job
     """
-    # /!\ Pour certaines entreprises (tel que Randstadt), l'id  /!\
-    # /!\ est un hash hexadécimal de taille arbitraire          /!\
-    job_id: str = ""
-    detail_de:str = ""
-    detail_fr:str = ""
-    detail_en:str = ""
-    title:str = ""
-    raw_template:str = ""
-    slug:str = ""
-    company_slug:str = ""
-    application_method:str = ""
-    job_source_type:str = ""
-    last_online_date:str = ""
-    datapool_id: int = -1
-    company_name:str = ""
-    company_id: int = -1
-    industry_id: int = -1
-    publication_date:str = ""
-    initial_publication_date:str = ""
-    place:str = ""
-    street:str = ""
-    external_url:str = ""
-    application_url:str = ""
-    zipcode:str = ""
-    source_platform_id:str = ""
-    synonym:str = ""
-    template_profession:str = ""
-    template_text:str = ""
-    template_lead_text:str = ""
-    template_contact_adress:str = ""
-    offer_id:str = ""
-    is_active: int = -1
-    is_responsive: int = -1
-    is_paid: int = -1
-    coordinatesLon:str = ""
-    coordinatesLat:str = ""
-    source_hostname:str = ""
-    headhunter_application_allowed:str = ""
-    contact_city:str = ""
-    contact_street:str = ""
-    contact_countryCode:str = ""
-    contact_postalCode:str = ""
-    contact_lat:str = ""
-    contact_lon:str = ""
-    contact_firstName:str = ""
-    contact_lastName:str = ""
-    contact_gender:str = ""
-    is_highlighted:str = ""
+    #Les champs, au format (nom, type), dans l'ordre des colonnes en DB
+    FIELDS:tuple = (
+        # /!\ Pour certaines entreprises (tel que Randstadt), l'id  /!\
+        # /!\ est un hash hexadécimal de taille arbitraire          /!\
+        ('job_id', str),
+        ('detail_de', str),
+        ('detail_fr', str),
+        ('detail_en', str),
+        ('title', str),
+        ('raw_template', str),
+        ('slug', str),
+        ('company_slug', str),
+        ('application_method', str),
+        ('job_source_type', str),
+        ('last_online_date', ISODate),
+        ('datapool_id', int),
+        ('company_name', str),
+        ('company_id', int),
+        ('industry_id', int),
+        ('publication_date', ISODate),
+        ('initial_publication_date', ISODate),
+        ('place', str),
+        ('street', str),
+        ('external_url', str),
+        ('application_url', str),
+        ('zipcode', str),
+        ('source_platform_id', str),
+        ('synonym', str),
+        ('template_profession', str),
+        ('template_text', str),
+        ('template_lead_text', str),
+        ('template_contact_adress', str),
+        ('offer_id', str),
+        ('is_active', bool),
+        ('is_responsive', bool),
+        ('is_paid', bool),
+        ('coordinatesLon', float),
+        ('coordinatesLat', float),
+        ('source_hostname', str),
+        ('headhunter_application_allowed', bool),
+        ('contact_city', str),
+        ('contact_street', str),
+        ('contact_countryCode', str),
+        ('contact_postalCode', str),
+        ('contact_lat', float),
+        ('contact_lon', float),
+        ('contact_firstName', str),
+        ('contact_lastName', str),
+        ('contact_gender', str),
+        ('is_highlighted', bool)
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
 
     @staticmethod
     def getMap()->dict:
@@ -111,4 +137,28 @@ class EJob:
         Returns:
             dict: Le dictionnaire de mapping
         """
-        return private.rowToJobMap
\ No newline at end of file
+        return private.rowToJobMap
+
+    def getContentHash(self) -> str:
+        """Retourne un hash de la valeur de tous les champs du poste
+            Utilisé par le mode refresh (voir main.refreshJobs) afin de n'écrire que les postes modifiés
+
+        Returns:
+            str: Le hash
+        """
+        return EJob.computeContentHash(self.toTuple())
+
+    @staticmethod
+    def computeContentHash(values:tuple) -> str:
+        """Retourne le hash du contenu d'un poste, à partir de la valeur de ses champs
+            Le hash est le même pour un poste mappé et pour sa ligne en DB
+
+        Args:
+            values (tuple): La valeur de chaque champ, dans l'ordre de FIELDS (voir ERecord.toTuple)
+
+        Returns:
+            str: Le hash
+        """
+        #Comme pour EAddress.computeKey, les valeurs sont comparées sous forme de texte
+        content = '\x1f'.join(map(lambda val: '' if val is None else str(val), values))
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
\ No newline at end of file
@@ -0,0 +1,256 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet ELogger,
+#   qui affiche les messages du scraper selon leur niveau et le mode choisi (console, quiet, json)
+#   Utilisation: from ELogger import ELogger
+#   Le mode et le niveau peuvent être définis via les variables d'environnement JOBUP_LOG_MODE et JOBUP_LOG_LEVEL
+#   (Ex. JOBUP_LOG_MODE=json python main.py, pour un lancement via cron)
+
+import os
+import sys
+import json
+import threading
+from datetime import datetime, timezone
+from enum import IntEnum
+from time import monotonic
+
+class LOG_LEVELS(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+#Console : progression sur une seule ligne (\r) et messages lisibles
+MODE_CONSOLE = 'console'
+#Quiet : pas de progression, seulement les avertissements et les erreurs
+MODE_QUIET = 'quiet'
+#JSON : un objet JSON par ligne, sans progression
+MODE_JSON = 'json'
+MODES:tuple = (MODE_CONSOLE, MODE_QUIET, MODE_JSON)
+LOG_MODE_ENV = 'JOBUP_LOG_MODE'
+LOG_LEVEL_ENV = 'JOBUP_LOG_LEVEL'
+#Un même message (même fonction, même ligne) est affiché au maximum REPEAT_LIMIT fois par fenêtre de REPEAT_WINDOW_SECONDS
+#Les messages suivants sont comptés, puis résumés à la fin de la fenêtre (voir ELogger.flush)
+REPEAT_LIMIT = 5
+REPEAT_WINDOW_SECONDS = 60
+#Une ligne de progression est paddée avec des espaces afin d'effacer la précédente, si celle-ci était plus longue
+PROGRESS_PADDING = 120
+
+class private:
+    """Contient les variables et méthodes privées
+    """
+    lock = threading.Lock()
+    mode:str = MODE_CONSOLE
+    #Le niveau minimum effectif, déduit du mode et du niveau demandé (voir ELogger.configure)
+    level:int = LOG_LEVELS.INFO
+    #Le niveau demandé via ELogger.configure, ou None s'il n'a jamais été précisé
+    requestedLevel:int = None
+    #True si la dernière ligne affichée est une ligne de progression (terminée par \r)
+    progressPending:bool = False
+    #{(fonction, ligne) -> [début de la fenêtre, nombre de messages, nombre de messages ignorés, niveau]}
+    repeats:dict = {}
+
+    @staticmethod
+    def getCaller(depth:int) -> tuple:
+        """Retourne la fonction et la ligne de l'appelant
+            sys._getframe ne lit que la frame demandée, contrairement à inspect.stack qui lit toute la pile et le code source
+
+        Args:
+            depth (int): La profondeur de l'appelant, depuis la méthode publique d'ELogger (1 = appelant direct)
+        """
+        try:
+            frame = sys._getframe(depth + 1)
+        except ValueError:
+            return ('?', 0)
+        return (frame.f_code.co_name, frame.f_lineno)
+
+    @staticmethod
+    def allowRepeat(caller:tuple, level:int) -> bool:
+        """Retourne False si le message a déjà été affiché REPEAT_LIMIT fois dans la fenêtre en cours
+            Doit être appelée avec private.lock
+        """
+        now = monotonic()
+        state = private.repeats.get(caller)
+        if state is None or now - state[0] >= REPEAT_WINDOW_SECONDS:
+            if state is not None and state[2] > 0:
+                private.reportIgnored(caller, state)
+            private.repeats[caller] = [now, 1, 0, level]
+            return True
+        state[1] += 1
+        if state[1] > REPEAT_LIMIT:
+            state[2] += 1
+            return False
+        return True
+
+    @staticmethod
+    def reportIgnored(caller:tuple, state:list):
+        """Affiche le nombre de messages ignorés pour un appelant
+            Doit être appelée avec private.lock
+        """
+        private.write(state[3], caller, f"{state[2]} messages similaires ignorés", '')
+
+    @staticmethod
+    def endProgress():
+        """Termine la ligne de progression en cours, afin que le message suivant ne l'écrase pas
+            Doit être appelée avec private.lock
+        """
+        if private.progressPending:
+            sys.stdout.write('\n')
+            private.progressPending = False
+
+    @staticmethod
+    def write(level:int, caller:tuple, msg:str, code:str):
+        """Écrit un message, selon le mode
+            Doit être appelée avec private.lock
+        """
+        if private.mode == MODE_JSON:
+            record:dict = {
+                'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                'level': LOG_LEVELS(level).name,
+                'caller': f"{caller[0]}:{caller[1]}",
+                'msg': msg
+            }
+            if len(code) > 0:
+                record['code'] = code
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+            return
+
+        private.endProgress()
+        if level >= LOG_LEVELS.WARNING:
+            sys.stdout.write(f"{caller[0]}:{caller[1]}\t{msg}\n")
+            if len(code) > 0:
+                sys.stdout.write(f"Code d'erreur :\t{code}\n")
+        else:
+            sys.stdout.write(msg + '\n')
+
+class ELogger:
+    """Affiche les messages du scraper (voir LOG_LEVELS et MODES)
+        Les messages répétés (même appelant) sont limités à REPEAT_LIMIT par fenêtre de REPEAT_WINDOW_SECONDS
+    """
+
+    @staticmethod
+    def configure(mode:str = None, level:str = None):
+        """Change le mode et/ou le niveau minimum des messages
+
+        Args:
+            mode (str, optional): MODE_CONSOLE, MODE_QUIET ou MODE_JSON. Defaults to None (inchangé).
+            level (str, optional): Le nom du niveau minimum (Ex. 'WARNING'). Defaults to None (inchangé).
+
+        Raises:
+            ValueError: Si le mode ou le niveau est inconnu
+        """
+        if mode is not None:
+            mode = mode.lower()
+            if mode not in MODES:
+                raise ValueError(f"Mode de log inconnu : {mode} ({', '.join(MODES)})")
+        if level is not None:
+            if level.upper() not in LOG_LEVELS.__members__:
+                raise ValueError(f"Niveau de log inconnu : {level} ({', '.join(LOG_LEVELS.__members__)})")
+            level = LOG_LEVELS[level.upper()]
+
+        with private.lock:
+            private.endProgress()
+            if mode is not None:
+                private.mode = mode
+            if level is not None:
+                private.requestedLevel = level
+            #En mode quiet, seuls les avertissements et les erreurs sont affichés, sauf si le niveau est précisé
+            #Le niveau est recalculé à chaque appel, afin de revenir à INFO en quittant le mode quiet
+            if private.requestedLevel is not None:
+                private.level = private.requestedLevel
+            elif private.mode == MODE_QUIET:
+                private.level = LOG_LEVELS.WARNING
+            else:
+                private.level = LOG_LEVELS.INFO
+
+    @staticmethod
+    def isEnabled(level:int) -> bool:
+        """Retourne True si les messages de ce niveau sont affichés
+        """
+        return level >= private.level
+
+    @staticmethod
+    def log(level:int, msg:str, code:str = '', depth:int = 1):
+        """Affiche un message
+
+        Args:
+            level (int): Le niveau (voir LOG_LEVELS)
+            msg (str): Le message
+            code (str, optional): Un code d'erreur (Ex. HTTP_CODES.name). Defaults to ''.
+            depth (int, optional): La profondeur de l'appelant à afficher (1 = la fonction qui appelle log). Defaults to 1.
+        """
+        if level < private.level:
+            return
+        caller = private.getCaller(depth)
+        with private.lock:
+            if private.allowRepeat(caller, level):
+                private.write(level, caller, msg, code)
+
+    @staticmethod
+    def debug(msg:str, code:str = '', depth:int = 1):
+        ELogger.log(LOG_LEVELS.DEBUG, msg, code, depth + 1)
+
+    @staticmethod
+    def info(msg:str, code:str = '', depth:int = 1):
+        ELogger.log(LOG_LEVELS.INFO, msg, code, depth + 1)
+
+    @staticmethod
+    def warning(msg:str, code:str = '', depth:int = 1):
+        ELogger.log(LOG_LEVELS.WARNING, msg, code, depth + 1)
+
+    @staticmethod
+    def error(msg:str, code:str = '', depth:int = 1):
+        ELogger.log(LOG_LEVELS.ERROR, msg, code, depth + 1)
+
+    @staticmethod
+    def progress(msg:str, progress:str = '', endChars:str = '\r'):
+        """Affiche l'état d'avancement sur la ligne en cours (mode console uniquement)
+
+        Args:
+            msg (str): Le message à afficher
+            progress (str, Optional): Un string indiquant l'état d'avancement (Ex. '90%', '5/15', etc...)
+            endChars (str, Optional): Le(s) caractère(s) à utiliser en fin de ligne. \r par défaut
+        """
+        if private.mode != MODE_CONSOLE or private.level > LOG_LEVELS.INFO:
+            return
+        result = msg
+        if len(progress) > 0:
+            #1 tabulation = 4 espaces
+            #Pour garder une taille consistante, on regarde la longuer de progress
+            #en tabulations, et on enlève une tabulation pour chaque 4 caractères
+            #formule : maxTabs - (txtSize / tabSize)
+            nbTabs = max(1 - int(len(progress) / 4), 0)
+            spacing = '\t' * nbTabs
+            result = f"[{progress}] {spacing}{result}"
+        if endChars == '\r':
+            #Si la ligne finit par \r, il faut padder la fin du string avec des espaces
+            #afin d'enlever les caractères qui pourraient rester si le string précédent est plus long
+            result = result + (' ' * PROGRESS_PADDING)
+        with private.lock:
+            sys.stdout.write(result + endChars)
+            private.progressPending = endChars == '\r'
+            if private.progressPending:
+                sys.stdout.flush()
+
+    @staticmethod
+    def endProgress():
+        """Termine la ligne de progression en cours, s'il y en a une
+        """
+        with private.lock:
+            private.endProgress()
+
+    @staticmethod
+    def flush():
+        """Affiche le nombre de messages ignorés (voir REPEAT_LIMIT) pour les fenêtres en cours, et termine la progression
+            À appeler en fin de lancement
+        """
+        with private.lock:
+            for caller, state in private.repeats.items():
+                if state[2] > 0:
+                    private.reportIgnored(caller, state)
+            private.repeats = {}
+            private.endProgress()
+            sys.stdout.flush()
+
+#Mode et niveau définis par l'environnement (Ex. lancement via cron)
+ELogger.configure(os.environ.get(LOG_MODE_ENV), os.environ.get(LOG_LEVEL_ENV))
@@ -0,0 +1,243 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet EMetrics,
+#   qui mesure le temps passé dans chaque partie du scraper (requêtes, attentes, mapping, DB)
+#   Utilisation: from EMetrics import EMetrics
+
+import json
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+#Le nom des différentes métriques
+REQUEST_SECONDS = 'jobup_http_request_seconds'
+RESPONSES_TOTAL = 'jobup_http_responses_total'
+SLEEP_SECONDS_TOTAL = 'jobup_sleep_seconds_total'
+MAPPING_SECONDS = 'jobup_mapping_seconds'
+DB_INSERT_SECONDS = 'jobup_db_insert_seconds'
+DB_ROWS_INSERTED_TOTAL = 'jobup_db_rows_inserted_total'
+DB_COMMIT_SECONDS = 'jobup_db_commit_seconds'
+RUN_SECONDS = 'jobup_run_seconds'
+CACHE_RESPONSES_TOTAL = 'jobup_http_cache_responses_total'
+CACHE_BYTES_SAVED_TOTAL = 'jobup_http_cache_bytes_saved_total'
+#Bornes des histogrammes, en secondes
+DEFAULT_BUCKETS:tuple = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+#Le mapping d'un objet prend quelques dizaines de microsecondes
+FAST_BUCKETS:tuple = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01)
+#Description de chaque métrique, utilisée pour le format Prometheus
+DESCRIPTIONS:dict = {
+    REQUEST_SECONDS: 'Durée des requêtes HTTP, par type de route',
+    RESPONSES_TOTAL: 'Nombre de réponses, par type de route et HTTP_CODES',
+    SLEEP_SECONDS_TOTAL: "Temps passé à attendre, par raison (limiter ou pause avant une nouvelle tentative)",
+    MAPPING_SECONDS: 'Durée du mapping JSON -> objet, par type',
+    DB_INSERT_SECONDS: 'Durée des insertions, par table',
+    DB_ROWS_INSERTED_TOTAL: 'Nombre de lignes insérées, par table',
+    DB_COMMIT_SECONDS: 'Durée des commits',
+    RUN_SECONDS: 'Durée du lancement',
+    CACHE_RESPONSES_TOTAL: 'Nombre de réponses lues depuis le cache (hit, réponse 304) ou téléchargées (miss), par type de route',
+    CACHE_BYTES_SAVED_TOTAL: "Nombre d'octets lus depuis le cache au lieu d'être téléchargés, par type de route"
+}
+
+class private:
+    """Contient les variables et méthodes privées
+    """
+    lock = threading.Lock()
+    #{(nom, labels) -> valeur}
+    counters:dict = {}
+    #{(nom, labels) -> [bornes, nombre par borne, somme, nombre, maximum]}
+    histograms:dict = {}
+    startTime:float = perf_counter()
+
+    @staticmethod
+    def labelsKey(labels:dict) -> tuple:
+        """Retourne les labels sous une forme utilisable comme clef de dictionnaire
+        """
+        if not labels:
+            return ()
+        return tuple(sorted(labels.items()))
+
+    @staticmethod
+    def formatLabels(key:tuple, extra:tuple = ()) -> str:
+        """Retourne les labels au format Prometheus (Ex. {endpoint="job",code="OK"})
+        """
+        items = key + extra
+        if len(items) == 0:
+            return ''
+        return '{' + ','.join(f'{name}="{val}"' for name, val in items) + '}'
+
+class EMetrics:
+    """Compteurs et histogrammes, partagés par tous les threads du scraper
+        Les métriques sont exportées à la fin d'un lancement (voir EMetrics.export),
+        au format texte Prometheus ou en résumé JSON
+    """
+
+    @staticmethod
+    def increment(name:str, labels:dict = None, value:float = 1):
+        """Incrémente un compteur
+
+        Args:
+            name (str): Le nom du compteur
+            labels (dict, optional): Les labels (Ex. {'table': 'jobs'}). Defaults to None.
+            value (float, optional): La valeur à ajouter. Defaults to 1.
+        """
+        key = (name, private.labelsKey(labels))
+        with private.lock:
+            private.counters[key] = private.counters.get(key, 0) + value
+
+    @staticmethod
+    def observe(name:str, value:float, labels:dict = None, buckets:tuple = DEFAULT_BUCKETS):
+        """Ajoute une valeur à un histogramme
+
+        Args:
+            name (str): Le nom de l'histogramme
+            value (float): La valeur (une durée en secondes)
+            labels (dict, optional): Les labels. Defaults to None.
+            buckets (tuple, optional): Les bornes, utilisées à la création de l'histogramme. Defaults to DEFAULT_BUCKETS.
+        """
+        key = (name, private.labelsKey(labels))
+        with private.lock:
+            histogram = private.histograms.get(key)
+            if histogram is None:
+                histogram = [buckets, [0] * len(buckets), 0.0, 0, 0.0]
+                private.histograms[key] = histogram
+            bounds, counts = histogram[0], histogram[1]
+            for i in range(len(bounds)):
+                if value <= bounds[i]:
+                    counts[i] += 1
+                    break
+            histogram[2] += value
+            histogram[3] += 1
+            if value > histogram[4]:
+                histogram[4] = value
+
+    @staticmethod
+    @contextmanager
+    def timer(name:str, labels:dict = None, buckets:tuple = DEFAULT_BUCKETS):
+        """Mesure la durée du bloc, et l'ajoute à un histogramme
+            Utilisation : with EMetrics.timer(DB_COMMIT_SECONDS): conn.commit()
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            EMetrics.observe(name, perf_counter() - start, labels, buckets)
+
+    @staticmethod
+    def getCounter(name:str, labels:dict = None) -> float:
+        """Retourne la valeur d'un compteur, ou la somme de toutes ses valeurs si labels est None
+        """
+        with private.lock:
+            if labels is not None:
+                return private.counters.get((name, private.labelsKey(labels)), 0)
+            return sum(val for (counterName, _), val in private.counters.items() if counterName == name)
+
+    @staticmethod
+    def getSummary() -> dict:
+        """Retourne toutes les métriques
+
+        Returns:
+            dict: {nom -> {labels -> valeur}} pour les compteurs,
+                et {nom -> {labels -> {count, sum, mean, max}}} pour les histogrammes
+                Les labels sont au format Prometheus ('' si aucun)
+        """
+        summary:dict = {RUN_SECONDS: perf_counter() - private.startTime, 'counters': {}, 'histograms': {}}
+        with private.lock:
+            for (name, key), val in sorted(private.counters.items()):
+                summary['counters'].setdefault(name, {})[private.formatLabels(key)] = val
+            for (name, key), (_, _, total, count, maximum) in sorted(private.histograms.items(), key=lambda item: item[0]):
+                summary['histograms'].setdefault(name, {})[private.formatLabels(key)] = {
+                    'count': count,
+                    'sum': total,
+                    'mean': total / count if count > 0 else 0,
+                    'max': maximum
+                }
+        return summary
+
+    @staticmethod
+    def toPrometheus() -> str:
+        """Retourne toutes les métriques au format texte Prometheus
+            (Ex. pour le textfile collector de node_exporter)
+
+        Returns:
+            str: Les métriques
+        """
+        lines = []
+        described = set()
+
+        def describe(name:str, metricType:str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} {metricType}")
+
+        describe(RUN_SECONDS, 'gauge')
+        lines.append(f"{RUN_SECONDS} {perf_counter() - private.startTime}")
+        with private.lock:
+            for (name, key), val in sorted(private.counters.items()):
+                describe(name, 'counter')
+                lines.append(f"{name}{private.formatLabels(key)} {val}")
+            for (name, key), (bounds, counts, total, count, _) in sorted(private.histograms.items(), key=lambda item: item[0]):
+                describe(name, 'histogram')
+                cumulative = 0
+                for bound, bucketCount in zip(bounds, counts):
+                    cumulative += bucketCount
+                    lines.append(f"{name}_bucket{private.formatLabels(key, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{private.formatLabels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{private.formatLabels(key)} {total}")
+                lines.append(f"{name}_count{private.formatLabels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def export(path:str):
+        """Écrit toutes les métriques dans un fichier, au format Prometheus si celui-ci se termine par .prom, sinon en JSON
+
+        Args:
+            path (str): Le fichier
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith('.prom'):
+                f.write(EMetrics.toPrometheus())
+            else:
+                json.dump(EMetrics.getSummary(), f, indent=2, ensure_ascii=False)
+
+    @staticmethod
+    def snapshot() -> dict:
+        """Retourne une copie des compteurs et histogrammes, pouvant être sérialisée (pickle)
+            Utilisée par les processus workers, dont les métriques sont ajoutées à celles du coordinateur (voir merge)
+        """
+        with private.lock:
+            return {
+                'counters': dict(private.counters),
+                'histograms': {key: [bounds, list(counts), total, count, maximum]
+                               for key, (bounds, counts, total, count, maximum) in private.histograms.items()}
+            }
+
+    @staticmethod
+    def merge(snapshot:dict):
+        """Ajoute les métriques d'un autre processus (voir snapshot) aux métriques de ce processus
+
+        Args:
+            snapshot (dict): Les métriques, telles que retournées par snapshot
+        """
+        with private.lock:
+            for key, val in snapshot['counters'].items():
+                private.counters[key] = private.counters.get(key, 0) + val
+            for key, (bounds, counts, total, count, maximum) in snapshot['histograms'].items():
+                histogram = private.histograms.get(key)
+                if histogram is None:
+                    private.histograms[key] = [bounds, list(counts), total, count, maximum]
+                    continue
+                #Un même histogramme a toujours les mêmes bornes (voir observe), les nombres par borne peuvent donc être additionnés
+                histogram[1] = [a + b for a, b in zip(histogram[1], counts)]
+                histogram[2] += total
+                histogram[3] += count
+                histogram[4] = max(histogram[4], maximum)
+
+    @staticmethod
+    def reset():
+        """Remet toutes les métriques à 0, et redémarre la mesure de la durée du lancement
+        """
+        with private.lock:
+            private.counters = {}
+            private.histograms = {}
+            private.startTime = perf_counter()
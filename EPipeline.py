@@ -0,0 +1,217 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet EPipeline,
+#   qui relie les pages de recherche aux écritures en DB via des générateurs
+#   Utilisation: from EPipeline import EPipeline
+
+import heapq
+import threading
+from queue import Queue
+from typing import Callable, Iterable, Iterator, Tuple
+from EDatabase import EDatabase, DEFAULT_SYNC_NAME, SYNC_SEEN_KEPT, PLAN_FETCHED, PLAN_FAILED
+from EFetcher import EFetcher, DEFAULT_NB_WORKERS
+from EHelper import EHelper
+from ELogger import ELogger
+from EJob import EJob
+from EScraper import EScraper, HTTP_CODES
+
+#Nombre de postes écrits en DB par transaction
+DEFAULT_BATCH_SIZE = 50
+#Nombre de pages de recherche en attente entre les threads de recherche et le reste du pipeline
+PAGE_QUEUE_SIZE = 4
+#Valeur placée dans la queue par un thread de recherche lorsqu'il a terminé, au format (_DONE, tâche, recherche complète)
+_DONE = object()
+
+class private:
+    """Contient les méthodes privées
+    """
+
+    @staticmethod
+    def producePages(task:object, iterPages:Callable, pageQueue:Queue):
+        """Parcourt une recherche, et place chaque page dans pageQueue, au format (tâche, page)
+            Exécuté dans un thread par tâche
+
+        Args:
+            task (object): La tâche (Ex. les filtres d'une partition)
+            iterPages (Callable): Retourne l'itérateur des pages de la tâche (Ex. EScraper.iterNewPages)
+            pageQueue (Queue): La queue partagée avec EPipeline.taskPages
+        """
+        complete = False
+        try:
+            pages = iterPages(task)
+            while True:
+                #put bloque si la queue est pleine, ce qui limite la mémoire utilisée
+                pageQueue.put((task, next(pages)))
+        except StopIteration as stop:
+            #La valeur de retour de l'itérateur (Ex. iterSearchPages) indique si la recherche a été parcourue jusqu'au bout
+            complete = stop.value is True
+        except Exception as e:
+            ELogger.error(f"Erreur lors du parcours de la recherche {task}", str(e))
+        finally:
+            pageQueue.put((_DONE, task, complete))
+
+    @staticmethod
+    def sortKey(job:EJob) -> float:
+        """Retourne le timestamp de la date de publication d'un poste (0 si inconnue)
+        """
+        date = EHelper.parseDate(job.publication_date)
+        return date.timestamp() if date is not None else 0
+
+class EPipeline:
+    """Étapes du pipeline de scraping, sous forme de générateurs :
+        pages de recherche -> postes -> (détail) -> EJob -> écriture en DB par batch
+        Chaque étape ne garde en mémoire que les éléments en cours de traitement,
+        et les premiers postes sont écrits en DB dès le premier batch complet
+    """
+
+    @staticmethod
+    def taskPages(tasks:list, iterPages:Callable, nbWorkers:int = 1, onTaskDone:Callable = None) -> Iterator[Tuple[object, list]]:
+        """Parcourt les recherches de plusieurs tâches en parallèle (un thread par tâche, nbWorkers au maximum),
+            et retourne (yield) les pages au fur et à mesure de leur réception
+            Les pages sont retournées dans le thread de l'appelant, qui peut donc écrire en DB
+
+        Args:
+            tasks (list): Les tâches, dans l'ordre de démarrage
+            iterPages (Callable): Appelée avec une tâche, retourne l'itérateur de ses pages. Exécutée dans le thread de la tâche
+            nbWorkers (int, optional): Le nombre de tâches exécutées simultanément. Defaults to 1.
+            onTaskDone (Callable, optional): Appelée avec (tâche, recherche complète) à la fin de chaque tâche,
+                une fois toutes ses pages retournées. Defaults to None.
+
+        Yields:
+            Tuple[object, list]: La tâche, et les postes d'une page tels que retournés dans documents par la recherche
+        """
+        pageQueue:Queue = Queue(maxsize=PAGE_QUEUE_SIZE)
+        pending = list(tasks)
+        running = 0
+
+        while len(pending) > 0 or running > 0:
+            #On démarre une nouvelle tâche dès qu'un thread est libre
+            while len(pending) > 0 and running < nbWorkers:
+                threading.Thread(target=private.producePages, args=(pending.pop(0), iterPages, pageQueue), daemon=True).start()
+                running += 1
+
+            item = pageQueue.get()
+            if item[0] is _DONE:
+                running -= 1
+                if onTaskDone is not None:
+                    onTaskDone(item[1], item[2])
+            else:
+                yield item
+
+    @staticmethod
+    def jobIDs(documents:Iterable) -> Iterator[str]:
+        """Retourne l'ID de chaque poste
+
+        Args:
+            documents (Iterable): Les postes de la recherche
+
+        Yields:
+            str: Les IDs des postes
+        """
+        return map(lambda document: document['job_id'], documents)
+
+    @staticmethod
+    def mapDocuments(documents:Iterable) -> Iterator[EJob]:
+        """Mappe les postes de la recherche en EJob, sans récupérer leur détail
+
+        Args:
+            documents (Iterable): Les postes de la recherche
+
+        Yields:
+            EJob: Les postes
+        """
+        return map(EScraper.mapSearchDocument, documents)
+
+    @staticmethod
+    def fetchDetails(jobIDs:Iterable, nbWorkers:int = DEFAULT_NB_WORKERS, onError:Callable = None) -> Iterator[EJob]:
+        """Récupère le détail des postes en parallèle (voir EFetcher)
+
+        Args:
+            jobIDs (Iterable): Les IDs des postes (voir EPipeline.jobIDs)
+            nbWorkers (int, optional): Le nombre de requêtes simultanées. Defaults to DEFAULT_NB_WORKERS.
+            onError (Callable, optional): Appelée avec (ID, HTTP_CODES) pour chaque poste en erreur. Defaults to None.
+
+        Yields:
+            EJob: Les postes, dans l'ordre de jobIDs. Les postes en erreur sont ignorés
+        """
+        for jobID, job in EFetcher.fetchJobs(jobIDs, nbWorkers):
+            if type(job) is HTTP_CODES:
+                ELogger.warning(f"Erreur lors du scraping du poste à l'ID {jobID}", job.name)
+                if onError is not None:
+                    onError(jobID, job)
+                continue
+            yield job
+
+    @staticmethod
+    def checkpointError(jobID:str, error:HTTP_CODES):
+        """Marque un poste en erreur dans le checkpoint du premier lancement (voir fetchDetails)
+            Le changement est validé avec le batch suivant
+
+        Args:
+            jobID (str): L'ID du poste
+            error (HTTP_CODES): Le code d'erreur
+        """
+        EDatabase.markPlannedJobs((jobID,), PLAN_FAILED, error.name)
+
+    @staticmethod
+    def writeBatches(jobs:Iterable, batchSize:int = DEFAULT_BATCH_SIZE, queueDetails:bool = False,
+                     syncName:str = DEFAULT_SYNC_NAME, checkpoint:bool = False) -> Iterator[int]:
+        """Écrit les postes en DB, une transaction par batch de batchSize postes
+            En cas de crash, seul le batch en cours est perdu
+            L'état de synchronisation n'est mis à jour qu'une fois tous les postes écrits, afin qu'un run
+            interrompu ne fasse pas avancer le high-water mark au-delà de postes qui n'ont pas été écrits
+
+        Args:
+            jobs (Iterable): Les postes (EJob)
+            batchSize (int, optional): Le nombre de postes par transaction. Defaults to DEFAULT_BATCH_SIZE.
+            queueDetails (bool, optional): Si True, le détail des postes est ajouté à la liste d'attente
+                (postes mappés depuis la recherche). Defaults to False.
+            syncName (str, optional): Le nom de l'état de synchronisation à mettre à jour, None si celui-ci est mis à jour
+                par l'appelant (voir ECrawlScheduler). Defaults to DEFAULT_SYNC_NAME.
+            checkpoint (bool, optional): Si True, les postes sont marqués comme récupérés dans le checkpoint
+                du premier lancement, dans la même transaction que leur insertion. Defaults to False.
+
+        Yields:
+            int: Le nombre total de postes écrits, après chaque batch
+        """
+        batch:list = []
+        nbWritten = 0
+        #Les SYNC_SEEN_KEPT postes les plus récents, seuls ceux-ci sont utiles à l'état de synchronisation
+        recentJobs:list = []
+        nbSeen = 0
+
+        def flush():
+            with EDatabase.batch():
+                EDatabase.insertJobs(batch)
+                if queueDetails:
+                    EDatabase.queueJobDetails(map(lambda job: job.job_id, batch))
+                if checkpoint:
+                    EDatabase.markPlannedJobs(map(lambda job: job.job_id, batch), PLAN_FETCHED)
+
+        for job in jobs:
+            if job is None:
+                continue
+            batch.append(job)
+            if syncName is not None:
+                #nbSeen départage les postes publiés au même moment, EJob n'étant pas comparable
+                heapItem = (private.sortKey(job), nbSeen, job)
+                nbSeen += 1
+                if len(recentJobs) < SYNC_SEEN_KEPT:
+                    heapq.heappush(recentJobs, heapItem)
+                else:
+                    heapq.heappushpop(recentJobs, heapItem)
+
+            if len(batch) >= batchSize:
+                flush()
+                nbWritten += len(batch)
+                batch = []
+                yield nbWritten
+
+        if len(batch) > 0:
+            flush()
+            nbWritten += len(batch)
+            yield nbWritten
+
+        if len(recentJobs) > 0:
+            with EDatabase.batch():
+                EDatabase.updateSyncState(map(lambda item: item[2], recentJobs), syncName)
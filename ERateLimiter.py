@@ -0,0 +1,161 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet ERateLimiter,
+#   qui limite le nombre de requêtes envoyées à jobup par seconde
+#   Utilisation: from ERateLimiter import ERateLimiter
+
+import random
+import threading
+from time import monotonic, sleep
+
+#Débit initial, en requêtes par seconde
+DEFAULT_RATE = 5
+#Bornes du débit adaptatif
+DEFAULT_MIN_RATE = 0.2
+DEFAULT_MAX_RATE = 20
+#Augmentation du débit après chaque réponse 2XX (additive increase)
+DEFAULT_INCREASE_STEP = 0.05
+#Facteur appliqué au débit après une réponse 5XX/429 (multiplicative decrease)
+DEFAULT_DECREASE_FACTOR = 0.5
+#Nombre de requêtes pouvant partir d'un coup après une période d'inactivité
+DEFAULT_BURST = 1
+#Délai de base et délai maximum des pauses entre deux tentatives
+BACKOFF_BASE = 1
+BACKOFF_MAX = 60
+
+class private:
+    """Contient les variables privées
+    """
+    shared = None
+    sharedLock = threading.Lock()
+
+class ERateLimiter:
+    """Token bucket dont le débit s'adapte aux réponses du serveur (AIMD) :
+        le débit augmente doucement tant que les réponses sont 2XX,
+        et est divisé lorsque le serveur renvoie une 5XX ou une 429.
+        Une même instance peut être partagée entre plusieurs threads,
+        le budget est alors global à tous les threads
+    """
+
+    def __init__(self, requestsPerSecond:float = DEFAULT_RATE, minRate:float = DEFAULT_MIN_RATE,
+                 maxRate:float = DEFAULT_MAX_RATE, increaseStep:float = DEFAULT_INCREASE_STEP,
+                 decreaseFactor:float = DEFAULT_DECREASE_FACTOR, burst:int = DEFAULT_BURST):
+        """
+        Args:
+            requestsPerSecond (float, optional): Le débit initial. Defaults to DEFAULT_RATE.
+            minRate (float, optional): Le débit minimum. Defaults to DEFAULT_MIN_RATE.
+            maxRate (float, optional): Le débit maximum. Defaults to DEFAULT_MAX_RATE.
+            increaseStep (float, optional): L'augmentation du débit par succès. Defaults to DEFAULT_INCREASE_STEP.
+            decreaseFactor (float, optional): Le facteur de réduction par erreur. Defaults to DEFAULT_DECREASE_FACTOR.
+            burst (int, optional): La taille du bucket. Defaults to DEFAULT_BURST.
+        """
+        self.minRate = minRate
+        self.maxRate = maxRate
+        self.rate = min(max(requestsPerSecond, minRate), maxRate)
+        self.increaseStep = increaseStep
+        self.decreaseFactor = decreaseFactor
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._lastRefill = monotonic()
+        #Moment de la dernière réduction de débit, afin qu'une rafale d'erreurs
+        #simultanées (plusieurs threads) ne divise le débit qu'une seule fois
+        self._lastDecrease = 0.0
+
+    def _refill(self, now:float):
+        self._tokens = min(self.burst, self._tokens + (now - self._lastRefill) * self.rate)
+        self._lastRefill = now
+
+    def reserve(self) -> float:
+        """Réserve un jeton sans attendre, et retourne le temps à attendre avant d'envoyer la requête
+            Utilisée par EAsyncScraper, qui attend via asyncio.sleep au lieu de bloquer le thread
+
+        Returns:
+            float: Le temps à attendre, en secondes
+        """
+        #Le solde peut devenir négatif, ce qui représente les requêtes déjà en attente
+        with self._lock:
+            self._refill(monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def release(self):
+        """Rend un jeton réservé par reserve, pour une requête qui n'a pas été envoyée (Ex. annulée pendant son attente)
+            Sans cela, les requêtes suivantes (tous appelants confondus) attendraient pour un jeton jamais utilisé
+        """
+        with self._lock:
+            self._refill(monotonic())
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def acquire(self) -> float:
+        """Bloque jusqu'à ce qu'une requête puisse être envoyée
+
+        Returns:
+            float: Le temps passé à attendre, en secondes
+        """
+        #On réserve un jeton sous le lock, mais on attend en dehors du lock
+        waitTime = self.reserve()
+        if waitTime > 0:
+            sleep(waitTime)
+        return waitTime
+
+    def onSuccess(self):
+        """Signale une réponse 2XX, et augmente le débit
+        """
+        with self._lock:
+            self._refill(monotonic())
+            self.rate = min(self.maxRate, self.rate + self.increaseStep)
+
+    def onThrottle(self):
+        """Signale une réponse 5XX ou 429, et réduit le débit
+        """
+        with self._lock:
+            now = monotonic()
+            if now - self._lastDecrease < 1 / self.rate:
+                return
+            self._refill(now)
+            self._lastDecrease = now
+            self.rate = max(self.minRate, self.rate * self.decreaseFactor)
+
+    @staticmethod
+    def backoff(attempt:int, base:float = BACKOFF_BASE, maximum:float = BACKOFF_MAX) -> float:
+        """Retourne le temps à attendre avant la tentative N° attempt (exponential backoff, full jitter)
+
+        Args:
+            attempt (int): Le numéro de la tentative (commence à 1)
+            base (float, optional): Le délai de base. Defaults to BACKOFF_BASE.
+            maximum (float, optional): Le délai maximum. Defaults to BACKOFF_MAX.
+
+        Returns:
+            float: Le temps à attendre, en secondes
+        """
+        #Le jitter évite que tous les threads réessayent au même moment
+        return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+    @staticmethod
+    def getShared() -> 'ERateLimiter':
+        """Retourne le limiter partagé par toutes les requêtes du scraper
+
+        Returns:
+            ERateLimiter: Le limiter partagé
+        """
+        if private.shared is None:
+            with private.sharedLock:
+                if private.shared is None:
+                    private.shared = ERateLimiter()
+        return private.shared
+
+    @staticmethod
+    def configureShared(requestsPerSecond:float = DEFAULT_RATE, **kwargs) -> 'ERateLimiter':
+        """Remplace le limiter partagé par un nouveau, configuré avec les paramètres spécifiés
+
+        Args:
+            requestsPerSecond (float, optional): Le débit initial. Defaults to DEFAULT_RATE.
+            **kwargs: Les autres paramètres du constructeur (minRate, maxRate, etc...)
+
+        Returns:
+            ERateLimiter: Le nouveau limiter partagé
+        """
+        with private.sharedLock:
+            private.shared = ERateLimiter(requestsPerSecond, **kwargs)
+        return private.shared
@@ -0,0 +1,159 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet ERecord,
+#   la classe de base des objets jobup (EJob, ECompany, EAddress)
+#   Utilisation: from ERecord import ERecord
+
+from datetime import timezone
+from operator import attrgetter
+from EHelper import EHelper
+
+class ISODate:
+    """Type des champs contenant une date (Ex. publication_date), utilisé dans FIELDS
+        Les dates sont stockées en UTC, au format ISO 8601 (Ex. 2020-05-01T06:00:00Z), et peuvent donc être triées et comparées en SQL
+    """
+
+#Le type des colonnes en DB, par type de champ
+SQL_TYPES:dict = {
+    int: 'INTEGER',
+    float: 'REAL',
+    #Les booléens sont stockés en 0 / 1
+    bool: 'INTEGER',
+    ISODate: 'TEXT',
+    str: 'TEXT'
+}
+
+class private:
+    """Contient les variables privées
+    """
+    #Les attrgetter de chaque type, qui retournent tous les champs d'un objet en un seul appel
+    fieldGetters:dict = {}
+    #Les fonctions de conversion de chaque champ, par type (voir ERecord.toSQLValue)
+    fieldConverters:dict = {}
+
+    @staticmethod
+    def isEmpty(val:object) -> bool:
+        return val is None or (type(val) is str and len(val.strip()) == 0)
+
+    @staticmethod
+    def toInt(val:object) -> object:
+        if private.isEmpty(val):
+            return None
+        if type(val) is int:
+            return val
+        if type(val) is float:
+            return int(val) if val.is_integer() else val
+        try:
+            return int(val)
+        except (TypeError, ValueError):
+            #La valeur n'est pas un nombre (Ex. un ID hexadécimal), elle est gardée telle quelle
+            return ERecord.toSQLValue(val)
+
+    @staticmethod
+    def toFloat(val:object) -> object:
+        if private.isEmpty(val):
+            return None
+        if type(val) is float:
+            return val
+        try:
+            return float(val)
+        except (TypeError, ValueError):
+            return ERecord.toSQLValue(val)
+
+    @staticmethod
+    def toBool(val:object) -> object:
+        if private.isEmpty(val):
+            return None
+        if type(val) is bool or type(val) is int:
+            return 1 if val else 0
+        text = str(val).strip().lower()
+        if text in ('true', '1'):
+            return 1
+        if text in ('false', '0'):
+            return 0
+        return ERecord.toSQLValue(val)
+
+    @staticmethod
+    def toISODate(val:object) -> object:
+        if private.isEmpty(val):
+            return None
+        date = EHelper.parseDate(val) if type(val) is str else None
+        if date is None:
+            return ERecord.toSQLValue(val)
+        return date.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+#Les fonctions de conversion, par type de champ
+CONVERTERS:dict = {
+    int: private.toInt,
+    float: private.toFloat,
+    bool: private.toBool,
+    ISODate: private.toISODate
+}
+
+class ERecord:
+    """Classe de base des objets jobup
+        Chaque sous-classe déclare ses champs dans FIELDS, au format ((nom, type), ...),
+        puis __slots__ = tuple(name for name, _ in FIELDS)
+        Les instances n'ont ainsi pas de __dict__, et l'ordre des champs est celui des colonnes en DB
+        Le type d'un champ (voir SQL_TYPES) définit le type de sa colonne, et la conversion de sa valeur à l'écriture
+    """
+    __slots__ = ()
+    FIELDS:tuple = ()
+
+    def __getattr__(self, name:str):
+        #__getattr__ n'est appelé que si l'attribut n'a pas été assigné
+        #Un champ qui n'est pas assigné lors du mapping vaut None (NULL en DB)
+        if name in type(self).__slots__:
+            return None
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    @classmethod
+    def getFieldNames(cls) -> tuple:
+        """Retourne le nom des champs, dans l'ordre de déclaration
+
+        Returns:
+            tuple: Le nom des champs
+        """
+        return cls.__slots__
+
+    @classmethod
+    def getFieldTypes(cls) -> dict:
+        """Retourne le type de chaque champ
+
+        Returns:
+            dict: {nom -> type}
+        """
+        return dict(cls.FIELDS)
+
+    def toTuple(self) -> tuple:
+        """Retourne les valeurs des champs, dans l'ordre de déclaration,
+            converties selon le type de chaque champ et prêtes à être passées en paramètres à sqlite3
+
+        Returns:
+            tuple: Les valeurs des champs
+        """
+        getter = private.fieldGetters.get(type(self))
+        if getter is None:
+            getter = attrgetter(*self.__slots__)
+            private.fieldGetters[type(self)] = getter
+            private.fieldConverters[type(self)] = tuple(CONVERTERS.get(fieldType, ERecord.toSQLValue) for _, fieldType in self.FIELDS)
+        return tuple(map(lambda convert, val: convert(val), private.fieldConverters[type(self)], getter(self)))
+
+    @staticmethod
+    def toSQLValue(val:object, fieldType:type = str) -> object:
+        """Convertit une valeur en un type que sqlite3 sait lier, selon le type du champ
+
+        Args:
+            val (object): La valeur
+            fieldType (type, optional): Le type du champ (voir SQL_TYPES). Defaults to str.
+
+        Returns:
+            object: La valeur convertie. Une valeur qui ne peut pas être convertie est gardée telle quelle,
+                ou convertie en string si ce n'est pas un type de base
+        """
+        convert = CONVERTERS.get(fieldType)
+        if convert is not None:
+            return convert(val)
+        if val is None or type(val) is int or type(val) is float or type(val) is str:
+            return val
+        return str(val)
@@ -0,0 +1,189 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet EResponseCache,
+#   un cache sur disque des réponses de jobup (détail des postes et des entreprises), utilisé pour les requêtes conditionnelles
+#   Utilisation: from EResponseCache import EResponseCache
+
+import sqlite3
+import threading
+from time import time
+from typing import Union
+
+#Fichier du cache, séparé de la DB principale : il peut être supprimé sans perte de données
+DEFAULT_CACHE_FILE = 'jobup_cache.db'
+#Taille maximum des réponses stockées, en octets (256 Mo)
+DEFAULT_MAX_BYTES = 268435456
+#Lorsque la taille maximum est dépassée, les réponses les moins récemment utilisées sont supprimées
+#jusqu'à revenir à EVICT_RATIO * maxBytes, afin de ne pas évincer à chaque nouvelle réponse
+EVICT_RATIO = 0.9
+#Temps d'attente maximum lorsque le cache est verrouillé par un autre processus (voir EWorker), en secondes
+BUSY_TIMEOUT_SECONDS = 30
+#Le cache peut être perdu sans conséquence (les réponses sont simplement retéléchargées),
+#synchronous=OFF évite donc une écriture disque synchrone par réponse
+CACHE_PROFILE:dict = {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF'
+}
+RESPONSES = 'responses'
+
+class private:
+    """Contient les variables et méthodes privées
+    """
+    #Les requêtes sont exécutées par plusieurs threads (voir EFetcher), la connexion est donc protégée par un lock
+    lock = threading.Lock()
+    conn:sqlite3.Connection = None
+    path:str = None
+    maxBytes:int = DEFAULT_MAX_BYTES
+    #Taille totale des réponses stockées, calculée à l'ouverture puis mise à jour à chaque écriture
+    #Lorsque plusieurs processus partagent le cache (voir EWorker), chacun ne compte que ses propres écritures :
+    #la taille peut donc dépasser maxBytes, jusqu'à la prochaine ouverture du cache
+    totalBytes:int = 0
+
+    @staticmethod
+    def open(path:str) -> sqlite3.Connection:
+        """Ouvre le cache, et crée la table des réponses si celle-ci n'existe pas
+        """
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False, isolation_level=None)
+        for pragma, val in CACHE_PROFILE.items():
+            conn.execute(f'PRAGMA {pragma} = {val}')
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS "{RESPONSES}" (
+                        url TEXT PRIMARY KEY,
+                        etag TEXT,
+                        last_modified TEXT,
+                        body BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        accessed_at REAL NOT NULL)''')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON "{RESPONSES}"(accessed_at)')
+        return conn
+
+    @staticmethod
+    def evict():
+        """Supprime les réponses les moins récemment utilisées, jusqu'à revenir sous EVICT_RATIO * maxBytes
+            Doit être appelée avec private.lock
+        """
+        target = int(private.maxBytes * EVICT_RATIO)
+        urls:list = []
+        for url, size in private.conn.execute(f'SELECT url, size FROM "{RESPONSES}" ORDER BY accessed_at'):
+            if private.totalBytes <= target:
+                break
+            urls.append((url,))
+            private.totalBytes -= size
+        private.conn.executemany(f'DELETE FROM "{RESPONSES}" WHERE url = ?', urls)
+
+class EResponseCache:
+    """Cache LRU sur disque des réponses de jobup, au format {URL -> (ETag, Last-Modified, contenu)}
+        Le cache est désactivé tant qu'EResponseCache.configure n'a pas été appelée (voir main.configure)
+    """
+
+    @staticmethod
+    def configure(path:str = DEFAULT_CACHE_FILE, maxBytes:int = DEFAULT_MAX_BYTES):
+        """Ouvre le cache (ou le ferme si path est None)
+
+        Args:
+            path (str, optional): Le fichier du cache. Defaults to DEFAULT_CACHE_FILE.
+            maxBytes (int, optional): La taille maximum des réponses stockées, en octets. Defaults to DEFAULT_MAX_BYTES.
+        """
+        with private.lock:
+            if private.conn is not None:
+                private.conn.close()
+                private.conn = None
+            private.path = path
+            private.maxBytes = maxBytes
+            private.totalBytes = 0
+            if path is not None:
+                private.conn = private.open(path)
+                private.totalBytes = private.conn.execute(f'SELECT COALESCE(SUM(size), 0) FROM "{RESPONSES}"').fetchone()[0]
+                if private.totalBytes > private.maxBytes:
+                    private.evict()
+
+    @staticmethod
+    def isEnabled() -> bool:
+        return private.conn is not None
+
+    @staticmethod
+    def getValidators(url:str) -> dict:
+        """Retourne les en-têtes de requête conditionnelle pour une URL en cache
+
+        Args:
+            url (str): L'URL
+
+        Returns:
+            dict: If-None-Match et/ou If-Modified-Since, ou {} si l'URL n'est pas en cache
+        """
+        if private.conn is None:
+            return {}
+        with private.lock:
+            row = private.conn.execute(f'SELECT etag, last_modified FROM "{RESPONSES}" WHERE url = ?', (url,)).fetchone()
+        headers:dict = {}
+        if row is not None:
+            if row[0] is not None:
+                headers['If-None-Match'] = row[0]
+            if row[1] is not None:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    @staticmethod
+    def get(url:str) -> Union[bytes, None]:
+        """Retourne le contenu en cache d'une URL (Ex. après une réponse 304), et la marque comme récemment utilisée
+
+        Args:
+            url (str): L'URL
+
+        Returns:
+            Union[bytes, None]: Le contenu, ou None si l'URL n'est pas en cache
+        """
+        if private.conn is None:
+            return None
+        with private.lock:
+            row = private.conn.execute(f'SELECT body FROM "{RESPONSES}" WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            private.conn.execute(f'UPDATE "{RESPONSES}" SET accessed_at = ? WHERE url = ?', (time(), url))
+        return row[0]
+
+    @staticmethod
+    def put(url:str, body:bytes, etag:str = None, lastModified:str = None) -> bool:
+        """Stocke une réponse, si celle-ci a un validateur (ETag ou Last-Modified)
+            Sans validateur, le serveur ne pourra jamais répondre 304, la réponse n'est donc pas stockée
+
+        Args:
+            url (str): L'URL
+            body (bytes): Le contenu de la réponse
+            etag (str, optional): L'en-tête ETag de la réponse. Defaults to None.
+            lastModified (str, optional): L'en-tête Last-Modified de la réponse. Defaults to None.
+
+        Returns:
+            bool: True si la réponse a été stockée
+        """
+        if private.conn is None or (etag is None and lastModified is None) or len(body) > private.maxBytes:
+            return False
+        with private.lock:
+            previous = private.conn.execute(f'SELECT size FROM "{RESPONSES}" WHERE url = ?', (url,)).fetchone()
+            private.conn.execute(f'INSERT OR REPLACE INTO "{RESPONSES}" VALUES (?, ?, ?, ?, ?, ?)',
+                                 (url, etag, lastModified, sqlite3.Binary(body), len(body), time()))
+            private.totalBytes += len(body) - (previous[0] if previous is not None else 0)
+            if private.totalBytes > private.maxBytes:
+                private.evict()
+        return True
+
+    @staticmethod
+    def remove(url:str):
+        """Supprime une URL du cache (Ex. le poste n'existe plus)
+        """
+        if private.conn is None:
+            return
+        with private.lock:
+            previous = private.conn.execute(f'SELECT size FROM "{RESPONSES}" WHERE url = ?', (url,)).fetchone()
+            if previous is not None:
+                private.conn.execute(f'DELETE FROM "{RESPONSES}" WHERE url = ?', (url,))
+                private.totalBytes -= previous[0]
+
+    @staticmethod
+    def getStats() -> dict:
+        """Retourne le nombre de réponses stockées et leur taille totale, en octets
+        """
+        if private.conn is None:
+            return {'responses': 0, 'bytes': 0}
+        with private.lock:
+            nbResponses = private.conn.execute(f'SELECT COUNT(*) FROM "{RESPONSES}"').fetchone()[0]
+            return {'responses': nbResponses, 'bytes': private.totalBytes}
@@ -5,23 +5,41 @@
 #   Utilisation: from EScraper import EScraper
 
 import json
+import os
 import requests
-from time import sleep
+from urllib.parse import quote
+from ESession import ESession
+from ERateLimiter import ERateLimiter
+from EMetrics import EMetrics, REQUEST_SECONDS, RESPONSES_TOTAL, SLEEP_SECONDS_TOTAL, CACHE_RESPONSES_TOTAL, CACHE_BYTES_SAVED_TOTAL
+from EResponseCache import EResponseCache
+from time import perf_counter, sleep
 from pprint import pprint
 from EJob import EJob
 from ECompany import ECompany
 from EHelper import EHelper
+from ELogger import ELogger
 from enum import Enum
-from typing import Union
+from typing import Callable, Iterator, Union
+
+#URL de l'API jobup
+DEFAULT_API_URL = "https://www.jobup.ch/api/v1/public"
+#Variable d'environnement permettant de remplacer l'URL de l'API (Ex. serveur de test, voir benchmarks/replay.py)
+#Celle-ci est lue une seule fois, à l'import du module
+API_URL_ENV = 'JOBUP_API_URL'
 
 class API(Enum):
-    BASE = "https://www.jobup.ch/api/v1/public"
+    BASE = os.environ.get(API_URL_ENV, DEFAULT_API_URL).rstrip('/')
     SEARCH = BASE + '/search'
     JOB = SEARCH + '/job/'
     COMPANY = BASE + '/company/'
     IT_CATEGORIES = 'category-ids%5B0%5D=702&category-ids%5B1%5D=703&category-ids%5B2%5D=704&category-ids%5B3%5D=705&category-ids%5B4%5D=706&category-ids%5B5%5D=707&category-ids%5B6%5D=708&category-ids%5B7%5D=709&category-ids%5B8%5D=710&category-ids%5B9%5D=711&category-ids%5B10%5D=712&category-ids%5B11%5D=713&category-ids%5B12%5D=714&category-ids%5B13%5D=715'
     SEARCH_IT = f"{SEARCH}?{IT_CATEGORIES}"
 
+#Les IDs des 14 catégories IT, utilisées dans API.IT_CATEGORIES
+IT_CATEGORY_IDS:tuple = tuple(range(702, 716))
+#Nombre maximum de résultats retournés par une recherche jobup (au-delà, l'API retourne 422)
+SEARCH_LIMIT = 2000
+
 class HTTP_CODES(Enum):
     """ Le premier chiffre des codes de statut HTML représentent le type de status
         2XX -> Pas d'erreur
@@ -33,9 +51,12 @@ class HTTP_CODES(Enum):
     """
     OK = '2'
     REDIRECT = '3'
+    #Réponse à une requête conditionnelle (voir EResponseCache) : le contenu en cache est toujours valide
+    NOT_MODIFIED = '304'
     ERR_CLIENT = '4'
     ERR_PAGE_NOT_FOUND = '404'
     ERR_JOBUP_SEARCH_LIMIT = '422'
+    ERR_TOO_MANY_REQUESTS = '429'
     ERR_SERVER = '5'
     ERR_GATEWAY = '502'
     #UNDEFINED est utilisé pour les valeurs inconnues
@@ -43,6 +64,20 @@ class HTTP_CODES(Enum):
     #et sera ainsi la valeur par défaut
     UNDEFINED = ''
 
+#Nombre de nouvelles tentatives par type d'erreur
+#Les codes absents de ce dictionnaire ne sont pas réessayés
+RETRY_POLICY:dict = {
+    HTTP_CODES.ERR_GATEWAY: 5,
+    HTTP_CODES.ERR_TOO_MANY_REQUESTS: 5,
+    HTTP_CODES.ERR_SERVER: 3,
+    #UNDEFINED correspond aussi aux erreurs réseau (timeout, connexion refusée, etc...)
+    HTTP_CODES.UNDEFINED: 3
+}
+#Les codes indiquant que le serveur est surchargé, et que le débit doit être réduit
+THROTTLE_CODES:tuple = (HTTP_CODES.ERR_GATEWAY, HTTP_CODES.ERR_TOO_MANY_REQUESTS, HTTP_CODES.ERR_SERVER)
+#Les codes indiquant qu'une entreprise est cachée ou n'existe plus : inutile de la redemander à chaque lancement
+HIDDEN_CODES:tuple = (HTTP_CODES.ERR_CLIENT, HTTP_CODES.ERR_PAGE_NOT_FOUND)
+
 
 class private:
     """ Contient les méthodes privées.
@@ -82,23 +117,149 @@ class private:
 
 
     @staticmethod
-    def queryResultOrError(url:str) -> Union[requests.Response, HTTP_CODES]:
-        """Query l'url et retourne la réponse, ou False si une erreur est survenue (code html autre que 2XX)
+    def getEndpoint(url:str) -> str:
+        """Retourne le type de route d'une URL, utilisé comme label des métriques
+
+        Args:
+            url (str): L'URL
+
+        Returns:
+            str: 'job', 'search', 'company' ou 'other'
+        """
+        #JOB commence par SEARCH, il doit donc être testé en premier
+        if url.startswith(API.JOB.value):
+            return 'job'
+        if url.startswith(API.SEARCH.value):
+            return 'search'
+        if url.startswith(API.COMPANY.value):
+            return 'company'
+        return 'other'
+
+    @staticmethod
+    def getRetryDelay(result:requests.Response, attempt:int) -> float:
+        """Retourne le temps à attendre avant de réessayer une requête
+
+        Args:
+            result (requests.Response): La réponse en erreur (None si erreur réseau)
+            attempt (int): Le numéro de la nouvelle tentative
+
+        Returns:
+            float: Le temps à attendre, en secondes
+        """
+        #Si le serveur précise combien de temps attendre (429, 503), on respecte sa demande
+        if result is not None:
+            retryAfter = result.headers.get('Retry-After', '')
+            if retryAfter.isdigit():
+                return float(retryAfter)
+        return ERateLimiter.backoff(attempt)
+
+    @staticmethod
+    def queryResultOrError(url:str, headers:dict = None) -> Union[requests.Response, HTTP_CODES]:
+        """Query l'url et retourne la réponse, ou le code d'erreur si une erreur est survenue (code html autre que 2XX ou 304)
+            Chaque requête passe par le limiter partagé, et les erreurs sont réessayées selon RETRY_POLICY
 
         Args:
             url (str): L'URL à query
+            headers (dict, optional): Des en-têtes à ajouter à la requête (Ex. If-None-Match). Defaults to None.
 
         Returns:
             Union[requests.Response, HTTP_CODES]: La réponse, ou le type d'erreur
         """
-        result = requests.get(url)
-        code = private.getQueryStatusFromString(str(result.status_code))
+        limiter = ERateLimiter.getShared()
+        endpoint = private.getEndpoint(url)
+        attempt = 0
 
-        if code is HTTP_CODES.OK:
+        while True:
+            EMetrics.increment(SLEEP_SECONDS_TOTAL, {'reason': 'rate_limit'}, limiter.acquire())
+            start = perf_counter()
+            try:
+                result = ESession.get(url, headers=headers)
+                code = private.getQueryStatusFromString(str(result.status_code))
+            except requests.exceptions.RequestException:
+                result = None
+                code = HTTP_CODES.UNDEFINED
+            EMetrics.observe(REQUEST_SECONDS, perf_counter() - start, {'endpoint': endpoint})
+            EMetrics.increment(RESPONSES_TOTAL, {'endpoint': endpoint, 'code': code.name})
+
+            if code is HTTP_CODES.OK or code is HTTP_CODES.NOT_MODIFIED:
+                limiter.onSuccess()
+                return result
+
+            if code in THROTTLE_CODES:
+                limiter.onThrottle()
+
+            if attempt >= RETRY_POLICY.get(code, 0):
+                return code
+
+            attempt += 1
+            delay = private.getRetryDelay(result, attempt)
+            EMetrics.increment(SLEEP_SECONDS_TOTAL, {'reason': 'retry'}, delay)
+            sleep(delay)
+
+
+    @staticmethod
+    def queryJSONOrError(url:str) -> Union[object, HTTP_CODES]:
+        """Query l'url via une requête conditionnelle, et retourne le JSON de la réponse, ou le code d'erreur
+            Si le serveur répond 304, le contenu est lu depuis EResponseCache au lieu d'être retéléchargé
+            Utilisée pour le détail des postes et des entreprises, dont le contenu change rarement
+
+        Args:
+            url (str): L'URL à query
+
+        Returns:
+            Union[object, HTTP_CODES]: Le JSON de la réponse, ou le type d'erreur
+        """
+        if not EResponseCache.isEnabled():
+            result = private.queryResultOrError(url)
+            return result.json() if type(result) is requests.Response else result
+
+        endpoint = private.getEndpoint(url)
+        result = private.queryResultOrError(url, EResponseCache.getValidators(url))
+        if type(result) is HTTP_CODES:
+            if result is HTTP_CODES.ERR_PAGE_NOT_FOUND:
+                EResponseCache.remove(url)
             return result
-        else:
-            return code
 
+        if result.status_code == 304:
+            body = private.getCachedBody(url, endpoint)
+            if body is not None:
+                return json.loads(body)
+            #La réponse a été évincée entre la lecture des validateurs et la réponse, on la redemande sans condition
+            result = private.queryResultOrError(url)
+            if type(result) is HTTP_CODES:
+                return result
+
+        private.cacheResponse(url, endpoint, result)
+        return result.json()
+
+    @staticmethod
+    def getCachedBody(url:str, endpoint:str) -> Union[bytes, None]:
+        """Retourne le contenu en cache d'une URL, après une réponse 304 (voir queryJSONOrError)
+
+        Args:
+            url (str): L'URL
+            endpoint (str): Le type de route (voir getEndpoint)
+
+        Returns:
+            Union[bytes, None]: Le contenu, ou None s'il a été évincé
+        """
+        body = EResponseCache.get(url)
+        if body is not None:
+            EMetrics.increment(CACHE_RESPONSES_TOTAL, {'endpoint': endpoint, 'result': 'hit'})
+            EMetrics.increment(CACHE_BYTES_SAVED_TOTAL, {'endpoint': endpoint}, len(body))
+        return body
+
+    @staticmethod
+    def cacheResponse(url:str, endpoint:str, result:requests.Response):
+        """Garde une réponse 2XX dans le cache, avec ses validateurs (ETag, Last-Modified)
+
+        Args:
+            url (str): L'URL
+            endpoint (str): Le type de route (voir getEndpoint)
+            result (requests.Response): La réponse
+        """
+        EMetrics.increment(CACHE_RESPONSES_TOTAL, {'endpoint': endpoint, 'result': 'miss'})
+        EResponseCache.put(url, result.content, result.headers.get('ETag'), result.headers.get('Last-Modified'))
 
     @staticmethod
     def getJob(jobID: str) -> Union[object, HTTP_CODES]:
@@ -108,12 +269,12 @@ class private:
         Returns:
                 Union[object, HTTP_CODES]: Les données du job
         """
-        result = private.queryResultOrError(f"{API.JOB.value}{jobID}")
-        if type(result) is requests.Response:
-            return result.json()
+        result = private.queryJSONOrError(f"{API.JOB.value}{jobID}")
+        if type(result) is not HTTP_CODES:
+            return result
         else:
-            #@TODO Décider quoi faire lorsque le scraping d'un poste échoue
-            EHelper.printError(f"Erreur lors de la récupération du job : {jobID}", str(result))
+            #L'erreur est affichée par l'appelant, qui sait si elle est attendue (Ex. poste supprimé)
+            ELogger.debug(f"Erreur lors de la récupération du job : {jobID}", str(result))
             return result
 
     @staticmethod
@@ -129,7 +290,7 @@ class private:
             #Pas besoin de faire d'error checking sur la valeur de retour de getJob, car getJob le fait déjà
             return private.getJob(id)
 
-        EHelper.printError("Erreur lors de la récupération de l'ID du dernier poste via la recherche", str(idQuery))
+        ELogger.error("Erreur lors de la récupération de l'ID du dernier poste via la recherche", str(idQuery))
         return idQuery
         
 
@@ -143,27 +304,28 @@ class private:
         Returns:
             Union[object, HTTP_CODES]: Les informations de l'entreprise
         """
-        company = private.queryResultOrError(f"{API.COMPANY.value}{companyID}")
-        if type(company) is requests.Response:
-            return company.json()
+        company = private.queryJSONOrError(f"{API.COMPANY.value}{companyID}")
+        if type(company) is not HTTP_CODES:
+            return company
 
-        #@TODO Décider quoi faire si company n'est pas trouvé
-        EHelper.printError(f"Erreur lors de la récupération de l'entreprise {companyID}", str(company))
+        #L'erreur est affichée par l'appelant (Ex. entreprise cachée, voir main.enrichCompanies)
+        ELogger.debug(f"Erreur lors de la récupération de l'entreprise {companyID}", str(company))
         return company
 
     @staticmethod
-    def getSearchPage(page:int, query = '', rows:int = 20) -> Union[object, HTTP_CODES]:
+    def getSearchPage(page:int, query = '', rows:int = 20, searchURL:str = API.SEARCH_IT.value) -> Union[object, HTTP_CODES]:
         """Retourne une page de la recherche
 
         Args:
             page (int): le numéro de page (commence à 1)
             query (str, optional): Le texte à rechercher. Defaults to ''.
             rows (int, optional): Le nombre de résultats à retourner par page. Defaults to 100.
+            searchURL (str, optional): L'URL de la recherche, filtres compris (voir private.getSearchURL). Defaults to API.SEARCH_IT.
 
         Returns:
             object: Le résultat de la recherche
         """
-        queryString:str = f"{API.SEARCH_IT.value}&page={page}&rows={rows}"
+        queryString:str = f"{searchURL}&page={page}&rows={rows}"
         if(len(query) > 0):
             queryString += '&' + query
 
@@ -171,11 +333,126 @@ class private:
         if type(result) is requests.Response:
             return result.json()
             
-        EHelper.printError(f"Erreur lors de la récupération de la page {page}", str(result))
+        #L'erreur est affichée par l'appelant (voir iterSearchPages)
+        ELogger.debug(f"Erreur lors de la récupération de la page {page}", str(result))
         return result
 
     
 
+    @staticmethod
+    def getSearchURL(filters:dict) -> str:
+        """Retourne l'URL d'une recherche filtrée
+
+        Args:
+            filters (dict): Les filtres, au format {nom du paramètre -> liste d'IDs} (Ex. {'category-ids': [702, 703]})
+                Un paramètre dont la valeur n'est pas une liste est passé tel quel (Ex. {'term': 'python'})
+
+        Returns:
+            str: L'URL de la recherche
+        """
+        params = []
+        for name, ids in filters.items():
+            if type(ids) is not list and type(ids) is not tuple:
+                params.append(f"{name}={quote(str(ids))}")
+                continue
+            #Les listes sont passées au format name[0]=id&name[1]=id ([ et ] encodés en %5B et %5D)
+            params += [f"{name}%5B{i}%5D={id}" for i, id in enumerate(ids)]
+        return f"{API.SEARCH.value}?{'&'.join(params)}"
+
+    @staticmethod
+    def iterSearchPages(searchURL:str = API.SEARCH_IT.value, label:str = '') -> Iterator[list]:
+        """Parcourt toutes les pages de la recherche, et retourne (yield) les postes de chaque page dès sa réception
+
+        Args:
+            searchURL (str, optional): L'URL de la recherche, filtres compris. Defaults to API.SEARCH_IT.
+            label (str, optional): Le nom de la recherche, affiché avec la progression. Defaults to ''.
+
+        Yields:
+            list: Les postes de la page, tels que retournés dans documents par la recherche
+
+        Returns:
+            bool: True si la recherche a été parcourue jusqu'au bout, False si elle a été abandonnée sur une erreur
+        """
+        currPage = 1
+
+        while True:
+            ELogger.progress(f"Scraping page de recherche {label}", str(currPage) + '/?')
+            page = private.getSearchPage(currPage, searchURL=searchURL)
+            if type(page) is HTTP_CODES:
+                if page is HTTP_CODES.ERR_GATEWAY:
+                    #l'API renvoie une gateway error sur certaines requêtes
+                    #Cela ne veut pas dire qu'il n'y a plus de résultats
+                    #/!\ Généralement, une requête qui retourne une gateway error retournera toujours une gateway error/!\
+                    #queryResultOrError a déjà réessayé la page selon RETRY_POLICY, on passe donc à la page suivante
+                    ELogger.warning(f"Gateway error page N°{currPage} de la recherche {label}, page ignorée", page.name)
+                    currPage += 1
+                    continue
+                elif page is HTTP_CODES.ERR_JOBUP_SEARCH_LIMIT:
+                    #La limite de recherche est atteinte, la recherche est finie
+                    ELogger.endProgress()
+                    return True
+                else:
+                    #Erreur inconnue
+                    ELogger.error(f"Erreur inconnue lors du scraping de la page N°{currPage} de la recherche {label}, abandon", page.name)
+                    return False
+            elif len(page['documents']) == 0:
+                #Moins de 2000 résultats, toutes les pages ont été parcourues
+                ELogger.endProgress()
+                return True
+            else:
+                yield page['documents']
+                currPage += 1
+
+    @staticmethod
+    def getAllSearchPages(mapDocument:Callable, searchURL:str = API.SEARCH_IT.value, label:str = '') -> list:
+        """Parcourt toutes les pages de la recherche, et retourne le résultat de mapDocument pour chaque poste
+
+        Args:
+            mapDocument (Callable): La fonction appelée pour chaque poste de la recherche
+            searchURL (str, optional): L'URL de la recherche, filtres compris. Defaults to API.SEARCH_IT.
+            label (str, optional): Le nom de la recherche, affiché avec la progression. Defaults to ''.
+
+        Returns:
+            list: Une liste par page, contenant le résultat de mapDocument pour chaque poste de la page
+        """
+        return [list(map(mapDocument, page)) for page in private.iterSearchPages(searchURL, label)]
+
+    @staticmethod
+    def filterNewDocuments(documents:list, highWaterDate, seenIDs:set) -> tuple:
+        """Retourne les postes d'une page de recherche publiés depuis le high-water mark (voir EScraper.iterNewPages)
+
+        Args:
+            documents (list): Les postes de la page, tels que retournés dans documents par la recherche
+            highWaterDate (datetime): Le high-water mark (None si inconnu)
+            seenIDs (set): Les IDs des postes les plus récents déjà en DB
+
+        Returns:
+            tuple: Les nouveaux postes, et True si les pages suivantes ne contiennent que des postes déjà en DB
+        """
+        #Si tous les postes de la page sont publiés avant (ou au moment du) high-water mark,
+        #les pages suivantes ne contiennent que des postes déjà en DB
+        pageIsOld = highWaterDate is not None
+        newDocuments:list = []
+        for job in documents:
+            jobID = job['job_id']
+            jobDate = EHelper.parseDate(job.get('publication_date'))
+            if highWaterDate is not None and jobDate is not None:
+                if jobDate > highWaterDate:
+                    pageIsOld = False
+                #Un poste publié à la même date que le high-water mark peut être nouveau,
+                #on utilise seenIDs pour le savoir
+                elif jobDate < highWaterDate or jobID in seenIDs:
+                    continue
+            else:
+                #Sans date, on ne peut pas savoir si la page est ancienne
+                pageIsOld = False
+                if jobID in seenIDs:
+                    continue
+            newDocuments.append(job)
+        return newDocuments, pageIsOld
+
+
+
 class EScraper:
     """ Contient différentes méthodes publiques permettant de récupérer des EJob
         à partir de l'API Jobup
@@ -221,101 +498,133 @@ class EScraper:
         if type(company) is HTTP_CODES:
             return company
         else:
-            return EHelper.MapObjectToNewType(company, ECompany)    
+            return EScraper.mapCompany(company)
+
+    @staticmethod
+    def mapCompany(document:dict) -> ECompany:
+        """Mappe une entreprise retournée par l'API en ECompany
+
+        Args:
+            document (dict): L'entreprise, telle que retournée par l'API
+
+        Returns:
+            ECompany: L'entreprise
+        """
+        return EHelper.MapObjectToNewType(document, ECompany)
 
     
+    @staticmethod
+    def mapSearchDocument(document:dict) -> EJob:
+        """Mappe un poste retourné par la recherche en EJob, sans récupérer le détail du poste
+            Les champs absents de la recherche (voir DETAIL_ONLY_FIELDS) restent vides
+
+        Args:
+            document (dict): Le poste, tel que retourné dans documents par la recherche
+
+        Returns:
+            EJob: Le poste
+        """
+        return EHelper.MapObjectToNewType(document, EJob)
+
     @staticmethod
     def getAllAvailableJobIDsFromJobup() -> list:
         """Retourne l'ID de tous les postes actuellement jobup
 
 
         Returns:
-            list: Une liste contenant l'ID de tous les postes sur jobup
+            list: Une liste contenant l'ID de tous les postes sur jobup, une liste par page
         """
-        currPage = 1
-        result = []
-        currPageIDs = []
+        return private.getAllSearchPages(lambda job: job['job_id'])
 
-        while True:
-            EHelper.printInfo("Scraping page de recherche", str(currPage) + '/?')
-            page = private.getSearchPage(currPage)
-            if type(page) is HTTP_CODES:
-                if page is HTTP_CODES.ERR_GATEWAY:
-                #l'API renvoie une gateway error sur certaines requêtes
-                #Cela ne veut pas dire qu'il n'y a plus de résultats
-                #/!\ Généralement, une requête qui retourne une gateway error retournera toujours une gateway error/!\
-                #@TODO Trouver un moyen de régler les gateway error
-                    print('')
-                    EHelper.printError(f"Gateway error page N°{page.value}, on attend 10 secondes avant de réessayer")
-                    sleep(10)
-                     #currPage ne sera pas incrémenté, ainsi on peut simplement passer
-                     #à la boucle suivante pour réessayer de scraper la page actuelle
-                    continue
-                elif page is HTTP_CODES.ERR_JOBUP_SEARCH_LIMIT:
-                    #La limite de recherche est atteinte, la recherche est finie
-                    print('')
-                    return result
-                else:
-                    print('')
-                    #Erreur inconnue
-                    EHelper.printError("Erreur inconnue lors du scraping de la page, abandon")
-                    return result
-            else:
-                currPageIDs = list(map(lambda job: job['job_id'], page['documents']))
-                result.append(currPageIDs)
-                currPage += 1
-                #La fonction va envoyer entre 20 et 100 requêtes, selon le nombre de lignes retournées
-                #On attend 500ms entre chaque requête, afin d'éviter de surcharger le service
-                sleep(0.5)
+    @staticmethod
+    def getAllAvailableJobsFromSearch() -> list:
+        """Retourne tous les postes actuellement sur jobup, mappés directement depuis la recherche
+            (une requête par page de recherche, au lieu d'une requête par poste)
+
+        Returns:
+            list: Une liste contenant tous les postes (EJob) sur jobup, une liste par page
+        """
+        return private.getAllSearchPages(EScraper.mapSearchDocument)
 
     @staticmethod
-    def getAllNewJobs(lastJobID:str)-> list:
-        """Retourne tous les jobs postés depuis le poste le plus récent en DB
+    def iterNewPages(highWater:str, seenIDs:set = None, searchURL:str = API.SEARCH_IT.value) -> Iterator[list]:
+        """Parcourt la recherche, et retourne (yield) les postes de chaque page publiés depuis le high-water mark
 
         Args:
-            lastJobID (str): l'ID du job le plus récent en DB
+            highWater (str): La date de publication la plus récente en DB (voir EDatabase.getSyncState)
+            seenIDs (set, optional): Les IDs des postes les plus récents déjà en DB. Defaults to None.
+            searchURL (str, optional): L'URL de la recherche, filtres compris (voir ECrawlProfile). Defaults to API.SEARCH_IT.
+
+        Yields:
+            list: Les nouveaux postes de la page, tels que retournés dans documents par la recherche, du plus récent au plus ancien
 
         Returns:
-            list: Retourne une liste d'EJob
+            bool: True si tous les nouveaux postes ont été parcourus, False si la recherche a été abandonnée sur une erreur
         """
         #La recherche étant triée par ordre chronologique, on utilise celle-ci
         # pour trouver les jobs les plus récents
         pageNumber = 1
-        result = []
-        tmpJob:EJob
-        tmpJobID:str = ''
+        highWaterDate = EHelper.parseDate(highWater)
+        if seenIDs is None:
+            seenIDs = set()
 
         while True:
-            currPage = private.getSearchPage(pageNumber)
+            currPage = private.getSearchPage(pageNumber, searchURL=searchURL)
             if type(currPage) is HTTP_CODES:
-                EHelper.printError("Erreur lors du scraping de la page " + str(pageNumber), currPage.name)
-                return result
-            progress = 0
-            total = len(currPage['documents'])
-            for job in currPage['documents']:
-                tmpJobID = job['job_id']
-                if tmpJobID == lastJobID:
-                    print('')
-                    return result
-                
-                tmpJob = private.getJob(tmpJobID)
-                #@TODO Error checking network requests
-                if type(tmpJob) is HTTP_CODES:
-                    continue
-                result.append(tmpJob)
-
-                EHelper.printInfo("Job récupéré, pause de 0.5s", f"{progress}/{total}")
-                sleep(0.5)
-
+                ELogger.error("Erreur lors du scraping de la page " + str(pageNumber), currPage.name)
+                return False
+            if len(currPage['documents']) == 0:
+                return True
+
+            newDocuments, pageIsOld = private.filterNewDocuments(currPage['documents'], highWaterDate, seenIDs)
+            if len(newDocuments) > 0:
+                yield newDocuments
+            if pageIsOld:
+                return True
             pageNumber += 1
 
+    @staticmethod
+    def iterNewDocuments(highWater:str, seenIDs:set = None, searchURL:str = API.SEARCH_IT.value) -> Iterator[dict]:
+        """Parcourt la recherche, et retourne (yield) tous les postes publiés depuis le high-water mark
 
+        Args:
+            highWater (str): La date de publication la plus récente en DB (voir EDatabase.getSyncState)
+            seenIDs (set, optional): Les IDs des postes les plus récents déjà en DB. Defaults to None.
+            searchURL (str, optional): L'URL de la recherche, filtres compris. Defaults to API.SEARCH_IT.
 
+        Yields:
+            dict: Les nouveaux postes, tels que retournés dans documents par la recherche, du plus récent au plus ancien
+        """
+        for page in EScraper.iterNewPages(highWater, seenIDs, searchURL):
+            yield from page
 
+    @staticmethod
+    def getAllNewJobs(highWater:str, seenIDs:set = None, fetchDetails:bool = True)-> list:
+        """Retourne tous les jobs postés depuis le high-water mark (la date de publication la plus récente en DB)
 
+        Args:
+            highWater (str): La date de publication la plus récente en DB (voir EDatabase.getSyncState)
+            seenIDs (set, optional): Les IDs des postes les plus récents déjà en DB. Defaults to None.
+            fetchDetails (bool, optional): Si False, les postes sont mappés directement depuis la recherche,
+                sans requête par poste (voir mapSearchDocument). Defaults to True.
 
+        Returns:
+            list: Retourne une liste d'EJob
+        """
+        result = []
+        tmpJob:EJob
 
+        for job in EScraper.iterNewDocuments(highWater, seenIDs):
+            if not fetchDetails:
+                result.append(EScraper.mapSearchDocument(job))
+                continue
 
+            tmpJob = private.getJob(job['job_id'])
+            #@TODO Error checking network requests
+            if type(tmpJob) is HTTP_CODES:
+                continue
+            result.append(EHelper.MapObjectToNewType(tmpJob, EJob))
+            ELogger.progress("Job récupéré", str(len(result)))
 
-            
-
+        ELogger.endProgress()
+        return result
@@ -0,0 +1,169 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet ESession,
+#   qui gère les connexions HTTP (pool, keep-alive, compression) vers jobup
+#   Utilisation: from ESession import ESession
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+#Nombre de connexions gardées ouvertes par hôte, par défaut
+DEFAULT_POOL_SIZE = 10
+#En-têtes envoyés avec chaque requête
+DEFAULT_HEADERS:dict = {
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+class private:
+    """Contient les variables et méthodes privées
+    """
+    session:requests.Session = None
+    sessionLock = threading.Lock()
+    #Tailles de pool spécifiques, au format {préfixe d'URL -> nb connexions}
+    #Ex. {'https://www.jobup.ch': 16}
+    poolSizes:dict = {}
+    defaultPoolSize:int = DEFAULT_POOL_SIZE
+
+    statsLock = threading.Lock()
+    nbRequests:int = 0
+    nbConnectionsOpened:int = 0
+
+    @staticmethod
+    def countRequest():
+        with private.statsLock:
+            private.nbRequests += 1
+
+    @staticmethod
+    def countNewConnection():
+        with private.statsLock:
+            private.nbConnectionsOpened += 1
+
+    @staticmethod
+    def createSession() -> requests.Session:
+        """Crée une session, avec un adapter par préfixe configuré dans poolSizes
+
+        Returns:
+            requests.Session: La nouvelle session
+        """
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        defaultAdapter = CountingAdapter(pool_connections=private.defaultPoolSize, pool_maxsize=private.defaultPoolSize)
+        session.mount('https://', defaultAdapter)
+        session.mount('http://', defaultAdapter)
+        #requests choisit l'adapter avec le préfixe le plus long,
+        #les préfixes spécifiques ont donc la priorité sur https://
+        for prefix, size in private.poolSizes.items():
+            session.mount(prefix, CountingAdapter(pool_connections=1, pool_maxsize=size))
+        return session
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    """Pool HTTP qui compte les nouvelles connexions
+    """
+    def _new_conn(self):
+        private.countNewConnection()
+        return super()._new_conn()
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    """Pool HTTPS qui compte les nouvelles connexions (et donc les handshakes TLS)
+    """
+    def _new_conn(self):
+        private.countNewConnection()
+        return super()._new_conn()
+
+class CountingAdapter(HTTPAdapter):
+    """Adapter qui utilise les pools ci-dessus, et compte les requêtes envoyées
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, **kwargs):
+        private.countRequest()
+        return super().send(request, **kwargs)
+
+
+class ESession:
+    """Session HTTP partagée par toutes les requêtes du scraper.
+        Les connexions sont gardées ouvertes (keep-alive) et réutilisées entre les requêtes,
+        ce qui évite un handshake TCP + TLS par requête
+    """
+
+    @staticmethod
+    def configure(defaultPoolSize:int = DEFAULT_POOL_SIZE, poolSizes:dict = None):
+        """Configure la taille des pools. La session existante est fermée,
+            la prochaine requête en créera une nouvelle
+
+        Args:
+            defaultPoolSize (int, optional): Le nombre de connexions par hôte. Defaults to DEFAULT_POOL_SIZE.
+            poolSizes (dict, optional): Les tailles spécifiques, au format {préfixe d'URL -> nb connexions}. Defaults to None.
+        """
+        with private.sessionLock:
+            private.defaultPoolSize = defaultPoolSize
+            private.poolSizes = dict(poolSizes or {})
+            if private.session is not None:
+                private.session.close()
+                private.session = None
+
+    @staticmethod
+    def getSession() -> requests.Session:
+        """Crée la session si aucune n'existe, ou retourne la session existante
+
+        Returns:
+            requests.Session: La session
+        """
+        if private.session is None:
+            with private.sessionLock:
+                if private.session is None:
+                    private.session = private.createSession()
+        return private.session
+
+    @staticmethod
+    def get(url:str, **kwargs) -> requests.Response:
+        """Exécute un GET via la session partagée
+
+        Args:
+            url (str): L'URL à query
+
+        Returns:
+            requests.Response: La réponse
+        """
+        return ESession.getSession().get(url, **kwargs)
+
+    @staticmethod
+    def getStats() -> dict:
+        """Retourne les compteurs de connexions
+
+        Returns:
+            dict: Le nombre de requêtes, de connexions ouvertes et de connexions réutilisées
+        """
+        with private.statsLock:
+            return {
+                'requests': private.nbRequests,
+                'connectionsOpened': private.nbConnectionsOpened,
+                'connectionsReused': max(private.nbRequests - private.nbConnectionsOpened, 0)
+            }
+
+    @staticmethod
+    def resetStats():
+        """Remet les compteurs de connexions à 0
+        """
+        with private.statsLock:
+            private.nbRequests = 0
+            private.nbConnectionsOpened = 0
+
+    @staticmethod
+    def close():
+        """Ferme toutes les connexions de la session
+        """
+        with private.sessionLock:
+            if private.session is not None:
+                private.session.close()
+                private.session = None
@@ -0,0 +1,258 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet EWorkQueue,
+#   une queue de travail durable (SQLite), partagée entre le coordinateur et les processus workers (voir EWorker)
+#   Utilisation: from EWorkQueue import EWorkQueue
+
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from time import time
+from typing import Iterable
+
+#Fichier de la queue, séparé de la DB principale : seul le coordinateur écrit dans jobup.db
+DEFAULT_QUEUE_FILE = 'jobup_queue.db'
+#Les types d'éléments de la queue
+KIND_JOB = 'job'
+KIND_COMPANY = 'company'
+#Le statut des éléments
+QUEUE_PENDING = 0
+QUEUE_LEASED = 1
+#Résultat disponible, en attente d'écriture par le coordinateur
+QUEUE_DONE = 2
+#Abandonné après MAX_ATTEMPTS tentatives (Ex. un élément qui fait planter les workers)
+QUEUE_FAILED = 3
+#Durée d'un bail, en secondes. Un élément dont le bail a expiré (Ex. worker planté) est redonné à un autre worker
+DEFAULT_LEASE_SECONDS = 60
+#Nombre maximum de baux par élément
+MAX_ATTEMPTS = 3
+#Temps d'attente maximum lorsque la queue est verrouillée par un autre processus, en secondes
+BUSY_TIMEOUT_SECONDS = 30
+#Les processus peuvent planter à tout moment : WAL + synchronous=NORMAL garde les écritures validées
+QUEUE_PROFILE:dict = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL'
+}
+WORK_ITEMS = 'work_items'
+#Les dernières métriques de chaque worker (voir EMetrics.snapshot)
+WORKER_METRICS = 'worker_metrics'
+
+class private:
+    """Contient les variables et méthodes privées
+    """
+    #Les résultats sont envoyés depuis plusieurs threads d'un même worker, la connexion est donc protégée par un lock
+    lock = threading.Lock()
+    conn:sqlite3.Connection = None
+
+    @staticmethod
+    def open(path:str) -> sqlite3.Connection:
+        """Ouvre la queue, et crée la table des éléments si celle-ci n'existe pas
+        """
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False, isolation_level=None)
+        for pragma, val in QUEUE_PROFILE.items():
+            conn.execute(f'PRAGMA {pragma} = {val}')
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS "{WORK_ITEMS}" (
+                        kind TEXT NOT NULL,
+                        item_id TEXT NOT NULL,
+                        status INTEGER NOT NULL DEFAULT {QUEUE_PENDING},
+                        lease_owner TEXT,
+                        lease_expires REAL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        result BLOB,
+                        PRIMARY KEY (kind, item_id))''')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_work_items_status ON "{WORK_ITEMS}"(status, lease_expires)')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{WORKER_METRICS}" (owner TEXT PRIMARY KEY, snapshot BLOB NOT NULL)')
+        return conn
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """Exécute le bloc dans une transaction BEGIN IMMEDIATE, qui verrouille la queue en écriture pour tous les processus
+            Doit être appelée avec private.lock
+        """
+        if private.conn is None:
+            raise RuntimeError("La queue n'est pas ouverte, voir EWorkQueue.configure")
+        private.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield private.conn
+        except BaseException:
+            private.conn.execute('ROLLBACK')
+            raise
+        private.conn.execute('COMMIT')
+
+    @staticmethod
+    def getConn() -> sqlite3.Connection:
+        if private.conn is None:
+            raise RuntimeError("La queue n'est pas ouverte, voir EWorkQueue.configure")
+        return private.conn
+
+class EWorkQueue:
+    """Queue durable d'éléments (type, ID) à récupérer :
+        le coordinateur ajoute les éléments (enqueue), les workers les prennent à bail (claim) et envoient leur résultat (complete),
+        puis le coordinateur écrit les résultats en DB et les supprime de la queue (takeResults, remove)
+        Un élément dont le bail expire sans résultat est redonné à un autre worker : un worker planté ne perd pas ses éléments
+    """
+
+    @staticmethod
+    def configure(path:str = DEFAULT_QUEUE_FILE):
+        """Ouvre la queue (ou la ferme si path est None). À appeler dans chaque processus
+
+        Args:
+            path (str, optional): Le fichier de la queue. Defaults to DEFAULT_QUEUE_FILE.
+        """
+        with private.lock:
+            if private.conn is not None:
+                private.conn.close()
+                private.conn = None
+            if path is not None:
+                private.conn = private.open(path)
+
+    @staticmethod
+    def enqueue(kind:str, ids:Iterable) -> int:
+        """Ajoute des éléments à la queue. Un élément déjà présent n'est pas ajouté une seconde fois
+
+        Args:
+            kind (str): Le type des éléments (KIND_*)
+            ids (Iterable): Les IDs des éléments
+
+        Returns:
+            int: Le nombre d'éléments ajoutés
+        """
+        with private.lock, private.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(f'INSERT OR IGNORE INTO "{WORK_ITEMS}" (kind, item_id) VALUES (?, ?)',
+                             map(lambda id: (kind, str(id)), ids))
+            return conn.total_changes - before
+
+    @staticmethod
+    def claim(owner:str, limit:int, leaseSeconds:float = DEFAULT_LEASE_SECONDS) -> list:
+        """Prend à bail jusqu'à limit éléments : les éléments en attente, puis ceux dont le bail a expiré
+            Les éléments ayant déjà eu MAX_ATTEMPTS baux sont abandonnés (QUEUE_FAILED)
+
+        Args:
+            owner (str): L'identifiant du worker
+            limit (int): Le nombre maximum d'éléments
+            leaseSeconds (float, optional): La durée du bail. Defaults to DEFAULT_LEASE_SECONDS.
+
+        Returns:
+            list: Les éléments, au format (type, ID), dans l'ordre d'ajout
+        """
+        now = time()
+        #La transaction verrouille la queue en écriture : deux workers ne peuvent pas prendre le même élément
+        with private.lock, private.transaction() as conn:
+            conn.execute(f'''UPDATE "{WORK_ITEMS}" SET status = {QUEUE_FAILED}, lease_owner = NULL
+                            WHERE status = {QUEUE_LEASED} AND lease_expires < ? AND attempts >= ?''', (now, MAX_ATTEMPTS))
+            rows = conn.execute(f'''SELECT rowid, kind, item_id FROM "{WORK_ITEMS}"
+                                    WHERE status = {QUEUE_PENDING} OR (status = {QUEUE_LEASED} AND lease_expires < ?)
+                                    ORDER BY rowid LIMIT ?''', (now, limit)).fetchall()
+            conn.executemany(f'''UPDATE "{WORK_ITEMS}" SET status = {QUEUE_LEASED}, lease_owner = ?, lease_expires = ?,
+                                attempts = attempts + 1 WHERE rowid = ?''',
+                             map(lambda row: (owner, now + leaseSeconds, row[0]), rows))
+        return list(map(lambda row: (row[1], row[2]), rows))
+
+    @staticmethod
+    def renew(owner:str, leaseSeconds:float = DEFAULT_LEASE_SECONDS) -> int:
+        """Prolonge les baux en cours d'un worker (Ex. débit réduit par le limiter)
+
+        Args:
+            owner (str): L'identifiant du worker
+            leaseSeconds (float, optional): La nouvelle durée des baux, à partir de maintenant. Defaults to DEFAULT_LEASE_SECONDS.
+
+        Returns:
+            int: Le nombre de baux prolongés
+        """
+        with private.lock:
+            c = private.getConn().execute(f'UPDATE "{WORK_ITEMS}" SET lease_expires = ? WHERE status = {QUEUE_LEASED} AND lease_owner = ?',
+                                          (time() + leaseSeconds, owner))
+            return max(c.rowcount, 0)
+
+    @staticmethod
+    def complete(results:Iterable) -> int:
+        """Enregistre le résultat d'éléments pris à bail
+            Un élément dont le bail a expiré peut avoir été redonné à un autre worker : le premier résultat est gardé
+
+        Args:
+            results (Iterable): Les résultats, au format (type, ID, résultat). Le résultat doit pouvoir être sérialisé (pickle)
+
+        Returns:
+            int: Le nombre de résultats enregistrés
+        """
+        rows = list(map(lambda item: (pickle.dumps(item[2], pickle.HIGHEST_PROTOCOL), item[0], str(item[1])), results))
+        with private.lock, private.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(f'''UPDATE "{WORK_ITEMS}" SET status = {QUEUE_DONE}, result = ?, lease_owner = NULL
+                                WHERE kind = ? AND item_id = ? AND status = {QUEUE_LEASED}''', rows)
+            return conn.total_changes - before
+
+    @staticmethod
+    def takeResults(limit:int) -> list:
+        """Retourne les éléments terminés (QUEUE_DONE ou QUEUE_FAILED), sans les supprimer
+            Ceux-ci doivent être supprimés via remove une fois écrits en DB : en cas de crash du coordinateur,
+            ils sont retournés à nouveau au prochain lancement (l'écriture en DB doit donc être idempotente)
+
+        Args:
+            limit (int): Le nombre maximum d'éléments
+
+        Returns:
+            list: Les éléments, au format (type, ID, résultat). Le résultat vaut None pour un élément abandonné
+        """
+        with private.lock:
+            rows = private.getConn().execute(f'''SELECT kind, item_id, status, result FROM "{WORK_ITEMS}"
+                                                WHERE status IN ({QUEUE_DONE}, {QUEUE_FAILED}) ORDER BY rowid LIMIT ?''',
+                                             (limit,)).fetchall()
+        return list(map(lambda row: (row[0], row[1], pickle.loads(row[3]) if row[2] == QUEUE_DONE else None), rows))
+
+    @staticmethod
+    def remove(items:Iterable):
+        """Supprime des éléments de la queue
+
+        Args:
+            items (Iterable): Les éléments, au format (type, ID, ...)
+        """
+        with private.lock, private.transaction() as conn:
+            conn.executemany(f'DELETE FROM "{WORK_ITEMS}" WHERE kind = ? AND item_id = ?',
+                             map(lambda item: (item[0], str(item[1])), items))
+
+    @staticmethod
+    def putMetrics(owner:str, snapshot:dict):
+        """Enregistre les métriques d'un worker, en remplaçant les précédentes
+            Les métriques étant cumulées, seules les dernières sont utiles : celles d'un worker planté sont gardées jusqu'à son dernier envoi
+
+        Args:
+            owner (str): L'identifiant du worker
+            snapshot (dict): Les métriques du worker (voir EMetrics.snapshot)
+        """
+        with private.lock:
+            private.getConn().execute(f'INSERT OR REPLACE INTO "{WORKER_METRICS}" (owner, snapshot) VALUES (?, ?)',
+                                      (owner, pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)))
+
+    @staticmethod
+    def takeMetrics() -> list:
+        """Retourne et supprime les métriques de tous les workers
+
+        Returns:
+            list: Les métriques de chaque worker (voir EMetrics.merge)
+        """
+        with private.lock, private.transaction() as conn:
+            rows = conn.execute(f'SELECT snapshot FROM "{WORKER_METRICS}"').fetchall()
+            conn.execute(f'DELETE FROM "{WORKER_METRICS}"')
+        return list(map(lambda row: pickle.loads(row[0]), rows))
+
+    @staticmethod
+    def getStats() -> dict:
+        """Retourne le nombre d'éléments par statut (QUEUE_*)
+        """
+        stats = {QUEUE_PENDING: 0, QUEUE_LEASED: 0, QUEUE_DONE: 0, QUEUE_FAILED: 0}
+        with private.lock:
+            for status, count in private.getConn().execute(f'SELECT status, COUNT(*) FROM "{WORK_ITEMS}" GROUP BY status'):
+                stats[status] = count
+        return stats
+
+    @staticmethod
+    def isDrained() -> bool:
+        """Retourne True si plus aucun élément n'est en attente ou à bail : les workers peuvent s'arrêter
+        """
+        with private.lock:
+            row = private.getConn().execute(f'SELECT 1 FROM "{WORK_ITEMS}" WHERE status IN ({QUEUE_PENDING}, {QUEUE_LEASED}) LIMIT 1').fetchone()
+        return row is None
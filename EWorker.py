@@ -0,0 +1,187 @@
+#   SCRAPING JOBUP
+#
+#   Ce fichier contient l'objet EWorker,
+#   un processus qui récupère et mappe les éléments de la queue de travail (voir EWorkQueue), sans accès à la DB
+#   Utilisation: from EWorker import EWorker
+
+import os
+import socket
+import threading
+from multiprocessing import get_context
+from time import sleep
+from EAddress import EAddress
+from EFetcher import EFetcher, DEFAULT_NB_WORKERS
+from ELogger import ELogger
+from EMetrics import EMetrics
+from ERateLimiter import ERateLimiter
+from EResponseCache import EResponseCache, DEFAULT_MAX_BYTES as CACHE_MAX_BYTES
+from EScraper import EScraper, HTTP_CODES, private as scraper
+from EWorkQueue import EWorkQueue, KIND_JOB, KIND_COMPANY, DEFAULT_LEASE_SECONDS
+
+#Nombre maximum d'éléments pris à bail à la fois, par thread du worker
+CLAIM_SIZE_PER_THREAD = 4
+#Nombre de résultats envoyés à la queue par transaction
+RESULTS_PER_COMMIT = 10
+#Nombre de prolongations des baux par durée de bail : un bail est prolongé bien avant son expiration
+RENEWALS_PER_LEASE = 3
+#Temps d'attente lorsqu'aucun élément n'est disponible, mais que d'autres workers ont des baux en cours
+#(si l'un d'eux plante, ses éléments seront disponibles à l'expiration de ses baux)
+POLL_SECONDS = 0.5
+
+class private:
+    """Contient les méthodes privées
+    """
+
+    @staticmethod
+    def fetchItem(item:tuple) -> object:
+        """Récupère un élément de la queue. Exécutée dans les threads du worker (voir EFetcher.fetchAll)
+
+        Args:
+            item (tuple): L'élément, au format (type, ID)
+
+        Returns:
+            object: Le poste (EJob), l'entreprise telle que retournée par l'API, ou le code d'erreur
+        """
+        kind, id = item
+        if kind == KIND_JOB:
+            return EScraper.getJobFromID(id)
+        if kind == KIND_COMPANY:
+            #Le mapping d'une entreprise enregistre ses adresses (voir EAddress.register), il est donc fait dans le thread principal
+            return scraper.getCompany(id)
+        raise ValueError(f"Type d'élément inconnu : {kind}")
+
+    @staticmethod
+    def toResult(kind:str, result:object) -> object:
+        """Retourne le résultat à envoyer au coordinateur
+
+        Args:
+            kind (str): Le type de l'élément
+            result (object): Le résultat de fetchItem
+
+        Returns:
+            object: Le poste, l'entreprise et ses adresses au format (ECompany, [EAddress]), ou le code d'erreur
+        """
+        if kind == KIND_COMPANY and type(result) is not HTTP_CODES:
+            company = EScraper.mapCompany(result)
+            #Les entreprises étant mappées une par une, les adresses en attente sont celles de cette entreprise
+            return (company, EAddress.popPending())
+        return result
+
+    @staticmethod
+    def renewLeases(owner:str, leaseSeconds:float, stop:threading.Event):
+        """Prolonge les baux du worker toutes les leaseSeconds / RENEWALS_PER_LEASE secondes, jusqu'à ce que stop soit levé
+            Exécutée dans un thread : les baux d'un worker sain n'expirent pas, même si une requête est très lente
+            (Ex. débit réduit par le limiter, pauses entre les tentatives)
+        """
+        while not stop.wait(leaseSeconds / RENEWALS_PER_LEASE):
+            EWorkQueue.renew(owner, leaseSeconds)
+
+    @staticmethod
+    def getClaimSize(limiter:ERateLimiter, nbThreads:int, leaseSeconds:float) -> int:
+        """Retourne le nombre d'éléments à prendre à bail, selon le débit actuel du worker
+            Lorsque le limiter réduit le débit, le worker prend moins d'éléments : les autres workers peuvent traiter le reste
+
+        Args:
+            limiter (ERateLimiter): Le limiter du worker
+            nbThreads (int): Le nombre de requêtes simultanées
+            leaseSeconds (float): La durée des baux
+
+        Returns:
+            int: Le nombre d'éléments, qui peuvent être récupérés en moins d'un demi-bail au débit actuel
+        """
+        return max(1, min(nbThreads * CLAIM_SIZE_PER_THREAD, int(limiter.rate * leaseSeconds / 2)))
+
+class EWorker:
+    """Processus worker : prend des éléments de la queue à bail, les récupère et les mappe, puis envoie les résultats à la queue
+        Seul le coordinateur (voir main.runWorkers) écrit les résultats en DB
+    """
+
+    @staticmethod
+    def run(queuePath:str, requestsPerSecond:float, minRate:float, maxRate:float,
+            nbThreads:int = DEFAULT_NB_WORKERS, leaseSeconds:float = DEFAULT_LEASE_SECONDS,
+            cachePath:str = None, cacheMaxBytes:int = CACHE_MAX_BYTES) -> int:
+        """Point d'entrée d'un processus worker : traite les éléments de la queue jusqu'à ce que celle-ci soit vide
+
+        Args:
+            queuePath (str): Le fichier de la queue (voir EWorkQueue.configure)
+            requestsPerSecond (float): Le débit initial du worker
+            minRate (float): Le débit minimum du worker
+            maxRate (float): Le débit maximum du worker
+            nbThreads (int, optional): Le nombre de requêtes simultanées. Defaults to DEFAULT_NB_WORKERS.
+            leaseSeconds (float, optional): La durée des baux. Defaults to DEFAULT_LEASE_SECONDS.
+            cachePath (str, optional): Le fichier du cache des réponses (voir EResponseCache), partagé avec le coordinateur.
+                Defaults to None (requêtes non conditionnelles).
+            cacheMaxBytes (int, optional): La taille maximum du cache. Defaults to EResponseCache.DEFAULT_MAX_BYTES.
+
+        Returns:
+            int: Le nombre d'éléments traités
+        """
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        limiter = ERateLimiter.configureShared(requestsPerSecond, minRate=minRate, maxRate=maxRate)
+        EWorkQueue.configure(queuePath)
+        if cachePath is not None:
+            EResponseCache.configure(cachePath, cacheMaxBytes)
+        nbDone = 0
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=private.renewLeases, args=(owner, leaseSeconds, stop), daemon=True)
+        heartbeat.start()
+
+        try:
+            while True:
+                items = EWorkQueue.claim(owner, private.getClaimSize(limiter, nbThreads, leaseSeconds), leaseSeconds)
+                if len(items) == 0:
+                    if EWorkQueue.isDrained():
+                        break
+                    sleep(POLL_SECONDS)
+                    continue
+
+                results:list = []
+                for item, result in EFetcher.fetchAll(items, private.fetchItem, nbThreads):
+                    results.append((item[0], item[1], private.toResult(item[0], result)))
+                    if len(results) >= RESULTS_PER_COMMIT:
+                        nbDone += EWorkQueue.complete(results)
+                        results = []
+                nbDone += EWorkQueue.complete(results)
+                #Les métriques sont envoyées au coordinateur après chaque lot (voir main.runWorkers)
+                EWorkQueue.putMetrics(owner, EMetrics.snapshot())
+        finally:
+            #La queue est fermée ensuite : le thread ne doit plus prolonger de baux
+            stop.set()
+            heartbeat.join()
+
+        ELogger.debug(f"Worker {owner} : {nbDone} éléments traités")
+        EWorkQueue.configure(None)
+        EResponseCache.configure(None)
+        return nbDone
+
+    @staticmethod
+    def start(queuePath:str, nbProcesses:int, requestsPerSecond:float, minRate:float, maxRate:float,
+              nbThreads:int = DEFAULT_NB_WORKERS, cachePath:str = None, cacheMaxBytes:int = CACHE_MAX_BYTES) -> list:
+        """Démarre nbProcesses workers
+            Le budget de débit est partagé : chaque worker a requestsPerSecond / nbProcesses (idem pour minRate et maxRate),
+            le débit total reste donc celui d'un lancement en un seul processus
+
+        Args:
+            queuePath (str): Le fichier de la queue
+            nbProcesses (int): Le nombre de workers
+            requestsPerSecond (float): Le débit initial total
+            minRate (float): Le débit minimum total
+            maxRate (float): Le débit maximum total
+            nbThreads (int, optional): Le nombre de requêtes simultanées par worker. Defaults to DEFAULT_NB_WORKERS.
+            cachePath (str, optional): Le fichier du cache des réponses. Defaults to None (requêtes non conditionnelles).
+            cacheMaxBytes (int, optional): La taille maximum du cache. Defaults to EResponseCache.DEFAULT_MAX_BYTES.
+
+        Returns:
+            list: Les processus (multiprocessing.Process)
+        """
+        #spawn plutôt que fork : le processus fils ne doit hériter ni de la connexion à la DB, ni des threads du coordinateur
+        context = get_context('spawn')
+        processes:list = []
+        for _ in range(nbProcesses):
+            process = context.Process(target=EWorker.run, daemon=True,
+                                      args=(queuePath, requestsPerSecond / nbProcesses, minRate / nbProcesses,
+                                            maxRate / nbProcesses, nbThreads, DEFAULT_LEASE_SECONDS,
+                                            cachePath, cacheMaxBytes))
+            process.start()
+            processes.append(process)
+        return processes
@@ -0,0 +1,80 @@
+#   SCRAPING JOBUP
+#
+#   Benchmark d'insertion en base de données
+#   Compare le débit d'insertion avec et sans le profil SQLite (WAL, synchronous=NORMAL, etc...)
+#   Utilisation: python benchmarks/bench_database.py [nbJobs] [batchSize]
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+#Les benchmarks sont lancés depuis le dossier benchmarks, les modules sont dans le dossier parent
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from EDatabase import EDatabase, DEFAULT_PROFILE
+from EJob import EJob
+
+DEFAULT_NB_JOBS = 20000
+DEFAULT_BATCH_SIZE = 20
+
+def makeJobs(nbJobs:int) -> list:
+    """Crée nbJobs postes factices, avec des champs texte de taille réaliste
+
+    Args:
+        nbJobs (int): Le nombre de postes
+
+    Returns:
+        list: Les postes (EJob)
+    """
+    jobs = []
+    for i in range(nbJobs):
+        job = EJob()
+        job.job_id = f"{i:08x}-bench"
+        job.title = f"Développeur Python N°{i}"
+        job.company_id = i % 500
+        job.company_name = f"Entreprise {i % 500}"
+        job.publication_date = "2020-05-01T08:00:00+02:00"
+        job.template_text = "Lorem ipsum dolor sit amet. " * 80
+        job.place = "Lausanne"
+        jobs.append(job)
+    return jobs
+
+def bench(name:str, profile:dict, jobs:list, batchSize:int) -> float:
+    """Insère les postes par batch, une transaction par batch, et retourne le débit
+
+    Args:
+        name (str): Le nom du profil, pour l'affichage
+        profile (dict): Le profil SQLite ({} pour les valeurs par défaut de SQLite)
+        jobs (list): Les postes à insérer
+        batchSize (int): Le nombre de postes par transaction
+
+    Returns:
+        float: Le nombre de postes insérés par seconde
+    """
+    with tempfile.TemporaryDirectory() as tmpDir:
+        EDatabase.configure(os.path.join(tmpDir, 'bench.db'), profile)
+        #On crée la DB avant de lancer le chrono
+        EDatabase.countJobs()
+
+        start = perf_counter()
+        for i in range(0, len(jobs), batchSize):
+            with EDatabase.batch():
+                EDatabase.insertJobs(jobs[i:i + batchSize])
+        elapsed = perf_counter() - start
+
+        EDatabase.close()
+
+    rate = len(jobs) / elapsed
+    print(f"{name:<20}{elapsed:>10.2f}s{rate:>14.0f} postes/s")
+    return rate
+
+if __name__ == '__main__':
+    nbJobs = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NB_JOBS
+    batchSize = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BATCH_SIZE
+    jobs = makeJobs(nbJobs)
+
+    print(f"Insertion de {nbJobs} postes, {batchSize} postes par transaction")
+    withoutProfile = bench("Sans profil", {}, jobs, batchSize)
+    withProfile = bench("Avec profil", DEFAULT_PROFILE, jobs, batchSize)
+    print(f"Gain : x{withProfile / withoutProfile:.2f}")
@@ -0,0 +1,65 @@
+#   SCRAPING JOBUP
+#
+#   Micro-benchmark du mapping JSON -> objet
+#   Compare le mapping récursif (EHelper.MapKeyValueToObject) aux fonctions de mapping compilées (EHelper.getMapper)
+#   Utilisation: python benchmarks/bench_mapping.py [nbIterations]
+
+import os
+import sys
+import json
+from time import perf_counter
+
+#Les benchmarks sont lancés depuis le dossier benchmarks, les modules sont dans le dossier parent
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from EHelper import EHelper
+from EJob import EJob
+from EAddress import EAddress
+from ECompany import ECompany
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DEFAULT_NB_ITERATIONS = 20000
+#Les réponses enregistrées, et le type vers lequel les mapper
+PAYLOADS:list = [
+    ('job.json', EJob),
+    ('address.json', EAddress),
+    ('company.json', ECompany)
+]
+
+def mapRecursive(JSONObj:dict, objectType:type) -> object:
+    """Mappe l'objet via MapKeyValueToObject, comme le faisait MapObjectToNewType avant les fonctions compilées
+    """
+    result = objectType()
+    for key, val in JSONObj.items():
+        EHelper.MapKeyValueToObject(key, val, result)
+    return result
+
+def mapCompiled(JSONObj:dict, objectType:type) -> object:
+    """Mappe l'objet via la fonction de mapping compilée
+    """
+    return EHelper.MapObjectToNewType(JSONObj, objectType)
+
+def bench(mapFunc, JSONObj:dict, objectType:type, nbIterations:int) -> float:
+    """Retourne le temps moyen de mapping d'un objet, en microsecondes
+    """
+    start = perf_counter()
+    for _ in range(nbIterations):
+        mapFunc(JSONObj, objectType)
+    return (perf_counter() - start) / nbIterations * 1000000
+
+if __name__ == '__main__':
+    nbIterations = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NB_ITERATIONS
+
+    print(f"{'Payload':<16}{'Récursif':>14}{'Compilé':>14}{'Gain':>8}")
+    for fileName, objectType in PAYLOADS:
+        with open(os.path.join(FIXTURES_DIR, fileName), encoding='utf-8') as f:
+            payload = json.load(f)
+
+        #Les deux chemins doivent produire le même objet
+        if mapRecursive(payload, objectType).toTuple() != mapCompiled(payload, objectType).toTuple():
+            print(f"{fileName} : les deux mappings ne produisent pas le même objet")
+            sys.exit(1)
+
+        recursive = bench(mapRecursive, payload, objectType, nbIterations)
+        compiled = bench(mapCompiled, payload, objectType, nbIterations)
+        print(f"{fileName:<16}{recursive:>11.2f} µs{compiled:>11.2f} µs{recursive / compiled:>7.2f}x")
@@ -0,0 +1,149 @@
+#   SCRAPING JOBUP
+#
+#   Benchmark de bout en bout du scraper, contre le serveur de rejeu (voir replay.py)
+#   Mesure le premier lancement, la synchronisation incrémentale et la récupération des entreprises,
+#   chacun dans un processus séparé (main.py), sur une DB temporaire
+#   Utilisation: python benchmarks/bench_scrape.py [store.json|nbJobs] [latency] [rate502] [requestsPerSecond]
+
+import os
+import sys
+import json
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, '..')
+#Les benchmarks sont lancés depuis le dossier benchmarks, les modules sont dans le dossier parent
+sys.path.insert(0, REPO_DIR)
+
+from replay import ReplayStore, StubServer
+from EScraper import API_URL_ENV
+
+#Les scénarios, au format (nom, fonctions de main.py appelées dans l'ordre)
+SCENARIOS:list = [
+    ('bootstrap', ['syncJobs', 'fetchPendingDetails']),
+    ('incremental', ['syncJobs']),
+    ('companies', ['enrichCompanies'])
+]
+#Nombre de postes publiés sur le serveur de rejeu avant la synchronisation incrémentale
+NB_NEW_JOBS = 200
+#Débit du limiter partagé pendant le benchmark : on mesure le scraper, pas le limiter
+DEFAULT_REQUESTS_PER_SECOND = 1000
+DEFAULT_NB_JOBS = 2000
+#Les tables dont on compte les lignes insérées
+TABLES:tuple = ('jobs', 'company', 'address')
+CHILD_FLAG = '--child'
+
+def runChild(resultPath:str, requestsPerSecond:float, steps:list):
+    """Exécuté dans le processus du scénario : lance les étapes de main.py,
+        et écrit le temps passé dans les transactions et le nombre de lignes insérées dans resultPath
+    """
+    import main
+    from EDatabase import EDatabase
+
+    main.configure(requestsPerSecond, maxRate=requestsPerSecond)
+
+    #Temps passé dans les transactions (voir EDatabase.batch)
+    batchTime = [0.0]
+    originalBatch = EDatabase.batch
+
+    @contextmanager
+    def timedBatch():
+        start = perf_counter()
+        with originalBatch() as conn:
+            yield conn
+        batchTime[0] += perf_counter() - start
+
+    EDatabase.batch = timedBatch
+
+    def countRows() -> dict:
+        conn = EDatabase.getConn()
+        return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in TABLES}
+
+    before = countRows()
+    for step in steps:
+        getattr(main, step)()
+    after = countRows()
+
+    with open(resultPath, 'w', encoding='utf-8') as f:
+        json.dump({'batchTime': batchTime[0], 'rows': {table: after[table] - before[table] for table in TABLES}}, f)
+
+def runScenario(name:str, steps:list, workDir:str, server:StubServer, requestsPerSecond:float) -> dict:
+    """Lance un scénario dans un nouveau processus, et retourne ses mesures
+
+    Args:
+        name (str): Le nom du scénario
+        steps (list): Les fonctions de main.py à appeler
+        workDir (str): Le dossier de la DB (partagé entre les scénarios)
+        server (StubServer): Le serveur de rejeu
+        requestsPerSecond (float): Le débit du limiter partagé
+
+    Returns:
+        dict: Les mesures du scénario
+    """
+    resultPath = os.path.join(workDir, f"{name}.json")
+    env = dict(os.environ)
+    env[API_URL_ENV] = server.url
+    env['PYTHONPATH'] = REPO_DIR
+    #Le serveur de rejeu est local, il ne doit pas passer par un éventuel proxy
+    env['NO_PROXY'] = env['no_proxy'] = '127.0.0.1,localhost'
+
+    nbRequests = server.getRequestCount()
+    start = perf_counter()
+    with open(os.path.join(workDir, f"{name}.log"), 'w') as log:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), CHILD_FLAG, resultPath, str(requestsPerSecond)] + steps,
+                                   cwd=workDir, env=env, stdout=subprocess.DEVNULL, stderr=log)
+        #wait4 retourne l'utilisation des ressources de ce processus uniquement (pic de mémoire compris)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+    elapsed = perf_counter() - start
+
+    if process.returncode != 0 or not os.path.isfile(resultPath):
+        print(f"Le scénario {name} a échoué, voir {name}.log")
+        sys.exit(1)
+
+    with open(resultPath, encoding='utf-8') as f:
+        result = json.load(f)
+    nbRequests = server.getRequestCount() - nbRequests
+    nbRows = sum(result['rows'].values())
+    #ru_maxrss est en Ko sous Linux, et en octets sous macOS
+    peakRSS = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return {
+        'name': name,
+        'elapsed': elapsed,
+        'requests': nbRequests,
+        'requestsPerSecond': nbRequests / elapsed,
+        'jobsPerSecond': result['rows']['jobs'] / elapsed,
+        'rows': nbRows,
+        'insertRate': nbRows / result['batchTime'] if result['batchTime'] > 0 else 0,
+        'peakRSS': peakRSS
+    }
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == CHILD_FLAG:
+        runChild(sys.argv[2], float(sys.argv[3]), sys.argv[4:])
+        sys.exit(0)
+
+    source = sys.argv[1] if len(sys.argv) > 1 else str(DEFAULT_NB_JOBS)
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rate502 = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    requestsPerSecond = float(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_REQUESTS_PER_SECOND
+
+    store = ReplayStore.load(source) if os.path.isfile(source) else ReplayStore.synthesize(int(source))
+    server = StubServer(store, latency=latency, rate502=rate502).start()
+    print(f"{len(store.search)} postes, {len(store.companies)} entreprises, latence {latency * 1000:.0f} ms, 502 : {rate502:.0%}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workDir:
+        for name, steps in SCENARIOS:
+            if name == 'incremental':
+                store.publish(NB_NEW_JOBS)
+            results.append(runScenario(name, steps, workDir, server, requestsPerSecond))
+    server.stop()
+
+    print(f"{'Scénario':<14}{'Durée':>9}{'Requêtes':>10}{'Req/s':>9}{'Postes/s':>10}{'Lignes':>8}{'Insert/s':>11}{'RSS max':>11}")
+    for r in results:
+        print(f"{r['name']:<14}{r['elapsed']:>7.2f} s{r['requests']:>10}{r['requestsPerSecond']:>9.1f}{r['jobsPerSecond']:>10.1f}"
+              f"{r['rows']:>8}{r['insertRate']:>11.0f}{r['peakRSS']:>8.1f} Mo")
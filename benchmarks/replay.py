@@ -0,0 +1,353 @@
+#   SCRAPING JOBUP
+#
+#   Harnais de rejeu : enregistre des réponses de jobup dans un fichier (store),
+#   puis les sert via un serveur HTTP local qui imite l'API (latence et erreurs configurables)
+#   Le scraper utilise ce serveur via la variable d'environnement JOBUP_API_URL (voir EScraper.API_URL_ENV)
+#   Utilisation:
+#       python benchmarks/replay.py record <store.json> [nbPages]        Enregistre des réponses de jobup (live)
+#       python benchmarks/replay.py synthesize <store.json> [nbJobs]     Génère un store à partir de benchmarks/fixtures
+#       python benchmarks/replay.py serve <store.json> [port] [latency] [rate502] [rate422]
+
+import os
+import sys
+import json
+import copy
+import hashlib
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from urllib.parse import urlsplit, parse_qs
+
+#Les benchmarks sont lancés depuis le dossier benchmarks, les modules sont dans le dossier parent
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from EHelper import EHelper
+from EScraper import HTTP_CODES, IT_CATEGORY_IDS, SEARCH_LIMIT, private as scraper
+
+USAGE = '''Utilisation:
+    python benchmarks/replay.py record <store.json> [nbPages]
+    python benchmarks/replay.py synthesize <store.json> [nbJobs]
+    python benchmarks/replay.py serve <store.json> [port] [latency] [rate502] [rate422]'''
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+#Le paramètre de recherche utilisé pour filtrer par catégorie
+CATEGORY_PARAM = 'category-ids'
+#Les champs du détail d'un poste absents des résultats de recherche
+DETAIL_ONLY_KEYS:tuple = ('template', 'raw_template', 'contact_person')
+DEFAULT_NB_PAGES = 5
+DEFAULT_NB_JOBS = 2000
+#Nombre de postes par entreprise, et part des entreprises cachées (404), dans un store généré
+JOBS_PER_COMPANY = 5
+HIDDEN_COMPANY_RATIO = 0.1
+
+class ReplayStore:
+    """Réponses enregistrées, au format :
+        search : les postes tels que retournés par la recherche, du plus récent au plus ancien
+        categories : {ID du poste -> IDs des catégories dans lesquelles il a été trouvé}
+        jobs : {ID du poste -> détail du poste}
+        companies : {ID de l'entreprise -> entreprise, ou None si l'entreprise est cachée}
+    """
+
+    def __init__(self, data:dict = None):
+        data = data or {}
+        self.search:list = data.get('search', [])
+        self.categories:dict = data.get('categories', {})
+        self.jobs:dict = data.get('jobs', {})
+        self.companies:dict = data.get('companies', {})
+        self._lock = threading.Lock()
+        #Résultats de recherche filtrés, par ensemble de catégories
+        self._searchCache:dict = {}
+
+    @staticmethod
+    def load(path:str) -> 'ReplayStore':
+        with open(path, encoding='utf-8') as f:
+            return ReplayStore(json.load(f))
+
+    def save(self, path:str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'search': self.search, 'categories': self.categories,
+                       'jobs': self.jobs, 'companies': self.companies}, f)
+
+    @staticmethod
+    def record(nbPages:int = DEFAULT_NB_PAGES) -> 'ReplayStore':
+        """Enregistre les nbPages premières pages de chaque catégorie IT, le détail de leurs postes et leurs entreprises
+            Les requêtes passent par le limiter partagé, comme lors d'un lancement normal
+
+        Args:
+            nbPages (int, optional): Le nombre de pages par catégorie. Defaults to DEFAULT_NB_PAGES.
+
+        Returns:
+            ReplayStore: Les réponses enregistrées
+        """
+        store = ReplayStore()
+        documents:dict = {}
+        for categoryID in IT_CATEGORY_IDS:
+            searchURL = scraper.getSearchURL({CATEGORY_PARAM: [categoryID]})
+            for pageNumber in range(1, nbPages + 1):
+                page = scraper.getSearchPage(pageNumber, searchURL=searchURL)
+                if type(page) is HTTP_CODES or len(page['documents']) == 0:
+                    break
+                for document in page['documents']:
+                    documents.setdefault(document['job_id'], document)
+                    store.categories.setdefault(document['job_id'], []).append(categoryID)
+
+        for jobID, document in documents.items():
+            job = scraper.getJob(jobID)
+            if type(job) is not HTTP_CODES:
+                store.jobs[jobID] = job
+            companyID = str(document.get('company_id') or '')
+            if len(companyID) > 0 and companyID not in store.companies:
+                company = scraper.getCompany(companyID)
+                store.companies[companyID] = None if type(company) is HTTP_CODES else company
+
+        store.search = sorted(documents.values(), key=lambda document: document.get('publication_date') or '', reverse=True)
+        return store
+
+    @staticmethod
+    def synthesize(nbJobs:int = DEFAULT_NB_JOBS, seed:int = 0) -> 'ReplayStore':
+        """Génère un store à partir des réponses de benchmarks/fixtures (job.json et company.json)
+
+        Args:
+            nbJobs (int, optional): Le nombre de postes. Defaults to DEFAULT_NB_JOBS.
+            seed (int, optional): La graine du générateur aléatoire. Defaults to 0.
+
+        Returns:
+            ReplayStore: Le store généré
+        """
+        with open(os.path.join(FIXTURES_DIR, 'job.json'), encoding='utf-8') as f:
+            jobTemplate = json.load(f)
+        with open(os.path.join(FIXTURES_DIR, 'company.json'), encoding='utf-8') as f:
+            companyTemplate = json.load(f)
+
+        rand = random.Random(seed)
+        store = ReplayStore()
+        nbCompanies = max(1, nbJobs // JOBS_PER_COMPANY)
+        for i in range(nbCompanies):
+            companyID = str(100000 + i)
+            if rand.random() < HIDDEN_COMPANY_RATIO:
+                store.companies[companyID] = None
+            else:
+                company = copy.deepcopy(companyTemplate)
+                company['id'] = int(companyID)
+                company['name'] = f"Entreprise {i}"
+                #Les entreprises paires partagent la même adresse (voir EAddress.register), les autres ont chacune la leur
+                if i % 2 == 1:
+                    for address in company.get('addresses') or []:
+                        address['street1'] = f"Rue {i} 1"
+                store.companies[companyID] = company
+
+        store.publish(nbJobs, rand, datetime(2020, 5, 1, tzinfo=timezone.utc), jobTemplate)
+        return store
+
+    def publish(self, nbJobs:int, rand:random.Random = None, startDate:datetime = None, jobTemplate:dict = None) -> list:
+        """Ajoute nbJobs postes, plus récents que tous les postes existants (Ex. pour mesurer une synchronisation incrémentale)
+
+        Args:
+            nbJobs (int): Le nombre de postes
+            rand (random.Random, optional): Le générateur aléatoire. Defaults to None.
+            startDate (datetime, optional): La date de publication du plus ancien nouveau poste. Defaults to 1 minute après le plus récent.
+            jobTemplate (dict, optional): Le détail utilisé comme modèle. Defaults to un poste existant.
+
+        Returns:
+            list: Les IDs des nouveaux postes
+        """
+        rand = rand or random.Random()
+        if startDate is None:
+            latest = self.search[0]['publication_date'] if len(self.search) > 0 else '2020-05-01T00:00:00+00:00'
+            startDate = EHelper.parseDate(latest) + timedelta(minutes=1)
+        if jobTemplate is None:
+            jobTemplate = next(iter(self.jobs.values()))
+        companyIDs = list(self.companies.keys()) or ['']
+
+        newDocuments = []
+        for i in range(nbJobs):
+            job = copy.deepcopy(jobTemplate)
+            job['job_id'] = str(uuid.UUID(int=rand.getrandbits(128)))
+            job['title'] = f"Poste N°{len(self.search) + i}"
+            job['company_id'] = int(rand.choice(companyIDs)) if companyIDs[0] else None
+            job['publication_date'] = (startDate + timedelta(minutes=i)).isoformat()
+            self.jobs[job['job_id']] = job
+            self.categories[job['job_id']] = rand.sample(IT_CATEGORY_IDS, rand.randint(1, 2))
+            newDocuments.append({key: val for key, val in job.items() if key not in DETAIL_ONLY_KEYS})
+
+        newDocuments.reverse()
+        with self._lock:
+            self.search = newDocuments + self.search
+            self._searchCache = {}
+        return [document['job_id'] for document in newDocuments]
+
+    def searchDocuments(self, categoryIDs:frozenset) -> list:
+        """Retourne les postes de la recherche, filtrés par catégorie
+
+        Args:
+            categoryIDs (frozenset): Les catégories (vide pour ne pas filtrer)
+
+        Returns:
+            list: Les postes, du plus récent au plus ancien
+        """
+        with self._lock:
+            if categoryIDs not in self._searchCache:
+                if len(categoryIDs) == 0:
+                    documents = self.search
+                else:
+                    documents = [document for document in self.search
+                                 if not categoryIDs.isdisjoint(self.categories.get(document['job_id'], ()))]
+                self._searchCache[categoryIDs] = documents
+            return self._searchCache[categoryIDs]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Imite les routes de l'API utilisées par EScraper : /search, /search/job/<id> et /company/<id>
+    """
+    #HTTP/1.1 afin que les connexions soient réutilisées (keep-alive), comme avec jobup
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server:StubServer = self.server.stub
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+
+        if server.latency > 0:
+            sleep(server.latency)
+
+        if '/search/job/' in path:
+            route = 'job'
+            status, body = server.getJob(path.rsplit('/', 1)[-1])
+        elif path.endswith('/search'):
+            route = 'search'
+            status, body = server.getSearchPage(parse_qs(url.query))
+        elif '/company/' in path:
+            route = 'company'
+            status, body = server.getCompany(path.rsplit('/', 1)[-1])
+        else:
+            route = 'unknown'
+            status, body = 404, {}
+
+        #Injection d'erreurs
+        if server.rate502 > 0 and server.random() < server.rate502:
+            status, body = 502, {}
+        elif route == 'search' and server.rate422 > 0 and server.random() < server.rate422:
+            status, body = 422, {}
+
+        server.count(route)
+        payload = json.dumps(body).encode('utf-8')
+        headers:dict = {'Content-Type': 'application/json'}
+        #Le détail des postes et des entreprises a un ETag, afin de tester les requêtes conditionnelles (voir EResponseCache)
+        if status == 200 and route in ('job', 'company'):
+            headers['ETag'] = '"' + hashlib.blake2b(payload, digest_size=16).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                status, payload = 304, b''
+        headers['Content-Length'] = str(len(payload))
+        self.send_response(status)
+        for name, val in headers.items():
+            self.send_header(name, val)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubServer:
+    """Serveur HTTP local qui sert un ReplayStore, dans un thread
+        Utilisation : server = StubServer(store).start(), puis JOBUP_API_URL=server.url
+    """
+
+    def __init__(self, store:ReplayStore, port:int = 0, latency:float = 0, rate502:float = 0, rate422:float = 0, seed:int = 0):
+        """
+        Args:
+            store (ReplayStore): Les réponses à servir
+            port (int, optional): Le port (0 pour un port libre). Defaults to 0.
+            latency (float, optional): Le temps de réponse ajouté à chaque requête, en secondes. Defaults to 0.
+            rate502 (float, optional): La part des requêtes qui retournent 502. Defaults to 0.
+            rate422 (float, optional): La part des pages de recherche qui retournent 422. Defaults to 0.
+            seed (int, optional): La graine de l'injection d'erreurs. Defaults to 0.
+        """
+        self.store = store
+        self.latency = latency
+        self.rate502 = rate502
+        self.rate422 = rate422
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests:dict = {}
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serveForever(self):
+        """Sert les requêtes dans le thread courant, jusqu'à stop() ou Ctrl+C
+        """
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def random(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def count(self, route:str):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def getRequestCount(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def getSearchPage(self, params:dict):
+        #Les listes sont passées au format category-ids[0]=702&category-ids[1]=703
+        categoryIDs = frozenset(int(val) for key, vals in params.items() if key.startswith(CATEGORY_PARAM) for val in vals)
+        page = int(params.get('page', ['1'])[0])
+        rows = int(params.get('rows', ['20'])[0])
+        start = (page - 1) * rows
+        #Comme jobup, la recherche ne retourne pas plus de SEARCH_LIMIT résultats
+        if start >= SEARCH_LIMIT:
+            return 422, {}
+        documents = self.store.searchDocuments(categoryIDs)
+        return 200, {'total_hits': len(documents), 'documents': documents[start:min(start + rows, SEARCH_LIMIT)]}
+
+    def getJob(self, jobID:str):
+        job = self.store.jobs.get(jobID)
+        return (404, {}) if job is None else (200, job)
+
+    def getCompany(self, companyID:str):
+        company = self.store.companies.get(companyID)
+        return (404, {}) if company is None else (200, company)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ('record', 'synthesize', 'serve'):
+        print(USAGE)
+        sys.exit(1)
+
+    command, storePath = sys.argv[1], sys.argv[2]
+    if command == 'record':
+        nbPages = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_NB_PAGES
+        ReplayStore.record(nbPages).save(storePath)
+    elif command == 'synthesize':
+        nbJobs = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_NB_JOBS
+        ReplayStore.synthesize(nbJobs).save(storePath)
+    else:
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else 8080
+        latency = float(sys.argv[4]) if len(sys.argv) > 4 else 0
+        rate502 = float(sys.argv[5]) if len(sys.argv) > 5 else 0
+        rate422 = float(sys.argv[6]) if len(sys.argv) > 6 else 0
+        server = StubServer(ReplayStore.load(storePath), port, latency, rate502, rate422)
+        print(f"Serveur de rejeu démarré : {server.url} (export JOBUP_API_URL={server.url})")
+        try:
+            server.serveForever()
+        except KeyboardInterrupt:
+            server.stop()
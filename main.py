@@ -6,112 +6,336 @@
 #	de celui-ci
 import os
 from EDatabase import EDatabase
-from EJob import EJob
 from EScraper import EScraper
+from EFetcher import EFetcher
+from ECrawlProfile import ECrawlProfile, IT_PROFILE
+from ECrawlScheduler import ECrawlScheduler
+from EPipeline import EPipeline
+from ERateLimiter import ERateLimiter
+from EResponseCache import EResponseCache
+from EWorkQueue import EWorkQueue, KIND_JOB, KIND_COMPANY, MAX_ATTEMPTS
+from EWorker import EWorker, POLL_SECONDS
+from EMetrics import EMetrics, REQUEST_SECONDS, SLEEP_SECONDS_TOTAL, RUN_SECONDS
 from EAddress import EAddress
-from EHelper import EHelper
+from ELogger import ELogger
 from ECompany import ECompany
 from time import sleep
 from os import remove
-from EScraper import HTTP_CODES
+from EScraper import HTTP_CODES, HIDDEN_CODES
 from math import floor
 import json
-#Temps d'attente avant de scraper chaque page
-SLEEP_TIME_BETWEEN_PAGES = 2
-#Temps d'attente entre le scraping de chaque job
-SLEEP_TIME_BETWEEN_JOBS = 0.2
+#Nombre de postes récupérés simultanément lors du premier lancement
+NB_WORKERS = 8
+#Débit initial, en requêtes par seconde. Celui-ci s'adapte ensuite aux réponses de jobup,
+#entre MIN_REQUESTS_PER_SECOND et MAX_REQUESTS_PER_SECOND
+REQUESTS_PER_SECOND = 5
+MIN_REQUESTS_PER_SECOND = 0.2
+MAX_REQUESTS_PER_SECOND = 20
+#Si True, les postes sont insérés directement depuis les pages de recherche (une requête par page au lieu d'une par poste)
+#Le détail des postes (DETAIL_ONLY_FIELDS) est ensuite récupéré en différé, DETAILS_PER_RUN postes par lancement
+SEARCH_ONLY_INGESTION = True
+#Les profils de recherche parcourus à chaque lancement (voir ECrawlProfile), chacun avec son propre état de synchronisation
+#D'autres secteurs peuvent être enregistrés avant le lancement, à partir des IDs de leurs catégories sur jobup.ch, Ex. :
+#ECrawlProfile.register(ECrawlProfile('finance', (<IDs des catégories>,)))
+CRAWL_PROFILES:tuple = (IT_PROFILE,)
+#Si True, le premier lancement d'un profil est découpé en partitions (une par catégorie) afin de dépasser la limite de 2000 résultats
+PARTITIONED_CRAWL = True
+#Nombre de recherches (partitions ou recherches des nouveaux postes, tous profils confondus) parcourues simultanément
+NB_PARTITION_WORKERS = 4
+#Nombre de postes écrits en DB par transaction. En cas de crash, seul le batch en cours est perdu
+BATCH_SIZE = 50
+#Nombre maximum de postes dont le détail est récupéré à chaque lancement (0 pour désactiver)
+DETAILS_PER_RUN = 200
+#Nombre maximum de postes déjà en DB vérifiés à chaque lancement (mode refresh, 0 pour désactiver)
+#Les postes modifiés sont réécrits, les postes supprimés de jobup sont marqués inactifs (voir refreshJobs)
+REFRESH_PER_RUN = 500
+#Fichier dans lequel les métriques du lancement sont écrites (voir EMetrics.export), '' pour désactiver
+#Avec l'extension .prom, le fichier est au format texte Prometheus, sinon en JSON
+METRICS_FILE = 'jobup_metrics.json'
+#Cache des réponses (détail des postes et des entreprises) utilisé pour les requêtes conditionnelles, '' pour désactiver
+#Une réponse inchangée (304) est lue depuis le cache au lieu d'être retéléchargée (voir EResponseCache)
+RESPONSE_CACHE_FILE = 'jobup_cache.db'
+#256 Mo
+RESPONSE_CACHE_MAX_BYTES = 268435456
+#Nombre de processus workers (voir EWorker), 0 pour tout récupérer dans ce processus
+#Le détail des postes et les entreprises sont alors récupérés par les workers via la queue de travail (WORK_QUEUE_FILE),
+#et seul ce processus (le coordinateur) écrit en DB. Le débit configuré est partagé entre les workers
+WORKER_PROCESSES = 0
+#Nombre de requêtes simultanées par processus worker
+WORKER_THREADS = 4
+#Queue de travail durable : les éléments d'un lancement interrompu sont repris au lancement suivant
+WORK_QUEUE_FILE = 'jobup_queue.db'
 DEBUG = 0
-if DEBUG == 1:
-    try:
-        remove('jobup.db')
-    except:
-        pass
-
-if(EDatabase.countJobs() == 0):
-    #Si il y a 0 jobs en DB, c'est le premier lancement et il
-    #faut scraper les 2000 derniers postes
-    #Les pages sont scrapés séquentiellement (du poste le plus récent au plus ancien)
-    searchPages = EScraper.getAllAvailableJobIDsFromJobup()
-    #On veut cependant stocker les postes du plus ancien au plus récent (le poste avec l'id la plus élevée devrait être le plus récent)
-    #Pour ce faire, on va inverser la liste de pages, puis la liste d'id dans chaque page
-    searchPages.reverse()
-    [page.reverse() for page in searchPages]
-    #Nombre de jobs total = nb pages * nb résultat par page
-    nbJobs = len(searchPages) * len(searchPages[0])
-    currScraped = 0
-
-    for page in searchPages:
-        for jobID in page:
-            job = EScraper.getJobFromID(jobID)
-            currScraped += 1
-            if type(job) is HTTP_CODES:
-                print('')
-                EHelper.printError(f"Erreur lors du scraping du poste à l'ID {jobID}", job.name)
-                continue
-            
-            progressStr = f"{currScraped}/{nbJobs}"
-            EHelper.printInfo("Job scrapé, insertion dans la DB", progressStr)
-            EDatabase.insertJob(job)
-            EHelper.printInfo(f"Job inséré, pause de {SLEEP_TIME_BETWEEN_JOBS}s", progressStr)
-            sleep(SLEEP_TIME_BETWEEN_JOBS)
-
-        print('')
-        progressStr = f"{int(currScraped / nbJobs * 100)}%"
-        EHelper.printInfo(f"Page scrapée, sauvegarde des données...", progressStr)
-        EDatabase.saveChanges()
-        if currScraped < nbJobs:
-            EHelper.printInfo(f"Pause de {SLEEP_TIME_BETWEEN_PAGES}s", progressStr)
-            sleep(SLEEP_TIME_BETWEEN_PAGES)
-            print('')
-else:
-    
-    lastJob:EJob = EScraper.getLastPostedJob()
-    #Si le dernier job posté existe déjà en DB, il n'y a rien à scraper
-    #et le script peut terminer son exécution
-    if EDatabase.jobExists(lastJob.job_id):
-        exit()
-    
-    print("Recherche des nouveaux postes depuis " + str(lastJob.job_id))
-    newJobs = EScraper.getAllNewJobs(lastJob.job_id)
-    print(f"{len(newJobs)} nouveaux postes trouvés, insertion dans la DB")
-    #On inverse la liste de jobs, car ceux-ci sont scrapés séquentiellement, du plus récent au plus ancien
-    newJobs.reverse()
-    for job in newJobs:
-        EDatabase.insertJob(job)
-    print("Tous les postes ont été insérés")
-    EDatabase.saveChanges()        
-    print("Modifications enregistrées")
-
-#@TODO SELECT company_id from jobs WHERE company_id NOT IN (SELECT company_id FROM companies)
-# On SELECT l'ID de toutes les entreprises qui ne sont pas encore en db
-# On les scrape, puis on les ajoute
-missingCompanies = EDatabase.getAllMissingCompaniesID()
-nbMissing = len(missingCompanies)
-hiddenCompanies:list = []
-if type(missingCompanies) is list and nbMissing > 0:
-    print(f"\r\n{nbMissing} entreprises à scraper")
+
+def configure(requestsPerSecond:float = REQUESTS_PER_SECOND, minRate:float = MIN_REQUESTS_PER_SECOND,
+              maxRate:float = MAX_REQUESTS_PER_SECOND):
+    """Configure le limiter partagé par toutes les requêtes du scraper, et ouvre le cache des réponses
+    """
+    ERateLimiter.configureShared(requestsPerSecond, minRate=minRate, maxRate=maxRate)
+    if len(RESPONSE_CACHE_FILE) > 0:
+        EResponseCache.configure(RESPONSE_CACHE_FILE, RESPONSE_CACHE_MAX_BYTES)
+
+def insertNewJobs(jobs, queueDetails:bool, checkpoint:bool = False) -> int:
+    """Écrit les postes en DB par batch (voir EPipeline.writeBatches), en affichant la progression
+
+    Returns:
+        int: Le nombre de postes insérés
+    """
+    nbInserted = 0
+    #L'état de synchronisation de chaque profil est mis à jour par ECrawlScheduler.finish
+    for nbInserted in EPipeline.writeBatches(jobs, BATCH_SIZE, queueDetails, syncName=None, checkpoint=checkpoint):
+        ELogger.progress("Postes insérés dans la DB", str(nbInserted))
+    ELogger.endProgress()
+    return nbInserted
+
+def syncJobs():
+    """Parcourt les profils de CRAWL_PROFILES en parallèle (voir ECrawlScheduler)
+        Premier lancement (ou reprise de celui-ci) pour un profil sans état de synchronisation,
+        sinon récupère les postes publiés depuis le dernier lancement du profil
+    """
+    scheduler = ECrawlScheduler(map(ECrawlProfile.get, CRAWL_PROFILES), NB_PARTITION_WORKERS, PARTITIONED_CRAWL)
+    scheduler.prepare()
+    #Les postes sont écrits en DB par batch, au fur et à mesure de leur réception
+    #Un poste présent dans plusieurs profils (ou partitions) n'est inséré qu'une fois
+    checkpoint = EDatabase.hasCheckpoint()
+    documents = scheduler.documents(planOnly=not SEARCH_ONLY_INGESTION)
+    if SEARCH_ONLY_INGESTION:
+        #Les postes sont mappés directement depuis les pages de recherche, leur détail est récupéré en différé
+        nbInserted = insertNewJobs(EPipeline.mapDocuments(documents), True, checkpoint)
+    else:
+        #Les postes des premiers lancements sont seulement planifiés, leur détail est récupéré ci-dessous
+        nbInserted = insertNewJobs(EPipeline.fetchDetails(EPipeline.jobIDs(documents), NB_WORKERS), False, checkpoint)
+
+    #Les postes planifiés qui n'ont pas encore été insérés : tous les postes des premiers lancements si SEARCH_ONLY_INGESTION est False,
+    #sinon les postes en cours d'insertion lors de l'interruption du lancement précédent
+    pendingIDs = EDatabase.getPlannedJobs()
+    if len(pendingIDs) > 0:
+        ELogger.info(f"Récupération de {len(pendingIDs)} postes planifiés")
+        nbInserted += insertNewJobs(EPipeline.fetchDetails(pendingIDs, NB_WORKERS, EPipeline.checkpointError), False, True)
+
+    scheduler.finish()
+    ELogger.info(f"{nbInserted} nouveaux postes insérés")
+
+def fetchPendingDetails():
+    """Récupère le détail des postes insérés depuis la recherche, DETAILS_PER_RUN postes au maximum
+    """
+    if DETAILS_PER_RUN > 0:
+        #On récupère le détail des postes insérés depuis la recherche, les plus récents en premier
+        pendingIDs = EDatabase.getPendingJobDetails(DETAILS_PER_RUN)
+        if len(pendingIDs) > 0:
+            ELogger.info(f"Récupération du détail de {len(pendingIDs)} postes")
+            detailedJobs:list = []
+            removedJobIDs:list = []
+            for jobID, job in EFetcher.fetchJobs(pendingIDs, NB_WORKERS):
+                if job is HTTP_CODES.ERR_PAGE_NOT_FOUND:
+                    #Le poste n'existe plus, son détail ne pourra jamais être récupéré
+                    removedJobIDs.append(jobID)
+                elif type(job) is not HTTP_CODES:
+                    detailedJobs.append(job)
+                ELogger.progress("Détail récupéré", f"{len(detailedJobs)}/{len(pendingIDs)}")
+            ELogger.endProgress()
+            with EDatabase.batch():
+                EDatabase.updateJobsDetails(detailedJobs)
+                EDatabase.deactivateJobs(removedJobIDs)
+
+def writeWorkResults(results:list):
+    """Écrit en DB les résultats des workers (voir EWorkQueue.takeResults), en une transaction
+        L'écriture est idempotente : en cas de crash avant leur suppression de la queue, les résultats sont réécrits au lancement suivant
+
+    Args:
+        results (list): Les résultats, au format (type, ID, résultat)
+    """
+    detailedJobs:list = []
+    removedJobIDs:list = []
     companies:list = []
-    i = 0
-    for compID in missingCompanies:
-        i += 1
-        EHelper.printInfo(f'Scraping entreprise {compID[0]}', f"{i}/{nbMissing}")
-        tmp  = EScraper.getCompanyFromID(compID[0])
-        if type(tmp) is HTTP_CODES:
-            EHelper.printError(f"L'entreprise {compID} est cachée", tmp.name)
-            hiddenCompanies.append(compID)
-            print('')
+    addresses:list = []
+    hiddenCompanies:list = []
+    for kind, id, result in results:
+        if result is None:
+            #L'élément sera ajouté à nouveau au prochain lancement (détail toujours en attente, entreprise toujours manquante)
+            ELogger.warning(f"Élément {kind} {id} abandonné après {MAX_ATTEMPTS} tentatives")
+        elif kind == KIND_JOB:
+            if result is HTTP_CODES.ERR_PAGE_NOT_FOUND:
+                #Le poste n'existe plus, son détail ne pourra jamais être récupéré
+                removedJobIDs.append(id)
+            elif type(result) is HTTP_CODES:
+                ELogger.warning(f"Erreur lors de la récupération du poste {id}, celui-ci sera redemandé", result.name)
+            else:
+                detailedJobs.append(result)
+        elif kind == KIND_COMPANY:
+            if type(result) is not HTTP_CODES:
+                company, companyAddresses = result
+                companies.append(company)
+                addresses += companyAddresses
+            elif result in HIDDEN_CODES:
+                ELogger.warning(f"L'entreprise {id} est cachée", result.name)
+                hiddenCompanies.append((id, result.name))
+            else:
+                ELogger.warning(f"Erreur lors de la récupération de l'entreprise {id}, celle-ci sera redemandée", result.name)
+
+    with EDatabase.batch():
+        EDatabase.updateJobsDetails(detailedJobs)
+        EDatabase.deactivateJobs(removedJobIDs)
+        EDatabase.insertAddresses(addresses)
+        EDatabase.insertCompanies(companies)
+        EDatabase.hideCompanies(hiddenCompanies)
+
+def runWorkers(nbProcesses:int):
+    """Mode coordinateur : ajoute le détail des postes en attente (DETAILS_PER_RUN au maximum) et les entreprises manquantes
+        à la queue de travail, démarre nbProcesses workers, puis écrit leurs résultats en DB au fur et à mesure
+        Un worker qui plante ne perd pas ses éléments : ceux-ci sont repris par les autres workers à l'expiration de leurs baux
+
+    Args:
+        nbProcesses (int): Le nombre de workers
+    """
+    EWorkQueue.configure(WORK_QUEUE_FILE)
+    #Les métriques d'un lancement précédent interrompu ont déjà été perdues par le coordinateur, elles sont ignorées
+    EWorkQueue.takeMetrics()
+    nbJobs = 0
+    if DETAILS_PER_RUN > 0:
+        nbJobs = EWorkQueue.enqueue(KIND_JOB, EDatabase.getPendingJobDetails(DETAILS_PER_RUN))
+    nbCompanies = EWorkQueue.enqueue(KIND_COMPANY, map(lambda row: row[0], EDatabase.getAllMissingCompaniesID()))
+    ELogger.info(f"{nbJobs} postes et {nbCompanies} entreprises ajoutés à la queue, {nbProcesses} workers")
+
+    limiter = ERateLimiter.getShared()
+    #Les workers partagent le cache des réponses du coordinateur (requêtes conditionnelles, voir EResponseCache)
+    cachePath = RESPONSE_CACHE_FILE if len(RESPONSE_CACHE_FILE) > 0 else None
+    processes = EWorker.start(WORK_QUEUE_FILE, nbProcesses, limiter.rate, limiter.minRate, limiter.maxRate, WORKER_THREADS,
+                              cachePath, RESPONSE_CACHE_MAX_BYTES)
+    crashed:set = set()
+    nbWritten = 0
+    while True:
+        #L'état de la queue et des workers est lu avant les résultats : un élément terminé entre-temps
+        #est ainsi toujours écrit avant la fin de la boucle
+        drained = EWorkQueue.isDrained()
+        alive = any(map(lambda process: process.is_alive(), processes))
+        results = EWorkQueue.takeResults(BATCH_SIZE)
+        if len(results) > 0:
+            writeWorkResults(results)
+            EWorkQueue.remove(results)
+            nbWritten += len(results)
+            ELogger.progress("Résultats des workers écrits en DB", str(nbWritten))
             continue
-        EDatabase.insertCompany(tmp)
-    
-    print("\r\nToutes les entreprises ont été ajoutées à la DB")
-    print(f"Suppression des {len(hiddenCompanies)} entreprises cachées")
-    for companyID in hiddenCompanies:
-        EDatabase.updateJobCompanyID(companyID[0], '')
-    print("Suppression terminée")
-    EDatabase.saveChanges()
-        
-print("Scraping complété, fin de l'éxécution")
 
+        for process in processes:
+            if process.exitcode not in (None, 0) and process.pid not in crashed:
+                crashed.add(process.pid)
+                ELogger.warning(f"Le worker {process.pid} s'est arrêté, ses éléments seront repris par les autres workers",
+                                str(process.exitcode))
+        if drained:
+            break
+        if not alive:
+            #Tous les workers se sont arrêtés : les éléments restants sont gardés dans la queue pour le prochain lancement
+            ELogger.warning("Tous les workers se sont arrêtés, les éléments restants seront repris au prochain lancement",
+                            str(EWorkQueue.getStats()))
+            break
+        sleep(POLL_SECONDS)
+
+    ELogger.endProgress()
+    for process in processes:
+        process.join()
+    #Les requêtes sont faites par les workers : leurs métriques sont ajoutées à celles du lancement (voir reportMetrics)
+    for snapshot in EWorkQueue.takeMetrics():
+        EMetrics.merge(snapshot)
+    ELogger.info(f"{nbWritten} résultats des workers écrits en DB")
+
+def refreshJobs():
+    """Vérifie les postes déjà en DB (mode refresh), REFRESH_PER_RUN postes au maximum
+        Seuls les postes dont le contenu a changé (voir EJob.getContentHash) sont réécrits,
+        les postes qui n'existent plus (404) sont marqués inactifs
+    """
+    if REFRESH_PER_RUN <= 0:
+        return
+    #Les postes jamais vérifiés, puis les moins récemment vérifiés, les plus récents en premier
+    hashes:dict = dict(EDatabase.getJobsToRefresh(REFRESH_PER_RUN))
+    if len(hashes) == 0:
+        return
+    ELogger.info(f"Vérification de {len(hashes)} postes")
+    changedJobs:list = []
+    checkedIDs:list = []
+    removedJobIDs:list = []
+    nbChanged, nbRemoved, nbChecked = 0, 0, 0
+
+    def flush():
+        with EDatabase.batch():
+            EDatabase.upsertJobs(changedJobs)
+            EDatabase.markJobsChecked(checkedIDs)
+            EDatabase.deactivateJobs(removedJobIDs)
+        changedJobs.clear()
+        checkedIDs.clear()
+        removedJobIDs.clear()
+
+    for jobID, job in EFetcher.fetchJobs(hashes.keys(), NB_WORKERS):
+        nbChecked += 1
+        if job is HTTP_CODES.ERR_PAGE_NOT_FOUND:
+            removedJobIDs.append(jobID)
+            nbRemoved += 1
+        elif type(job) is HTTP_CODES:
+            #Erreur temporaire, le poste sera vérifié au prochain lancement
+            ELogger.warning(f"Erreur lors de la vérification du poste {jobID}", job.name)
+        elif job.getContentHash() != hashes[jobID]:
+            changedJobs.append(job)
+            nbChanged += 1
+        else:
+            checkedIDs.append(jobID)
+        ELogger.progress("Postes vérifiés", f"{nbChecked}/{len(hashes)}")
+
+        if len(changedJobs) + len(checkedIDs) + len(removedJobIDs) >= BATCH_SIZE:
+            flush()
+    flush()
+    ELogger.info(f"{nbChanged} postes modifiés, {nbRemoved} postes supprimés de jobup")
+
+def enrichCompanies():
+    """Récupère toutes les entreprises des postes qui ne sont pas encore en DB
+    """
+    # On SELECT l'ID de toutes les entreprises qui ne sont pas encore en db
+    # On les scrape, puis on les ajoute
+    #Les entreprises cachées depuis moins de HIDDEN_COMPANY_TTL_DAYS jours ne sont pas redemandées
+    missingCompanies = EDatabase.getAllMissingCompaniesID()
+    nbMissing = len(missingCompanies)
+    if type(missingCompanies) is list and nbMissing > 0:
+        ELogger.info(f"{nbMissing} entreprises à scraper")
+        companies:list = []
+        hiddenCompanies:list = []
+        nbScraped = 0
+        #Les entreprises sont récupérées en parallèle, sous le même limiter que les postes
+        for compID, company in EFetcher.fetchCompanies(map(lambda row: row[0], missingCompanies), NB_WORKERS):
+            nbScraped += 1
+            ELogger.progress(f'Scraping entreprise {compID}', f"{nbScraped}/{nbMissing}")
+            if type(company) is HTTP_CODES:
+                if company in HIDDEN_CODES:
+                    ELogger.warning(f"L'entreprise {compID} est cachée", company.name)
+                    hiddenCompanies.append((compID, company.name))
+                else:
+                    #Les autres erreurs (Ex. gateway error) sont temporaires, l'entreprise sera redemandée au prochain lancement
+                    ELogger.warning(f"Erreur lors de la récupération de l'entreprise {compID}, celle-ci sera redemandée", company.name)
+            else:
+                companies.append(company)
+
+            if len(companies) + len(hiddenCompanies) >= BATCH_SIZE:
+                with EDatabase.batch():
+                    EDatabase.insertCompanies(companies)
+                    EDatabase.hideCompanies(hiddenCompanies)
+                companies, hiddenCompanies = [], []
+
+        ELogger.info("Toutes les entreprises ont été récupérées")
+        with EDatabase.batch():
+            EDatabase.insertCompanies(companies)
+            EDatabase.hideCompanies(hiddenCompanies)
+
+
+def reportMetrics():
+    """Affiche la répartition du temps du lancement, et écrit les métriques dans METRICS_FILE
+    """
+    summary = EMetrics.getSummary()
+    requestHistograms = summary['histograms'].get(REQUEST_SECONDS, {})
+    nbRequests = sum(map(lambda histogram: histogram['count'], requestHistograms.values()))
+    requestTime = sum(map(lambda histogram: histogram['sum'], requestHistograms.values()))
+    #Les temps sont cumulés sur tous les threads, et peuvent donc dépasser la durée du lancement
+    ELogger.info(f"Durée du lancement : {summary[RUN_SECONDS]:.1f} s, {nbRequests} requêtes ({requestTime:.1f} s cumulées), "
+          f"{EMetrics.getCounter(SLEEP_SECONDS_TOTAL):.1f} s d'attente cumulées")
+    if len(METRICS_FILE) > 0:
+        EMetrics.export(METRICS_FILE)
 
 def insertCompanyIfNotExists(id:str) -> bool:
     """Ajoute l'entreprise avec l'ID spécifiée en base de données si celle-ci n'y est pas
@@ -126,4 +350,24 @@ def insertCompanyIfNotExists(id:str) -> bool:
         if(comp is not None):
             EDatabase.insertCompany(comp)
             return True
-    return False
\ No newline at end of file
+    return False
+
+
+if __name__ == '__main__':
+    if DEBUG == 1:
+        try:
+            remove('jobup.db')
+        except:
+            pass
+
+    configure()
+    syncJobs()
+    if WORKER_PROCESSES > 0:
+        runWorkers(WORKER_PROCESSES)
+    else:
+        fetchPendingDetails()
+    refreshJobs()
+    enrichCompanies()
+    reportMetrics()
+    ELogger.info("Scraping complété, fin de l'éxécution")
+    ELogger.flush()